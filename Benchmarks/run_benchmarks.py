@@ -0,0 +1,295 @@
+'''
+Headless benchmarks of ClassLib geometry construction and placement.
+Only the standalone "klayout" python module (klayout.db) is required.
+
+Every benchmark is executed in a separate python process, so that the
+peak resident memory is measured independently for every workload.
+
+usage:
+    python Benchmarks/run_benchmarks.py                 # run and compare with baselines.json
+    python Benchmarks/run_benchmarks.py --save          # run and store results as new baselines
+    python Benchmarks/run_benchmarks.py cpw_rl_path_121 squid    # run selected benchmarks only
+
+Polygon and vertex counts do not depend on the machine and must match the
+baselines exactly. Times are compared only if the baselines were saved on
+the same machine (see machine_info()), regenerate them with --save there.
+A benchmark is a regression if it is slower than threshold*baseline and
+than baseline + min_delta seconds, the latter keeps millisecond workloads
+from flickering.
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from collections import OrderedDict
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+BASELINES_FILE = os.path.join(BENCHMARKS_DIR, "baselines.json")
+
+
+def _Z():
+    from ClassLib import CPWParameters
+    return CPWParameters(10e3, 6e3)
+
+
+def _squid_params():
+    # pad_side, pad_r, pads_distance, p_ext_width, p_ext_r, sq_len, sq_area,
+    # j_width, low_lead_w, b_ext, j_length, n, bridge
+    return [5e3, 1e3, 30e3, 3e3, 0.5e3, 7e3, 15e6, 0.2e3, 0.5e3, 0.9e3, 0.1e3, 7, 0.2e3]
+
+
+def cpw_rl_path_121():
+    from ClassLib import CPW_RL_Path, DPoint, pi
+    return [CPW_RL_Path(DPoint(0, 0), "L" + "RL"*60, _Z(), 20e3, [100e3]*61, [pi/2, -pi/2]*30)]
+
+
+def cpw_arcs_30_100um():
+    # turns of typical radii, their point count is set by PROGRAM.ARC_TOLERANCE_DBU
+    from ClassLib import CPW_arc, DPoint, pi
+    return [CPW_arc(_Z(), DPoint(i*500e3, j*500e3), R, delta_alpha)
+            for i, R in enumerate([30e3, 50e3, 75e3, 100e3]) for j, delta_alpha in enumerate([pi/2, pi])]
+
+
+def cpw_meander_resonator():
+    from ClassLib import CPW_Meander_Resonator, DPoint
+    return [CPW_Meander_Resonator(_Z(), DPoint(0, 0), 10e6, 50e3, 600e3)]
+
+
+def capacitor_interdigitated_200():
+    from ClassLib import Capacitor_Interdigitated, DPoint
+    return [Capacitor_Interdigitated(DPoint(0, 0), 2e3, 2e3, 100e3, 5e3, 20e3, 20e3, 200)]
+
+
+def cwave():
+    from ClassLib import CWave, DPoint, pi
+    return [CWave(DPoint(0, 0), 175e3, 25e3, 8, 10e3, pi/4, 30e3, n_pts=200)]
+
+
+def sfs_csh_emb():
+    from ClassLib import SFS_Csh_emb, CPWParameters, DPoint, pi
+    params = {'r_out': 175e3, 'dr': 25e3, 'n_semiwaves': 2, 's': 10e3, 'alpha': pi/4,
+              'r_curve': 30e3, 'n_pts_cwave': 200, 'Z1': CPWParameters(10e3, 6e3), 'd_alpha1': 0,
+              'width1': 0, 'gap1': 25e3 - 1.33e3, 'Z2': _Z(), 'd_alpha2': 2/9*pi,
+              'width2': 25e3/3, 'gap2': 25e3/3, 'n_pts_arcs': 50}
+    return [SFS_Csh_emb(DPoint(0, 0), params, _squid_params())]
+
+
+def squid():
+    from ClassLib import Squid, DPoint
+    return [Squid(DPoint(0, 0), _squid_params())]
+
+
+def chip5x10_with_contact_pads():
+    from ClassLib import Chip5x10_with_contactPads, DPoint
+    return [Chip5x10_with_contactPads(DPoint(0, 0), _Z())]
+
+
+def _elements_1000():
+    from ClassLib import CPW, Rectangle, DPoint
+    Z = _Z()
+    elements = []
+    for i in range(500):
+        x, y = (i % 25)*200e3, (i // 25)*200e3
+        elements.append(CPW(start=DPoint(x, y), end=DPoint(x + 150e3, y), cpw_params=Z))
+        elements.append(Rectangle(DPoint(x, y + 50e3), 100e3, 100e3))
+    return elements
+
+
+def place_1000_region():
+    return _elements_1000()
+
+
+def place_1000_cell_each():
+    # every place() rebuilds the whole layer of the cell
+    return _elements_1000()
+
+
+def place_1000_cell_batch():
+    return _elements_1000()
+
+
+BENCHMARKS = OrderedDict([(f.__name__, f) for f in [
+    cpw_rl_path_121, cpw_arcs_30_100um, cpw_meander_resonator, capacitor_interdigitated_200, cwave,
+    sfs_csh_emb, squid, chip5x10_with_contact_pads, place_1000_region, place_1000_cell_each,
+    place_1000_cell_batch
+]])
+
+
+def _vertices(region):
+    return sum(polygon.num_points() for polygon in region.each())
+
+
+def run_single(name):
+    '''
+    @brief: runs benchmark in the current process
+    @return: dict with "build_s", "place_s", "total_s", "peak_rss_kb", "polygons", "vertices"
+    '''
+    import resource
+    import klayout.db
+    from ClassLib import PlacementBatch, SFS_Csh_emb
+
+    start = time.perf_counter()
+    elements = BENCHMARKS[name]()
+    build_time = time.perf_counter() - start
+
+    layout = klayout.db.Layout()
+    layout.dbu = 0.001
+    cell = layout.create_cell("bench")
+    layer_ph = layout.layer(klayout.db.LayerInfo(1, 0))
+    layer_el = layout.layer(klayout.db.LayerInfo(2, 0))
+
+    start = time.perf_counter()
+    if( name.endswith("_cell_batch") ):
+        with PlacementBatch(cell) as batch:
+            for element in elements:
+                element.place(batch, layer_ph)
+        results = [klayout.db.Region(cell.begin_shapes_rec(layer_ph))]
+    elif( name.endswith("_cell_each") ):
+        for element in elements:
+            element.place(cell, layer_ph)
+        results = [klayout.db.Region(cell.begin_shapes_rec(layer_ph))]
+    else:
+        results = [klayout.db.Region(), klayout.db.Region()]
+        for element in elements:
+            if( isinstance(element, SFS_Csh_emb) ):
+                # squid is placed to the e-beam region
+                element.place(results[0], results[1])
+            else:
+                element.place(results[0])
+    place_time = time.perf_counter() - start
+
+    return {"build_s": build_time,
+            "place_s": place_time,
+            "total_s": build_time + place_time,
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "polygons": sum(result.count() for result in results),
+            "vertices": sum(_vertices(result) for result in results)}
+
+
+def run(names, repeat):
+    results = OrderedDict()
+    for name in names:
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--single", name])
+            runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+        # the fastest run is the least disturbed one
+        results[name] = min(runs, key=lambda r: r["total_s"])
+    return results
+
+
+def machine_info():
+    '''
+    @brief: properties of the machine that the times depend on
+    @return: dict
+    '''
+    import klayout.db
+    cpu = platform.processor()
+    if( os.path.exists("/proc/cpuinfo") ):
+        with open("/proc/cpuinfo") as f:
+            models = [line.split(":", 1)[1].strip() for line in f if line.startswith("model name")]
+        if( models ):
+            cpu = models[0]
+    return {"system": platform.system(),
+            "cpu": cpu,
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "klayout": klayout.db.__version__}
+
+
+def load_baselines():
+    '''
+    @return: (machine, benchmarks) - machine_info() of the machine the baselines
+             were saved on (None if unknown) and dict of the results
+    '''
+    if( not os.path.exists(BASELINES_FILE) ):
+        return None, {}
+    with open(BASELINES_FILE) as f:
+        baselines = json.load(f)
+    if( "benchmarks" not in baselines ):
+        # results saved without the machine description
+        return None, baselines
+    return baselines["machine"], baselines["benchmarks"]
+
+
+def report(results, baselines, compare_times, threshold, min_delta):
+    '''
+    @brief: prints the results and compares them with the baselines
+    @params:  bool compare_times - False if the baselines are from another machine,
+                                   only the geometry is compared then
+    @return: list of the names of the regressed benchmarks
+    '''
+    print("{:<32}{:>10}{:>10}{:>10}{:>12}{:>10}{:>12}{:>10}".format(
+        "benchmark", "build,s", "place,s", "total,s", "peak_rss,MB", "polygons", "vertices", "vs base"))
+    regressions = []
+    for name, r in results.items():
+        ratio = ""
+        base = baselines.get(name)
+        if( base is not None ):
+            if( (r["polygons"], r["vertices"]) != (base["polygons"], base["vertices"]) ):
+                ratio = "geometry"
+                regressions.append(name)
+            elif( compare_times ):
+                k = r["total_s"]/base["total_s"]
+                ratio = "{:.2f}x".format(k)
+                if( k > threshold and r["total_s"] - base["total_s"] > min_delta ):
+                    regressions.append(name)
+        print("{:<32}{:>10.3f}{:>10.3f}{:>10.3f}{:>12.1f}{:>10}{:>12}{:>10}".format(
+            name, r["build_s"], r["place_s"], r["total_s"], r["peak_rss_kb"]/1024,
+            r["polygons"], r["vertices"], ratio))
+    if( regressions ):
+        print("\nregressions (other polygon or vertex counts, or slower than {:.2f}x and {:.3f} s "
+              "of the baseline): {}".format(threshold, min_delta, ", ".join(regressions)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ClassLib geometry benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    parser.add_argument("--save", action="store_true", help="store results as baselines")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest is reported")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.01,
+                        help="slowdown in seconds below which no regression is reported")
+    args = parser.parse_args()
+
+    if( args.single is not None ):
+        print(json.dumps(run_single(args.single)))
+        return
+
+    names = args.names if args.names else list(BENCHMARKS.keys())
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if( unknown ):
+        parser.error("unknown benchmarks: " + ", ".join(unknown))
+
+    results = run(names, args.repeat)
+
+    machine = machine_info()
+    base_machine, baselines = load_baselines()
+    compare_times = base_machine == machine
+    if( baselines and not compare_times ):
+        print("baselines are saved on another machine, only polygon and vertex counts are compared:\n"
+              "    baselines: {}\n    this one:  {}\n".format(base_machine, machine))
+    regressions = report(results, baselines, compare_times, args.threshold, args.min_delta)
+
+    if( args.save ):
+        if( not compare_times ):
+            # times of different machines are not mixed
+            baselines = {}
+        baselines.update(results)
+        with open(BASELINES_FILE, "w") as f:
+            json.dump({"machine": machine, "benchmarks": baselines}, f, indent=2)
+        print("\nbaselines are saved to " + BASELINES_FILE)
+    elif( regressions ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+'''
+Throughput benchmarks of the sonnetSim client against the python stand-in
+of the MATLAB/Sonnet server (sonnetSim.echoServer). Neither MATLAB nor
+Sonnet are required.
+
+Every workload is run against a protocol 1 server (one acknowledgement
+per field) and a protocol 2 server (pipelined frames, bulk POLYGONS):
+    upload_boxes   - region of separate rectangles
+    upload_cpw     - region of CPW paths with many vertices per polygon
+    sweep          - SimulatedDesign.simulate_sweep() with zero simulation
+                     time, i.e. the overhead of the client-server round per point
+
+usage:
+    python Benchmarks/sonnet_benchmarks.py
+    python Benchmarks/sonnet_benchmarks.py --polygons 20000 --points 50 --delay 0.1
+'''
+import os
+import sys
+import time
+import argparse
+from collections import OrderedDict
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+
+def _boxes_region(n):
+    from klayout.db import Region, Box
+    side = int(n**0.5) + 1
+    return Region([Box((i % side)*20000, (i // side)*20000, (i % side)*20000 + 10000, (i // side)*20000 + 10000)
+                   for i in range(n)])
+
+
+def _cpw_region(n):
+    from klayout.db import Region
+    from ClassLib import CPW_RL_Path, CPWParameters, DPoint, pi
+    region = Region()
+    for i in range(n):
+        CPW_RL_Path(DPoint(0, i*100e3), "LRLRL", CPWParameters(10e3, 6e3), 20e3,
+                    [50e3, 50e3, 50e3], [pi/2, -pi/2]).place(region)
+    return region
+
+
+def upload(region, protocol):
+    '''
+    @brief: uploads the region to a fresh server
+    @return: dict with "time_s", "polygons", "bytes"
+    '''
+    from sonnetSim import EchoServer, SonnetLab
+
+    server = EchoServer(port=0, protocol=protocol).start_in_thread()
+    try:
+        SL = SonnetLab(port=server.port)
+        SL.set_ports([])
+        SL.clear()
+        bytes_before = server.stats["bytes_received"]
+        start = time.perf_counter()
+        SL.send_polygons(region)
+        elapsed = time.perf_counter() - start
+        uploaded = server.stats["bytes_received"] - bytes_before
+        SL.release()
+        return {"time_s": elapsed, "polygons": server.stats["polygons"], "bytes": uploaded}
+    finally:
+        server.stop()
+
+
+def sweep(points_n, protocol, delay):
+    '''
+    @brief: SimulatedDesign sweep over the length of a CPW line
+    @return: dict with "time_s", "points", "per_point_s"
+    '''
+    import numpy as np
+    from ClassLib import CPW, CPWParameters, DPoint
+    from sonnetSim import EchoServer, SimulatedDesign, SimulationBox, SonnetPort, PORT_TYPES
+
+    class LineDesign(SimulatedDesign):
+        def draw(self, design_params=None):
+            self.design_pars = design_params
+            self.region_ph.clear()
+            self.line = CPW(start=DPoint(0, 50e3), end=DPoint(design_params["length"], 50e3),
+                            cpw_params=CPWParameters(10e3, 6e3))
+            self.line.place(self.region_ph)
+
+        def draw_simulation(self, iter_params_dict):
+            self.draw(iter_params_dict)
+
+        def calculate_ports(self, design_params):
+            self.ports = [SonnetPort(self.line.start, PORT_TYPES.BOX_WALL),
+                          SonnetPort(self.line.end, PORT_TYPES.BOX_WALL)]
+
+    server = EchoServer(port=0, simulation_delay=delay, protocol=protocol).start_in_thread()
+    try:
+        design = LineDesign("sweep")
+        design.sonnet_port = server.port
+        design.set_fixed_parameters(np.linspace(1e9, 10e9, 101), SimulationBox(100e3, 100e3, 200, 200),
+                                    simulation_type="LINEAR")
+        design.set_swept_parameters(OrderedDict([("length", np.linspace(50e3, 100e3, points_n))]))
+        start = time.perf_counter()
+        design.simulate_sweep()
+        elapsed = time.perf_counter() - start
+        assert design.sMatrices.shape == (points_n, 101, 2, 2)
+        return {"time_s": elapsed, "points": points_n, "per_point_s": elapsed/points_n - delay}
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sonnetSim client throughput benchmarks")
+    parser.add_argument("--polygons", type=int, default=5000, help="number of boxes in upload_boxes")
+    parser.add_argument("--cpws", type=int, default=100, help="number of CPW paths in upload_cpw")
+    parser.add_argument("--points", type=int, default=20, help="number of points of the sweep")
+    parser.add_argument("--delay", type=float, default=0.0, help="duration of a simulation, seconds")
+    args = parser.parse_args()
+
+    regions = OrderedDict([("upload_boxes", _boxes_region(args.polygons)),
+                           ("upload_cpw", _cpw_region(args.cpws))])
+
+    print("{:<16}{:>10}{:>10}{:>12}{:>14}{:>14}".format(
+        "benchmark", "protocol", "time,s", "polygons", "polygons/s", "MB/s"))
+    for name, region in regions.items():
+        for protocol in (1, 2):
+            r = upload(region, protocol)
+            print("{:<16}{:>10}{:>10.3f}{:>12}{:>14.0f}{:>14.2f}".format(
+                name, protocol, r["time_s"], r["polygons"], r["polygons"]/r["time_s"],
+                r["bytes"]/r["time_s"]/2**20))
+
+    print("\n{:<16}{:>10}{:>10}{:>12}{:>14}".format("benchmark", "protocol", "time,s", "points", "overhead,s/pt"))
+    for protocol in (1, 2):
+        r = sweep(args.points, protocol, args.delay)
+        print("{:<16}{:>10}{:>10.3f}{:>12}{:>14.4f}".format(
+            "sweep", protocol, r["time_s"], r["points"], r["per_point_s"]))
+
+
+if __name__ == "__main__":
+    main()
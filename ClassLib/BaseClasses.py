@@ -1,11 +1,318 @@
 import klayout.db
-from math import sqrt, cos, sin, atan2, pi, copysign
+from math import sqrt, cos, sin, atan2, pi, copysign, floor
 from klayout.db import Point,DPoint,DSimplePolygon,SimplePolygon, DPolygon, Polygon,  Region
 from klayout.db import Trans, DTrans, CplxTrans, DCplxTrans, ICplxTrans
 
 from ClassLib._PROG_SETTINGS import *
 
 from collections import OrderedDict
+from collections.abc import MutableSequence
+import functools
+import hashlib
+import numpy as np
+
+
+def _linear_part( dCplxTrans ):
+    '''
+    @brief: returns 2x2 matrix M of the rotation, mirroring and magnification
+            of the transformation, such that row vectors transform as r' = r @ M
+    '''
+    # mirroring at the x-axis goes first, then rotation and magnification
+    alpha = dCplxTrans.angle*pi/180
+    mag = dCplxTrans.mag
+    ex = (mag*cos(alpha), mag*sin(alpha))
+    if( dCplxTrans.is_mirror() ):
+        ey = (mag*sin(alpha), -mag*cos(alpha))
+    else:
+        ey = (-mag*sin(alpha), mag*cos(alpha))
+    return np.array( [ex, ey], dtype=np.float64 )
+
+
+class PointArray( MutableSequence ):
+    '''
+    @brief: sequence of DPoints stored as a NumPy N x 2 array, so that
+            transform(...) is a single matrix product.
+            It behaves as a list of DPoints: DPoint objects are created on
+            the first access of every index and the same object is returned
+            afterwards, so the points can be changed in place
+            (points[0].x = 5). transform(...) takes such changes into
+            account, only the accessed points are converted back.
+    '''
+    def __init__( self, points=() ):
+        if( isinstance( points, np.ndarray ) ):
+            self._xy = np.array( points, dtype=np.float64 ).reshape( -1,2 )
+            self._points = {}
+        else:
+            self._set_points( list( points ) )
+    
+    def _set_points( self, points ):
+        self._xy = np.array( [(pt.x, pt.y) for pt in points], dtype=np.float64 ).reshape( -1,2 )
+        # the stored objects are returned by __getitem__, as a list does
+        self._points = dict( enumerate( points ) )
+    
+    def _sync( self ):
+        # points that might have been changed in place
+        for i, pt in self._points.items():
+            self._xy[i] = (pt.x, pt.y)
+    
+    def __len__( self ):
+        return len( self._xy )
+    
+    def __getitem__( self, index ):
+        if( isinstance( index, slice ) ):
+            return [self[i] for i in range( *index.indices( len(self) ) )]
+        if( index < 0 ):
+            index += len(self)
+        pt = self._points.get( index )
+        if( pt is None ):
+            if( not 0 <= index < len(self) ):
+                raise IndexError( "PointArray index out of range" )
+            pt = DPoint( *self._xy[index].tolist() )
+            self._points[index] = pt
+        return pt
+    
+    def __setitem__( self, index, value ):
+        if( isinstance( index, slice ) ):
+            points = list( self )
+            points[index] = value
+            self._set_points( points )
+            return
+        if( index < 0 ):
+            index += len(self)
+        self._xy[index] = (value.x, value.y)
+        self._points[index] = value
+    
+    def __delitem__( self, index ):
+        points = list( self )
+        del points[index]
+        self._set_points( points )
+    
+    def insert( self, index, value ):
+        points = list( self )
+        points.insert( index, value )
+        self._set_points( points )
+    
+    def extend( self, values ):
+        points = list( self )
+        points.extend( values )
+        self._set_points( points )
+    
+    def __eq__( self, other ):
+        return isinstance( other, (list, tuple, PointArray) ) and list( self ) == list( other )
+    
+    def __add__( self, other ):
+        return list( self ) + list( other )
+    
+    def __radd__( self, other ):
+        return list( other ) + list( self )
+    
+    def __repr__( self ):
+        return "PointArray({})".format( list( self ) )
+    
+    def transform( self, dCplxTrans ):
+        if( len(self) == 0 ):
+            return
+        self._sync()
+        disp = dCplxTrans.disp
+        self._xy = self._xy @ _linear_part( dCplxTrans ) + (disp.x, disp.y)
+        # transformed points are new objects, as in [trans*pt for pt in points]
+        self._points = {}
+    
+    def as_array( self ):
+        self._sync()
+        return self._xy.copy()
+    
+    def dup( self ):
+        return PointArray( self.as_array() )
+
+
+class AngleArray( MutableSequence ):
+    '''
+    @brief: sequence of the connection angles (radians) stored as a NumPy
+            vector, transformed all at once as direction vectors.
+            It behaves as a list of floats.
+    '''
+    def __init__( self, angles=() ):
+        self._alpha = np.array( angles if isinstance( angles, np.ndarray ) else list( angles ),
+                                dtype=np.float64 ).reshape( -1 )
+    
+    def __len__( self ):
+        return len( self._alpha )
+    
+    def __getitem__( self, index ):
+        if( isinstance( index, slice ) ):
+            return self._alpha[index].tolist()
+        return self._alpha[index].item()
+    
+    def __setitem__( self, index, value ):
+        if( isinstance( index, slice ) ):
+            angles = list( self )
+            angles[index] = value
+            self._alpha = np.array( angles, dtype=np.float64 ).reshape( -1 )
+        else:
+            self._alpha[index] = value
+    
+    def __delitem__( self, index ):
+        self._alpha = np.delete( self._alpha, np.arange( len(self) )[index] )
+    
+    def insert( self, index, value ):
+        angles = list( self )
+        angles.insert( index, value )
+        self._alpha = np.array( angles, dtype=np.float64 )
+    
+    def extend( self, values ):
+        self._alpha = np.concatenate( (self._alpha, np.array( list( values ), dtype=np.float64 ).reshape( -1 )) )
+    
+    def __eq__( self, other ):
+        return isinstance( other, (list, tuple, AngleArray) ) and list( self ) == list( other )
+    
+    def __add__( self, other ):
+        return list( self ) + list( other )
+    
+    def __radd__( self, other ):
+        return list( other ) + list( self )
+    
+    def __repr__( self ):
+        return "AngleArray({})".format( list( self ) )
+    
+    def transform( self, dCplxTrans ):
+        if( len(self) == 0 ):
+            return
+        # direction vectors are transformed, displacement has no influence
+        directions = np.column_stack( (np.cos(self._alpha), np.sin(self._alpha)) ) @ _linear_part( dCplxTrans )
+        self._alpha = np.arctan2( directions[:,1], directions[:,0] )
+    
+    def as_array( self ):
+        return self._alpha.copy()
+    
+    def dup( self ):
+        return AngleArray( self._alpha )
+
+
+class GeometryCache():
+    '''
+    @brief: LRU cache of element geometry in the local coordinates.
+            Entries are keyed by the element class and the canonical
+            form of its parameters, see Element_Base._geometry_key().
+    @params:  int maxsize - maximal number of stored entries
+    @usage:
+            Element_Base.geometry_cache = GeometryCache( maxsize=512 )
+            # or for a single class only
+            Contact_Pad.geometry_cache = GeometryCache()
+    '''
+    def __init__( self, maxsize=256 ):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    
+    def get( self, key ):
+        entry = self._entries.get( key )
+        if( entry is None ):
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end( key )
+        return entry
+    
+    def put( self, key, entry ):
+        self._entries[key] = entry
+        self._entries.move_to_end( key )
+        while( len(self._entries) > self.maxsize ):
+            self._entries.popitem( last=False )
+    
+    def clear( self ):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__( self ):
+        return len(self._entries)
+
+
+class _Uncacheable( Exception ):
+    pass
+
+
+def _canonical( value ):
+    '''
+    @brief: hashable representation of an element parameter.
+            Raises _Uncacheable for values that can not be compared cheaply.
+    '''
+    if( value is None or isinstance( value, (bool, int, float, str) ) ):
+        return value
+    if( isinstance( value, (np.integer, np.floating) ) ):
+        return value.item()
+    if( isinstance( value, (list, tuple) ) ):
+        return tuple( _canonical( item ) for item in value )
+    if( isinstance( value, dict ) ):
+        return tuple( sorted( (str(key), _canonical( item )) for key, item in value.items() ) )
+    if( isinstance( value, (PointArray, AngleArray) ) ):
+        value = value.as_array()
+    if( isinstance( value, np.ndarray ) ):
+        return ( "ndarray", value.shape, value.tobytes() )
+    if( isinstance( value, (DPoint, Point, klayout.db.DVector, klayout.db.Vector) ) ):
+        return ( type(value).__name__, value.x, value.y )
+    if( isinstance( value, (Trans, DTrans, CplxTrans, DCplxTrans, ICplxTrans) ) ):
+        return ( type(value).__name__, str(value) )
+    if( isinstance( value, Element_Base ) or isinstance( value, Region ) ):
+        raise _Uncacheable()
+    if( hasattr( value, "__dict__" ) and type(value).__module__.startswith( "ClassLib" ) ):
+        # parameter holders like CPWParameters
+        return ( type(value).__name__, _canonical( vars(value) ) )
+    raise _Uncacheable()
+
+
+def _copy_attribute( value, memo=None ):
+    '''
+    @brief: copy of a cached attribute. Objects that are referenced several
+            times (an element in primitives and in its own attribute, a region
+            in metal_regions and in _metal_region) are copied once, 'memo'
+            maps ids of the copied objects to their copies.
+    '''
+    if( memo is None ):
+        memo = {}
+    copy = memo.get( id(value) )
+    if( copy is not None ):
+        return copy
+    if( isinstance( value, (PointArray, AngleArray) ) ):
+        copy = value.dup()
+    elif( isinstance( value, Element_Base ) ):
+        # primitives of the cached composite elements
+        copy = object.__new__( type(value) )
+        memo[id(value)] = copy
+        for name, item in value.__dict__.items():
+            copy.__dict__[name] = _copy_attribute( item, memo )
+    elif( isinstance( value, dict ) ):
+        copy = type(value)( (key, _copy_attribute( item, memo )) for key, item in value.items() )
+    elif( isinstance( value, list ) ):
+        copy = [ _copy_attribute( item, memo ) for item in value ]
+    elif( hasattr( value, "dup" ) ):
+        copy = value.dup()
+    else:
+        return value
+    memo[id(value)] = copy
+    return copy
+
+
+def _profiled( phase ):
+    '''
+    @brief: reports the time spent in the method to Element_Base.profiler, if it is set
+    '''
+    def decorator( method ):
+        @functools.wraps( method )
+        def wrapper( self, *args, **kwargs ):
+            profiler = self.profiler
+            if( profiler is None ):
+                return method( self, *args, **kwargs )
+            profiler.start( self, phase )
+            try:
+                return method( self, *args, **kwargs )
+            finally:
+                profiler.stop()
+        return wrapper
+    return decorator
+
 
 class Element_Base():
     '''
@@ -30,15 +337,26 @@ class Element_Base():
         
         self.origin = origin
         self.inverse = inverse
-        self.metal_region = Region()
-        self.empty_region = Region()
-        self.metal_regions = {}
-        self.empty_regions = {}        
-        self.metal_regions["default"] = self.metal_region
-        self.empty_regions["default"] = self.empty_region
-        
-        self.metal_region.merged_semantics = True
-        self.empty_region.merged_semantics = True
+        # composition of transformations made by make_trans(...) that are
+        # not yet applied to the default metal and empty regions
+        self._pending_trans = None
+        # composition of all transformations made since init_regions(),
+        # maps the local frame of the element to its current position
+        self._local_trans = DCplxTrans()
+        # True while the default regions are still in the local frame
+        self._regions_in_local_frame = True
+        # False while polygons of the lazily constructed element are not generated
+        self._regions_initialized = True
+        self._metal_region = Region()
+        self._empty_region = Region()
+        # named regions, "default" is the pair of metal_region and empty_region
+        self._metal_regions = {}
+        self._empty_regions = {}
+        self._metal_regions["default"] = self._metal_region
+        self._empty_regions["default"] = self._empty_region
+        
+        self._metal_region.merged_semantics = True
+        self._empty_region.merged_semantics = True
         self.DCplxTrans_init = None
         self.ICplxTrans_init = None
         
@@ -62,72 +380,238 @@ class Element_Base():
     def init_regions( self ):
         raise NotImplementedError
     
+    # opt-in geometry memoization, GeometryCache instance or None
+    geometry_cache = None
+    # opt-in build statistics, Profiling.BuildProfiler instance or None
+    profiler = None
+    # names of the attributes that define the element geometry in the local
+    # coordinates. If None, all the attributes that are present before
+    # init_regions() is called are used (except of Element_Base ones)
+    cache_key_attributes = None
+    _BASE_ATTRIBUTES = ( "_connections", "_angle_connections", "connection_edges",
+                         "sonnet_port_connections", "connection_ptrs", "origin",
+                         "_pending_trans", "_regions_initialized", "_metal_region",
+                         "_empty_region", "_metal_regions", "_empty_regions",
+                         "DCplxTrans_init", "ICplxTrans_init", "_lazy_init_attributes",
+                         "_local_trans", "_regions_in_local_frame", "_geometry_key_value" )
+    
+    def _geometry_key( self ):
+        if( self.cache_key_attributes is None ):
+            names = sorted( name for name in self.__dict__ if name not in self._BASE_ATTRIBUTES )
+        else:
+            names = self.cache_key_attributes
+        try:
+            params = tuple( (name, _canonical( getattr( self, name ) )) for name in names )
+        except _Uncacheable:
+            return None
+        return ( type(self).__module__, type(self).__qualname__, params )
+    
+    @_profiled( "init_regions" )
+    def _build_regions( self ):
+        '''
+        @brief: calls init_regions() or restores its result from the geometry cache
+        '''
+        cache = self.geometry_cache
+        key = None if cache is None else self._geometry_key_value
+        if( key is None ):
+            self.init_regions()
+            return
+        
+        entry = cache.get( key )
+        if( entry is None ):
+            attributes_before = dict( self.__dict__ )
+            self.init_regions()
+            # connections are stored always because they can be filled in place
+            changed = { name: _copy_attribute( value ) for name, value in self.__dict__.items()
+                        if( name in ("_connections", "_angle_connections", "connection_edges")
+                            or (name not in self._BASE_ATTRIBUTES and attributes_before.get( name ) is not value) ) }
+            entry = { "metal_regions": _copy_attribute( self._metal_regions ),
+                      "empty_regions": _copy_attribute( self._empty_regions ),
+                      "attributes": changed }
+            cache.put( key, entry )
+        else:
+            for name, value in entry["attributes"].items():
+                self.__dict__[name] = _copy_attribute( value )
+            # dictionaries are updated in place, they can be referenced elsewhere
+            self._metal_regions.update( _copy_attribute( entry["metal_regions"] ) )
+            self._empty_regions.update( _copy_attribute( entry["empty_regions"] ) )
+            self._metal_region = self._metal_regions["default"]
+            self._empty_region = self._empty_regions["default"]
+    
+    def init_connections( self ):
+        '''
+        @brief: optional. Computes connections and angle_connections (and other
+                attributes that init_regions() sets) without generating polygons.
+                Elements that implement it are constructed lazily
+                if PROGRAM.LAZY_REGIONS is True.
+        '''
+        raise NotImplementedError
+    
+    def _supports_lazy_regions( self ):
+        return type(self).init_connections is not Element_Base.init_connections
+    
+    def _init_regions_lazily( self ):
+        self._regions_initialized = True
+        # polygons are generated in the local coordinates, all transformations
+        # made since construction are applied afterwards
+        pending_trans = self._pending_trans
+        self._pending_trans = None
+        
+        # init_regions() has to see the attributes as they were during
+        # the construction, and it overwrites connections and other attributes
+        # with their values in the local coordinates. The current
+        # (transformed) attributes are restored afterwards.
+        region_attributes = ("_metal_region", "_empty_region", "connection_edges",
+                             "_pending_trans", "_regions_initialized")
+        attributes = dict( self.__dict__ )
+        init_attributes = self.__dict__.pop( "_lazy_init_attributes" )
+        for name, value in init_attributes.items():
+            if( name not in region_attributes ):
+                self.__dict__[name] = value
+        self._build_regions()
+        for name, value in attributes.items():
+            if( name not in region_attributes and name != "_lazy_init_attributes" ):
+                self.__dict__[name] = value
+        
+        self._pending_trans = pending_trans
+    
+    @property
+    def connections( self ):
+        return self._connections
+    
+    @connections.setter
+    def connections( self, points ):
+        self._connections = points if isinstance( points, PointArray ) else PointArray( points )
+    
+    @property
+    def angle_connections( self ):
+        return self._angle_connections
+    
+    @angle_connections.setter
+    def angle_connections( self, angles ):
+        self._angle_connections = angles if isinstance( angles, AngleArray ) else AngleArray( angles )
+    
+    @property
+    def metal_region( self ):
+        self._apply_pending_trans()
+        return self._metal_region
+    
+    @metal_region.setter
+    def metal_region( self, region ):
+        self._apply_pending_trans()
+        self._metal_region = region
+        self._metal_regions["default"] = region
+    
+    @property
+    def empty_region( self ):
+        self._apply_pending_trans()
+        return self._empty_region
+    
+    @empty_region.setter
+    def empty_region( self, region ):
+        self._apply_pending_trans()
+        self._empty_region = region
+        self._empty_regions["default"] = region
+    
+    @property
+    def metal_regions( self ):
+        # "default" entry is generated and transformed like metal_region
+        self._apply_pending_trans()
+        return self._metal_regions
+    
+    @metal_regions.setter
+    def metal_regions( self, regions ):
+        self._apply_pending_trans()
+        self._metal_regions = regions
+        self._metal_region = regions.setdefault( "default", Region() )
+    
+    @property
+    def empty_regions( self ):
+        self._apply_pending_trans()
+        return self._empty_regions
+    
+    @empty_regions.setter
+    def empty_regions( self, regions ):
+        self._apply_pending_trans()
+        self._empty_regions = regions
+        self._empty_region = regions.setdefault( "default", Region() )
+    
+    @_profiled( "transform" )
+    def _apply_pending_trans( self ):
+        if( not self._regions_initialized ):
+            self._init_regions_lazily()
+        # polygons are transformed only once, with the composition
+        # of all transformations that were made since the last access
+        if( self._pending_trans is not None ):
+            iCplxTrans = ICplxTrans().from_dtrans( self._pending_trans )
+            self._pending_trans = None
+            self._regions_in_local_frame = False
+            self._metal_region.transform( iCplxTrans )
+            self._empty_region.transform( iCplxTrans )
+    
     # first it makes trans_init displacement
     # then the rest of the trans_init
     # then displacement of the current state to the origin
     # after all, origin should be updated
     def _init_regions_trans( self ):
-        self.init_regions()         # must be implemented in every subclass
+        # parameters are taken before the element is moved to its place
+        self._geometry_key_value = self._geometry_key()
+        if( PROGRAM.LAZY_REGIONS and self._supports_lazy_regions() ):
+            self._regions_initialized = False
+            # constructor state is kept for the deferred init_regions() call
+            self._lazy_init_attributes = dict( self.__dict__ )
+            self.init_connections()
+        else:
+            self._build_regions()       # init_regions() must be implemented in every subclass
         
-        dr_origin = DSimplePolygon( [DPoint(0,0)] )
+        dr_origin = DPoint(0,0)
         if( self.DCplxTrans_init is not None ):
             # constructor trans displacement
             dCplxTrans_temp = DCplxTrans( 1,0,False, self.DCplxTrans_init.disp )
             self.make_trans( dCplxTrans_temp )
-            dr_origin.transform( dCplxTrans_temp )
+            dr_origin = dCplxTrans_temp * dr_origin
             
             # rest of the constructor trans functions
             dCplxTrans_temp = self.DCplxTrans_init.dup()
             dCplxTrans_temp.disp = DPoint(0,0)
             self.make_trans( dCplxTrans_temp )
-            dr_origin.transform( dCplxTrans_temp )                  
+            dr_origin = dCplxTrans_temp * dr_origin
             
         # translation to the old origin (self.connections are already contain proper values)
         self.make_trans( DCplxTrans( 1,0,False, self.origin ) ) # move to the origin
-        self.origin += dr_origin.point( 0 )
+        self.origin += dr_origin
         
+    @_profiled( "transform" )
     def make_trans( self, dCplxTrans ):
         if( dCplxTrans is not None ):
-            iCplxTrans = ICplxTrans().from_dtrans( dCplxTrans )
-            self.metal_region.transform( iCplxTrans )
-            self.empty_region.transform( iCplxTrans )
+            if( self._pending_trans is None ):
+                self._pending_trans = dCplxTrans.dup()
+            else:
+                self._pending_trans = dCplxTrans * self._pending_trans
+            self._local_trans = dCplxTrans * self._local_trans
             self._update_connections( dCplxTrans )
             self._update_alpha( dCplxTrans )
     
     def _update_connections( self, dCplxTrans ):       
         if( dCplxTrans is not None ):
-            # the problem is, if i construct polygon with multiple points 
-            # their order in poly_temp.each_point() doesn't coinside with the 
-            # order of the list that was passed to the polygon constructor
-            # so, when i perform transformation and try to read new values through poly_temp.each_point()
-            # they values are rearranged
-            # solution is: i need to create polygon for each point personally, and the initial order presists
-            for i,pt in enumerate(self.connections):
-                poly_temp = DSimplePolygon( [pt] )
-                poly_temp.transform( dCplxTrans )
-                self.connections[i] = poly_temp.point( 0 )
+            # all points are transformed by one matrix product,
+            # their order is preserved
+            self.connections.transform( dCplxTrans )
     
     def _update_alpha( self, dCplxTrans ):
         if( dCplxTrans is not None ):
-            dCplxTrans_temp = dCplxTrans.dup()
-            dCplxTrans_temp.disp = DPoint(0,0)
-            
-            for i,alpha in enumerate(self.angle_connections):
-                poly_temp = DSimplePolygon( [DPoint( cos(alpha), sin(alpha) )] )
-                poly_temp.transform( dCplxTrans_temp )
-                pt = poly_temp.point( 0 )
-                self.angle_connections[i] = atan2( pt.y, pt.x )
+            self.angle_connections.transform( dCplxTrans )
     
     def _update_origin( self, dCplxTrans ):
         if( dCplxTrans is not None ):     
-            poly_temp = DSimplePolygon( [self.origin] )
-            poly_temp.transform( dCplxTrans )
-            self.origin = poly_temp.point( 0 )
+            self.origin = dCplxTrans * DPoint( self.origin.x, self.origin.y )
     
+    @_profiled( "place" )
     def place( self, dest, layer_i=-1, region_name=None, merge=False ):
         r_cell = None
         metal_region = None
         empty_region = None
+        self._apply_pending_trans()
         if( region_name == None ):
             metal_region = self.metal_region
             empty_region = self.empty_region
@@ -141,7 +625,15 @@ class Element_Base():
                 empty_region = self.empty_regions[region_name]
             else:
                 empty_region = Region()
+        
+        if( self.profiler is not None ):
+            self.profiler.add_geometry( self, metal_region, empty_region )
                     
+        if( isinstance( dest, PlacementBatch ) ):
+            # contributions are recorded and written on dest.commit()
+            dest.add( layer_i, metal_region, empty_region, merge )
+            return
+            
         if( layer_i != -1 ): 
             r_cell = Region( dest.begin_shapes_rec( layer_i ) )        
             temp_i = dest.layout().layer( klayout.db.LayerInfo(PROGRAM.LAYER1_NUM,0) )
@@ -161,6 +653,62 @@ class Element_Base():
             if( merge is True ):
                 dest.merge()
                 
+    def _placed_regions( self, region_name=None ):
+        if( region_name is None ):
+            return self.metal_region, self.empty_region
+        metal_region = self.metal_regions.get( region_name, Region() )
+        empty_region = self.empty_regions.get( region_name, Region() )
+        return metal_region, empty_region
+    
+    def _local_content( self, region_name=None ):
+        '''
+        @brief: polygons that place() adds to an empty cell, in the local frame
+        '''
+        if( not self._regions_initialized ):
+            self._init_regions_lazily()
+        if( region_name is None and self._regions_in_local_frame ):
+            # exact polygons, no rounding of the back transformation
+            return self._metal_region - self._empty_region
+        metal_region, empty_region = self._placed_regions( region_name )
+        return (metal_region - empty_region).transformed( ICplxTrans().from_dtrans( self._local_trans.inverted() ) )
+    
+    def place_as_instance( self, cell, layer_i, region_name=None ):
+        '''
+        @brief: places element as an instance of a child cell.
+                The child cell is created once per layout for every distinct set
+                of element parameters (see cache_key_attributes) and is reused
+                by all equal elements.
+                Empty regions are subtracted from the flat shapes of the 'cell' only,
+                instances placed earlier are not cut by them.
+                Use flatten_instances( cell ) to obtain a flat mask.
+        @params:  klayout.db.Cell cell - parent cell
+                  int layer_i - layer index in the cell's layout
+                  str region_name - name of the region in metal_regions/empty_regions
+        @return: klayout.db.Instance of the child cell
+        '''
+        layout = cell.layout()
+        key = self._geometry_key_value
+        if( key is None ):
+            child = None
+            child_name = layout.unique_cell_name( type(self).__name__ )
+        else:
+            digest = hashlib.sha1( repr( (key, layer_i, region_name) ).encode() ).hexdigest()[:16]
+            child_name = type(self).__name__ + "_" + digest
+            child = layout.cell( child_name )
+        if( child is None ):
+            child = layout.create_cell( child_name )
+            child.shapes( layer_i ).insert( self._local_content( region_name ) )
+        
+        empty_region = self._placed_regions( region_name )[1]
+        if( not empty_region.is_empty() ):
+            r_cell = Region( cell.shapes( layer_i ) )
+            r_cell -= empty_region
+            cell.shapes( layer_i ).clear()
+            cell.shapes( layer_i ).insert( r_cell )
+        
+        iCplxTrans = ICplxTrans().from_dtrans( self._local_trans )
+        return cell.insert( klayout.db.CellInstArray( child.cell_index(), iCplxTrans ) )
+        
     def add_sonnet_port( self, connection_idx ):
         '''
         @brief: sets internal marker that during export to Sonnet
@@ -180,38 +728,78 @@ class Complex_Base( Element_Base ):
     def _init_regions_trans( self ):
         pass
     
+    def _local_content( self, region_name=None ):
+        r_local = Region()
+        for primitive in self.primitives.values():
+            primitive.place( r_local, region_name=region_name )
+        return r_local.transformed( ICplxTrans().from_dtrans( self._local_trans.inverted() ) )
+    
+    def _placed_regions( self, region_name=None ):
+        if( region_name is None ):
+            return self.metal_region, self.empty_region
+        metal_region = Region()
+        empty_region = Region()
+        for primitive in self.primitives.values():
+            primitive_regions = primitive._placed_regions( region_name )
+            metal_region += primitive_regions[0]
+            empty_region += primitive_regions[1]
+        return metal_region, empty_region
+    
     def make_trans( self, dCplxTrans_temp ):
+        # primitives only record the transformation, their polygons
+        # are transformed once when they are accessed or placed
         for primitive in self.primitives.values():
             primitive.make_trans( dCplxTrans_temp )
-        self._update_connections( dCplxTrans_temp )
-        self._update_alpha( dCplxTrans_temp )
+        super().make_trans( dCplxTrans_temp )
+    
+    def _apply_pending_trans( self ):
+        if( self._metal_region is None ):
+            # aggregated regions are collected from the primitives,
+            # that already carry all the transformations
+            self._pending_trans = None
+            self._regions_in_local_frame = False
+            self._metal_region = Region()
+            self._empty_region = Region()
+            # FOLLOWING CYCLE GIVES WRONG INFO ABOUT FILLED AND ERASED AREAS
+            for element in self.primitives.values():
+                self._metal_region += element.metal_region
+                self._empty_region += element.empty_region
+            self._metal_regions["default"] = self._metal_region
+            self._empty_regions["default"] = self._empty_region
+        else:
+            super()._apply_pending_trans()
                 
     def _init_primitives_trans( self ):
-        self.init_primitives()              # must be implemented in every subclass
-        dr_origin = DSimplePolygon( [DPoint(0,0)] )
+        self._geometry_key_value = self._geometry_key()
+        self._build_primitives()
+        dr_origin = DPoint(0,0)
         if( self.DCplxTrans_init is not None ):
             # constructor trans displacement
             dCplxTrans_temp = DCplxTrans( 1,0,False, self.DCplxTrans_init.disp )
             self.make_trans( dCplxTrans_temp )
-            dr_origin.transform( dCplxTrans_temp )
+            dr_origin = dCplxTrans_temp * dr_origin
             
             # rest of the constructor trans functions
             dCplxTrans_temp = self.DCplxTrans_init.dup()
             dCplxTrans_temp.disp = DPoint(0,0)
             self.make_trans( dCplxTrans_temp )
-            dr_origin.transform( dCplxTrans_temp )   
+            dr_origin = dCplxTrans_temp * dr_origin
         
         dCplxTrans_temp = DCplxTrans( 1,0,False, self.origin )
         self.make_trans( dCplxTrans_temp ) #move to the origin
-        self.origin += dr_origin.point( 0 )
+        self.origin += dr_origin
         
-        # FOLLOWING CYCLE GIVES WRONG INFO ABOUT FILLED AND ERASED AREAS
-        for element in self.primitives.values():
-            self.metal_region += element.metal_region
-            self.empty_region += element.empty_region
+        # aggregated metal and empty regions are collected on the first access
+        self._pending_trans = None
+        self._metal_region = None
+        self._empty_region = None
     
+    @_profiled( "place" )
     def place( self, dest, layer_i=-1, region_name = None ):
-        if( layer_i != -1 ):
+        if( isinstance( dest, PlacementBatch ) ):
+            for primitive in self.primitives.values():
+                primitive.place( dest, layer_i, region_name=region_name )
+        elif( layer_i != -1 ):
             r_cell = Region( dest.begin_shapes_rec( layer_i ) )
             for primitive in self.primitives.values():
                 primitive.place( r_cell, region_name=region_name )
@@ -226,8 +814,200 @@ class Complex_Base( Element_Base ):
                 primitive.place( dest, region_name=region_name )
             
     
+    @_profiled( "init_primitives" )
+    def _build_primitives( self ):
+        '''
+        @brief: calls init_primitives() or restores the primitives and
+                the attributes it sets from the geometry cache
+        '''
+        cache = self.geometry_cache
+        key = None if cache is None else self._geometry_key_value
+        entry = None if key is None else cache.get( key )
+        if( entry is None ):
+            attributes_before = dict( self.__dict__ )
+            self.init_primitives()              # must be implemented in every subclass
+            if( key is not None ):
+                # primitives are stored in the local coordinates, before
+                # the composite is moved to its place
+                changed = { name: value for name, value in self.__dict__.items()
+                            if( name in ("primitives", "_connections", "_angle_connections", "connection_edges")
+                                or (name not in self._BASE_ATTRIBUTES and attributes_before.get( name ) is not value) ) }
+                cache.put( key, { "attributes": _copy_attribute( changed ) } )
+        else:
+            # one memo for all the attributes keeps the references between them
+            self.__dict__.update( _copy_attribute( entry["attributes"] ) )
+        if( self.profiler is not None ):
+            for name, primitive in self.primitives.items():
+                self.profiler.set_name( primitive, name )
+    
     def init_primitives( self ):
         raise NotImplementedError
         
     def init_regions( self ):
-        pass  
+        pass
+
+
+def flatten_instances( cell, merge=False ):
+    '''
+    @brief: flattens all instances placed by place_as_instance( cell, ... )
+            into the flat shapes of the 'cell' and removes unused child cells
+    @params:  klayout.db.Cell cell - cell to flatten
+              bool merge - merge the polygons of every layer after flattening
+    '''
+    cell.flatten( True )
+    if( merge is True ):
+        for layer_i in cell.layout().layer_indexes():
+            r_cell = Region( cell.shapes( layer_i ) )
+            r_cell.merge()
+            cell.shapes( layer_i ).clear()
+            cell.shapes( layer_i ).insert( r_cell )
+
+
+class BucketIndex():
+    '''
+    @brief: spatial index of boxes on a uniform grid of square buckets.
+            Every box (DBox or Box) is registered in all buckets it overlaps,
+            a query only visits the buckets of the query box.
+    @params:  float bucket_size - side of the bucket, a few typical box sizes
+    '''
+    def __init__( self, bucket_size ):
+        self.bucket_size = bucket_size
+        self._buckets = {}     # (bx, by) -> set of keys
+        self._boxes = {}       # key -> DBox or Box
+
+    def _bucket_range( self, box ):
+        s = self.bucket_size
+        for bx in range( int( floor( box.left/s ) ), int( floor( box.right/s ) ) + 1 ):
+            for by in range( int( floor( box.bottom/s ) ), int( floor( box.top/s ) ) + 1 ):
+                yield (bx, by)
+
+    def insert( self, key, box ):
+        if( key in self._boxes ):
+            self.remove( key )
+        self._boxes[key] = box
+        for bucket in self._bucket_range( box ):
+            self._buckets.setdefault( bucket, set() ).add( key )
+
+    def remove( self, key ):
+        box = self._boxes.pop( key )
+        for bucket in self._bucket_range( box ):
+            keys = self._buckets[bucket]
+            keys.discard( key )
+            if( not keys ):
+                del self._buckets[bucket]
+
+    def box( self, key ):
+        return self._boxes[key]
+
+    def query( self, box ):
+        '''
+        @return: set of the keys of the boxes that overlap or touch 'box'
+        '''
+        candidates = set()
+        for bucket in self._bucket_range( box ):
+            candidates |= self._buckets.get( bucket, set() )
+        return { key for key in candidates if self._boxes[key].overlaps( box ) or self._boxes[key].touches( box ) }
+
+    def __len__( self ):
+        return len( self._boxes )
+
+    def __contains__( self, key ):
+        return key in self._boxes
+
+
+class PlacementBatch():
+    '''
+    @brief: collects metal and empty contributions of the elements placed
+            into a cell and writes them with one boolean pass per layer
+            instead of rebuilding the whole layer on every place() call.
+            Placement order is preserved: an empty region erases metal
+            placed before it (including the metal of the same element),
+            but not the metal placed after it.
+    @params:  klayout.db.Cell cell - cell that receives the shapes
+    @usage:
+            with PlacementBatch( cell ) as pb:
+                cpw.place( pb, layer_ph )
+                squid.place( pb, layer_el )
+            # shapes are written to the cell on leaving the "with" block
+    '''
+    def __init__( self, cell ):
+        self.cell = cell
+        # layer_i -> list of ( metal_region, empty_region ) in placement order
+        self._contributions = OrderedDict()
+        self._merge_layers = set()
+    
+    def __enter__( self ):
+        return self
+    
+    def __exit__( self, exc_type, exc_value, traceback ):
+        # nothing is written if the drawing code has failed
+        if( exc_type is None ):
+            self.commit()
+        return False
+    
+    def add( self, layer_i, metal_region, empty_region, merge=False ):
+        if( layer_i == -1 ):
+            raise ValueError( "PlacementBatch requires a layer index" )
+        # copies are stored because elements can be transformed after placing
+        self._contributions.setdefault( layer_i, [] ).append( (metal_region.dup(), empty_region.dup()) )
+        if( merge is True ):
+            self._merge_layers.add( layer_i )
+    
+    def commit( self ):
+        for layer_i, contributions in self._contributions.items():
+            r_cell = self._resolve_layer( Region( self.cell.begin_shapes_rec( layer_i ) ), contributions )
+            if( layer_i in self._merge_layers ):
+                r_cell.merge()
+            
+            temp_i = self.cell.layout().layer( klayout.db.LayerInfo(PROGRAM.LAYER1_NUM,0) )
+            self.cell.shapes( temp_i ).insert( r_cell )
+            self.cell.layout().clear_layer( layer_i )
+            self.cell.layout().move_layer( temp_i, layer_i )
+            self.cell.layout().delete_layer( temp_i )
+        
+        self._contributions = OrderedDict()
+        self._merge_layers = set()
+    
+    def _resolve_layer( self, r_cell, contributions ):
+        '''
+        @brief: sequential "r += metal_i; r -= empty_i" is equal to
+                (r - U(empty_j)) | U(metal_i - U(empty_j, j >= i)).
+                Only empty regions whose bounding boxes touch the metal
+                are subtracted from it, they are found with a BucketIndex
+                of the empty bounding boxes, so the cost stays local.
+        '''
+        empty_index = None
+        empty_boxes = [ (j, empty.bbox()) for j, (metal, empty) in enumerate( contributions )
+                        if( not empty.is_empty() ) ]
+        if( empty_boxes ):
+            sizes = sorted( max( box.width(), box.height() ) for j, box in empty_boxes )
+            extent = klayout.db.Box()
+            for j, box in empty_boxes:
+                extent += box
+            # typical box size, but not so small that a large box fills too many buckets
+            bucket_size = max( sizes[len( sizes )//2], max( extent.width(), extent.height() )/64, 1 )
+            empty_index = BucketIndex( bucket_size )
+            for j, box in empty_boxes:
+                empty_index.insert( j, box )
+        
+        erase_all = Region()
+        metal_kept = Region()
+        for i, (metal, empty) in enumerate( contributions ):
+            erase_all += empty
+            if( metal.is_empty() ):
+                continue
+            erase = Region()
+            if( empty_index is not None ):
+                for j in sorted( empty_index.query( metal.bbox() ) ):
+                    if( j >= i ):
+                        erase += contributions[j][1]
+            if( erase.is_empty() ):
+                metal_kept += metal
+            else:
+                metal_kept += metal - erase
+        
+        if( not erase_all.is_empty() and not r_cell.is_empty() ):
+            r_cell -= erase_all
+        r_cell |= metal_kept
+        return r_cell
+
@@ -0,0 +1,124 @@
+'''
+@brief: electrical parameters of the coplanar waveguide by conformal mapping.
+        All functions accept numpy arrays (or floats) that are broadcasted against
+        each other. Lengths are in nm as everywhere in ClassLib.
+
+        k0 = width/(width + 2*gap)
+        eps_eff = 1 + (eps_r - 1)/2 * K(k1)/K(k1') * K(k0')/K(k0),
+                  k1 = sinh(pi*width/4h)/sinh(pi*(width + 2*gap)/4h), k1 -> k0 for h -> inf
+        L_geom = mu0/4 * K(k0')/K(k0),  C = 4*eps0*eps_eff * K(k0)/K(k0')
+        Z0 = sqrt(L/C),  v_ph = 1/sqrt(L*C),  L = L_geom + L_kin
+        Kinetic inductance of the thin film with the sheet inductance L_sq and
+        the thickness t (Watanabe et al., Jpn. J. Appl. Phys. 33, 5708 (1994)):
+        L_kin = L_sq*(g_c + g_g)
+'''
+from functools import lru_cache
+
+import numpy as np
+
+_c = 299792458.0
+_mu0 = 4e-7*np.pi
+_eps0 = 1/(_mu0*_c**2)
+_NM = 1e-9
+
+
+def ellipk( k ):
+    '''
+    @brief: complete elliptic integral of the first kind K(k) of the modulus k
+            by the arithmetic-geometric mean, K(k) = pi/(2*AGM(1, sqrt(1 - k^2)))
+    @params:  k - float or numpy array, 0 <= k < 1
+    @return: numpy array
+    '''
+    a = np.ones_like( np.asarray( k, dtype=float ) )
+    b = np.sqrt( 1 - np.asarray( k, dtype=float )**2 )
+    # converges quadratically, 8 iterations are enough unless k is very close to 1
+    for _ in range( 64 ):
+        a, b = (a + b)/2, np.sqrt( a*b )
+        if( np.all( np.abs( a - b ) <= 1e-15*a ) ):
+            break
+    return np.pi/(2*a)
+
+
+def ellipk_ratio( k ):
+    '''
+    @brief: K(k')/K(k), k' = sqrt(1 - k^2)
+    '''
+    k = np.asarray( k, dtype=float )
+    return ellipk( np.sqrt( 1 - k**2 ) )/ellipk( k )
+
+
+def _kinetic_factor( width, gap, thickness ):
+    # g_c + g_g of Watanabe et al., in 1/m
+    k = width/(width + 2*gap)
+    w = width*_NM
+    t = thickness*_NM
+    K = ellipk( k )
+    log_k = np.log( (1 + k)/(1 - k) )
+    common = 1/(4*w*(1 - k**2)*K**2)
+    g_c = common*(np.pi + np.log( 4*np.pi*w/t ) - k*log_k)
+    g_g = k*common*(np.pi + np.log( 4*np.pi*(w + 2*gap*_NM)/t ) - log_k/k)
+    return g_c + g_g
+
+
+def cpw_electrical( width, gap, eps_r, h=None, sheet_inductance=0, thickness=None ):
+    '''
+    @brief: electrical parameters of the CPW with infinite ground planes on the
+            substrate of the thickness h
+    @params:  width - width of the central conductor, nm
+              gap - gap between the central conductor and the ground, nm
+              eps_r - relative permittivity of the substrate
+              h - thickness of the substrate, nm, infinite if None
+              sheet_inductance - kinetic sheet inductance of the film, H/square
+              thickness - film thickness, nm, required if sheet_inductance != 0
+    @return: dict of numpy arrays:
+                "Z0" - characteristic impedance, Ohm
+                "eps_eff" - effective permittivity (of the geometric inductance)
+                "v_ph" - phase velocity, m/s
+                "L" - inductance per unit length, H/m (geometric and kinetic)
+                "L_kin" - kinetic inductance per unit length, H/m
+                "C" - capacitance per unit length, F/m
+    '''
+    width = np.asarray( width, dtype=float )
+    gap = np.asarray( gap, dtype=float )
+    eps_r = np.asarray( eps_r, dtype=float )
+    k0 = width/(width + 2*gap)
+    ratio0 = ellipk_ratio( k0 )      # K(k0')/K(k0)
+
+    if( h is None ):
+        eps_eff = (eps_r + 1)/2
+    else:
+        h = np.asarray( h, dtype=float )
+        k1 = np.sinh( np.pi*width/(4*h) )/np.sinh( np.pi*(width + 2*gap)/(4*h) )
+        eps_eff = 1 + (eps_r - 1)/2*ratio0/ellipk_ratio( k1 )
+
+    L_geom = _mu0/4*ratio0
+    C = 4*_eps0*eps_eff/ratio0
+    if( np.any( np.asarray( sheet_inductance ) != 0 ) ):
+        if( thickness is None ):
+            raise ValueError( "cpw_electrical: film thickness is required for the kinetic inductance" )
+        L_kin = sheet_inductance*_kinetic_factor( width, gap, thickness )
+    else:
+        L_kin = np.zeros_like( L_geom )
+    L = L_geom + L_kin
+    return { "Z0": np.sqrt( L/C ),
+             "eps_eff": eps_eff,
+             "v_ph": 1/np.sqrt( L*C ),
+             "L": L,
+             "L_kin": L_kin,
+             "C": C }
+
+
+@lru_cache( maxsize=4096 )
+def _cpw_electrical_cached( width, gap, eps_r, h, sheet_inductance, thickness ):
+    return { key: float( value ) for key, value in
+             cpw_electrical( width, gap, eps_r, h, sheet_inductance, thickness ).items() }
+
+
+def cpw_electrical_scalar( width, gap, eps_r, h=None, sheet_inductance=0, thickness=None ):
+    '''
+    @brief: cpw_electrical(...) for floats, repeated evaluations are cached
+    @return: dict of floats, see cpw_electrical(...)
+    '''
+    return dict( _cpw_electrical_cached( float( width ), float( gap ), float( eps_r ),
+                                         None if h is None else float( h ), float( sheet_inductance ),
+                                         None if thickness is None else float( thickness ) ) )
@@ -37,40 +37,25 @@ class CWave2CPW( Element_Base ):
         self.n_pts = n_pts
         super().__init__(self.c_wave_ref.origin, trans_in)
 
-    def _get_solid_arc( self, center, R, width, alpha_start, alpha_end, n_inner, n_outer ):
-        pts = []
-
-        d_alpha_inner = (alpha_end - alpha_start)/(n_inner - 1)
-        d_alpha_outer = -(alpha_end - alpha_start)/(n_outer-1)
-
-        for i in range( 0,n_inner ):
-            alpha = alpha_start + d_alpha_inner*i
-            pts.append( center + DPoint( cos( alpha ), sin( alpha ) )*(R - width/2) )
-        for i in range( 0,n_outer ):
-            alpha = alpha_end + d_alpha_outer*i
-            pts.append( center + DPoint( cos( alpha ), sin( alpha ) )*(R + width/2) )
-
-        return DSimplePolygon( pts )
-
     def init_regions( self ):
         origin = DPoint(0,0)
-        arc_1_solid = self._get_solid_arc( origin, self.c_wave_ref.in_circle.r + self.gap1 + self.width1/2, self.width1,
+        arc_1_solid = ring_sector( origin, self.c_wave_ref.in_circle.r + self.gap1 + self.width1/2, self.width1,
                                                     pi/2 - self.d_alpha1/2, pi/2 + self.d_alpha1/2,
                                                     self.n_pts,self.n_pts )
-        arc_1_empty = self._get_solid_arc( origin, self.c_wave_ref.in_circle.r + self.gap1/2, self.gap1,
+        arc_1_empty = ring_sector( origin, self.c_wave_ref.in_circle.r + self.gap1/2, self.gap1,
                                                     pi/2 - self.d_alpha1/2, pi/2 + self.d_alpha1/2,
                                                     self.n_pts,self.n_pts )
 
-        arc_2_solid = self._get_solid_arc( origin, self.c_wave_ref.in_circle.r + self.gap2 + self.width2/2, self.width2,
+        arc_2_solid = ring_sector( origin, self.c_wave_ref.in_circle.r + self.gap2 + self.width2/2, self.width2,
                                                     3/2*pi - self.d_alpha2/2, 3/2*pi + self.d_alpha2/2,
                                                     self.n_pts,self.n_pts )
-        arc_2_empty = self._get_solid_arc( origin, self.c_wave_ref.in_circle.r + self.gap2/2, self.gap2,
+        arc_2_empty = ring_sector( origin, self.c_wave_ref.in_circle.r + self.gap2/2, self.gap2,
                                                     3/2*pi - self.d_alpha2/2, 3/2*pi + self.d_alpha2/2,
                                                     self.n_pts,self.n_pts )
-        self.metal_region.insert( arc_1_solid )
-        self.metal_region.insert( arc_2_solid )
-        self.empty_region.insert( arc_1_empty )
-        self.empty_region.insert( arc_2_empty )
+        self.metal_region.insert( to_simple_polygon( arc_1_solid ) )
+        self.metal_region.insert( to_simple_polygon( arc_2_solid ) )
+        self.empty_region.insert( to_simple_polygon( arc_1_empty ) )
+        self.empty_region.insert( to_simple_polygon( arc_2_empty ) )
 
 class CWave( Complex_Base ):
     '''
@@ -486,26 +471,30 @@ class Capacitor_Interdigitated( Element_Base ):
             y2 = self.pad_width
             cy1 = y1 - self.fing_len
             cy2 = y1 - self.inter_dig_gap
-        for i in range(self.N):
-            p1 = DPoint(i*unit_cell_wid - cap_wid/2 + self.fing_wid, y1)
-            p2 = DPoint(i*unit_cell_wid - cap_wid/2, cy1)
-            p3 = DPoint(p1.x, y2)
-            p4 = p1 + DPoint(self.fing_gap,0)
-            p5 = DPoint(p4.x + self.fing_wid,cy2)
-            p6 = DPoint(p4.x, p3.y)
-            p7 = DPoint(p5.x, p4.y)
-            p8 = DPoint(p7.x + self.fing_gap, p6.y)
-
-            #First finger of unit-cell
-            self.metal_region.insert(klayout.db.Box().from_dbox(klayout.db.DBox( p1, p2 )))
-            self.empty_region.insert(klayout.db.Box().from_dbox(klayout.db.DBox( p2, p3 )))
-            self.empty_region.insert(klayout.db.Box().from_dbox(klayout.db.DBox( p1, p6 )))
-            #Second finger of unit-cell
-            if not odd_config or i < self.N-1:
-                self.metal_region.insert(klayout.db.Box().from_dbox(klayout.db.DBox( p5, p6 )))
-                self.empty_region.insert(klayout.db.Box().from_dbox(klayout.db.DBox( p4, p5 )))
-                if i < self.N-1:    #Don't need empty region on final finger...
-                    self.empty_region.insert(klayout.db.Box().from_dbox(klayout.db.DBox( p7, p8 )))
+        x1 = np.arange(self.N)*unit_cell_wid - cap_wid/2 + self.fing_wid    #p1.x
+        x4 = x1 + self.fing_gap                                             #p4.x
+        x7 = x4 + self.fing_wid                                             #p7.x
+        x0 = x1 - self.fing_wid                                             #p2.x
+        x8 = x7 + self.fing_gap                                             #p8.x
+        ones = np.ones_like(x1)
+        # rows (x1, y1, x2, y2) of the boxes, in the order they are inserted for every unit-cell
+        #First finger of unit-cell
+        metal = [np.column_stack((x1, y1*ones, x0, cy1*ones))]                 #p1, p2
+        empty = [np.column_stack((x0, cy1*ones, x1, y2*ones)),                 #p2, p3
+                 np.column_stack((x1, y1*ones, x4, y2*ones))]                  #p1, p6
+        #Second finger of unit-cell
+        metal.append(np.column_stack((x7, cy2*ones, x4, y2*ones)))             #p5, p6
+        empty.append(np.column_stack((x4, y1*ones, x7, cy2*ones)))             #p4, p5
+        empty.append(np.column_stack((x7, y1*ones, x8, y2*ones)))              #p7, p8
+        
+        every = np.ones(self.N, dtype=bool)
+        not_last = np.arange(self.N) < self.N-1
+        second_finger = not_last if odd_config else every
+        metal_mask = np.column_stack((every, second_finger))
+        #Don't need empty region on final finger...
+        empty_mask = np.column_stack((every, every, second_finger, not_last))
+        insert_boxes(self.metal_region, np.stack(metal, axis=1)[metal_mask])
+        insert_boxes(self.empty_region, np.stack(empty, axis=1)[empty_mask])
 
         #Padding on left and right hand sides
         self.empty_region.insert(klayout.db.DBox( DPoint(-cap_wid/2-self.side_gap,0), DPoint(-cap_wid/2,yUpper+self.pad_width) ))
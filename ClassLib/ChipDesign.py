@@ -1,6 +1,8 @@
 import klayout.db
 from klayout.db import Region
 from ClassLib import PROGRAM
+from ClassLib.BaseClasses import Element_Base
+from ClassLib.GeometryKernel import arc_tolerance, dbu_arc_tolerance
 
 from collections import OrderedDict
 
@@ -9,28 +11,47 @@ class Chip_Design:
                     and override draw() method where other drawing
                     methods should be called from
                     call show() to draw everything
+                    Without KLayout GUI (e.g. standalone "klayout" python
+                    module or "klayout -b") the design is drawn on a plain
+                    klayout.db.Layout and self.lv, self.cv are None
         @params:    str cell_name - name of a cell, e.g. 'testScript'
     """
+    # arc tolerance of the design in the design units, see arc_tolerance_scope().
+    # Override it in the design class, if None it is derived from the layout dbu
+    arc_tolerance = None
+
     def __init__(self, cell_name):
-        # getting main references of the application
-        app = klayout.db.Application.instance()
-        mw = app.main_window()
-        self.lv = mw.current_view()
+        self.lv = None
         self.cv = None
         self.cell = None
         self.region_ph = Region()
         self.region_el = Region()
-        
-        #this insures that lv and cv are valid objects
-        if(self.lv == None):
-            self.cv = mw.create_layout(1)
+
+        # getting main references of the application
+        mw = None
+        if( hasattr(klayout.db, "Application") ):
+            app = klayout.db.Application.instance()
+            if( app is not None ):
+                mw = app.main_window()
+
+        if( mw is not None ):
             self.lv = mw.current_view()
+            #this insures that lv and cv are valid objects
+            if(self.lv == None):
+                self.cv = mw.create_layout(1)
+                self.lv = mw.current_view()
+            else:
+                self.cv = self.lv.active_cellview()
+            layout = self.cv.layout()
         else:
-            self.cv = self.lv.active_cellview()
+            # headless mode
+            layout = klayout.db.Layout()
+        self.layout = layout
 
         # find or create the desired by programmer cell and layer
-        layout = self.cv.layout()
         layout.dbu = 0.001
+        if( self.arc_tolerance is None ):
+            self.arc_tolerance = dbu_arc_tolerance(layout.dbu)
         if(layout.has_cell(cell_name)):
             self.cell = layout.cell(cell_name)
         else:
@@ -45,12 +66,22 @@ class Chip_Design:
         self.cell.clear()
 
         # setting layout view  
-        self.lv.select_cell(self.cell.cell_index(), 0)
-        self.lv.add_missing_layers()
+        if( self.lv is not None ):
+            self.lv.select_cell(self.cell.cell_index(), 0)
+            self.lv.add_missing_layers()
 
         # design parameters that were passed to the last
         # self.draw(...) call are stored here as ordered dict
         self.design_pars = OrderedDict()
+
+    def arc_tolerance_scope(self):
+        '''
+        @brief: context manager that makes the elements created inside
+                of it use self.arc_tolerance, e.g. in draw():
+                    with self.arc_tolerance_scope():
+                        ...
+        '''
+        return arc_tolerance(self.arc_tolerance)
     
     # Call other methods drawing parts of the design from here
     def draw(self, design_params=None):
@@ -71,6 +102,8 @@ class Chip_Design:
     # Call this m
     def show(self, design_params=None):
         self.__transfer_reg2cell()
+        if( Element_Base.profiler is not None ):
+            Element_Base.profiler.dump()
 
     def __transfer_reg2cell(self):
         # this too methods assumes that all previous drawing
@@ -80,7 +113,8 @@ class Chip_Design:
         # polygons
         self.cell.shapes(self.layer_ph).insert(self.region_ph)
         self.cell.shapes(self.layer_el).insert(self.region_el)
-        self.lv.zoom_fit()
+        if( self.lv is not None ):
+            self.lv.zoom_fit()
     
     # Erases everything outside the box
     def crop(self, box, layer=None):
@@ -114,5 +148,20 @@ class Chip_Design:
         slo.gds2_max_cellname_length = 32000
         slo.gds2_max_vertex_count = 8000
         slo.gds2_write_timestamps = True
+        self._save(filename, slo)
+
+    # Save your design as OASIS
+    def save_as_oasis(self, filename):
+        slo = klayout.db.SaveLayoutOptions()
+        slo.format = 'OASIS'
+        slo.oasis_compression_level = 10
+        self._save(filename, slo)
+
+    def _save(self, filename, slo):
         slo.select_all_layers()
-        self.lv.save_as(self.cell.cell_index(), filename, slo)
\ No newline at end of file
+        if( self.lv is not None ):
+            self.lv.save_as(self.cell.cell_index(), filename, slo)
+        else:
+            # only the design cell and its children are written
+            slo.select_cell(self.cell.cell_index())
+            self.layout.write(filename, slo)
\ No newline at end of file
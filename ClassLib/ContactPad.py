@@ -27,6 +27,11 @@ class Contact_Pad(Element_Base):
 
 
 
+    def init_connections(self):
+        x = self._ground_connector_width+self._back_gap
+        self.connections = [DPoint(0,0), DPoint(x+self._pad_length+self._transition_length, 0)]
+        self.angle_connections = [pi,0]
+
     def init_regions(self):
 
         w_pad, g_pad = self._pad_cpw_params["w"], self._pad_cpw_params["g"]
@@ -57,6 +62,4 @@ class Contact_Pad(Element_Base):
 
         self.empty_region.insert(empty_region)
 
-
-        self.connections = [DPoint(0,0), DPoint(x+self._pad_length+self._transition_length, 0)]
-        self.angle_connections = [pi,0]
+        self.init_connections()
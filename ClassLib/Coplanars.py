@@ -1,9 +1,22 @@
 import klayout.db
+import hashlib
 from math import sqrt, cos, sin, atan2, pi, copysign, tan
 from klayout.db import Point,DPoint,DSimplePolygon,SimplePolygon, DPolygon, Polygon,  Region
 from klayout.db import Trans, DTrans, CplxTrans, DCplxTrans, ICplxTrans
 
 from ClassLib.BaseClasses import *
+from ClassLib.BaseClasses import _linear_part
+from ClassLib.GeometryKernel import *
+from ClassLib.CPWCalculator import *
+
+
+def _overlapping_angles( alpha_start, alpha_end ):
+    # arcs are extended by 1e-3 rad to overlap with the adjacent segments
+    if alpha_end > alpha_start:
+        return alpha_start - 1e-3, alpha_end + 1e-3
+    else:
+        return alpha_start + 1e-3, alpha_end - 1e-3
+
 
 class CPWParameters:
   def __init__(self, width, gap):
@@ -11,6 +24,21 @@ class CPWParameters:
     self.gap = gap
     self.b = 2*gap + width
 
+  def electrical(self, eps_r, h=None, sheet_inductance=0, thickness=None):
+    '''
+    @brief: Z0, eps_eff, v_ph, L, L_kin and C of this CPW, see CPWCalculator.cpw_electrical(...)
+    '''
+    return cpw_electrical_scalar(self.width, self.gap, eps_r, h, sheet_inductance, thickness)
+
+  def impedance(self, eps_r, h=None, sheet_inductance=0, thickness=None):
+    return self.electrical(eps_r, h, sheet_inductance, thickness)["Z0"]
+
+  def eps_eff(self, eps_r, h=None):
+    return self.electrical(eps_r, h)["eps_eff"]
+
+  def phase_velocity(self, eps_r, h=None, sheet_inductance=0, thickness=None):
+    return self.electrical(eps_r, h, sheet_inductance, thickness)["v_ph"]
+
 class CPW( Element_Base ):
     '''
     Base class representing a single coplanar waveguide
@@ -31,6 +59,8 @@ class CPW( Element_Base ):
         cpw_params: CPWParameters 
             Base CPWParameters you can inherit from. If None, it will use width and gap.
     '''
+    cache_key_attributes = ( "width", "gap", "dr", "gndWidth" )
+    
     def __init__(self, width=None, gap=None, start=DPoint(0,0), end=DPoint(0,0), gndWidth=-1, trans_in=None, cpw_params=None ):
         if( cpw_params  is None ):
             self.width = width
@@ -52,25 +82,35 @@ class CPW( Element_Base ):
         self.alpha_start = self.angle_connections[0]
         self.alpha_end = self.angle_connections[1]
         
-    def init_regions( self ):
+    def init_connections( self ):
         self.connections = [DPoint(0,0),self.dr]
         self.start = DPoint(0,0)
         self.end = self.start + self.dr
         alpha = atan2( self.dr.y, self.dr.x )
         self.angle_connections = [alpha,alpha]
+        self.connection_edges = [3,1]
+        
+    def init_regions( self ):
+        self.init_connections()
+        alpha = atan2( self.dr.y, self.dr.x )
         alpha_trans = ICplxTrans().from_dtrans( DCplxTrans( 1,alpha*180/pi,False, self.start ) )
         
         metal_poly = DSimplePolygon( [DPoint(0,-self.width/2),
                                                        DPoint(self.dr.abs(),-self.width/2), 
                                                        DPoint(self.dr.abs(),self.width/2),
                                                        DPoint(0,self.width/2)] )
-        self.connection_edges = [3,1]
         self.metal_region.insert( klayout.db.SimplePolygon().from_dpoly( metal_poly ) )
         if( self.gap != 0 ):
             self.empty_region.insert( klayout.db.Box( Point().from_dpoint(DPoint(0,self.width/2)), Point().from_dpoint(DPoint( self.dr.abs(), self.width/2 + self.gap )) ) )
             self.empty_region.insert( klayout.db.Box( Point().from_dpoint(DPoint(0,-self.width/2-self.gap)), Point().from_dpoint(DPoint( self.dr.abs(), -self.width/2 )) ) )
         self.metal_region.transform( alpha_trans )
         self.empty_region.transform( alpha_trans )
+    
+    def _centerline( self ):
+        # see centerline_pieces(...), connections are kept up to date when the element is a primitive
+        start, end = self.connections[0], self.connections[1]
+        dr = end - start
+        return [('L', start, atan2( dr.y, dr.x ), dr.abs(), self.b)], DCplxTrans()
         
         
 class Air_bridges( Element_Base ):
@@ -95,6 +135,8 @@ class Air_bridges( Element_Base ):
         cpw_params: CPWParameters 
             Base CPWParameters you can inherit from. If None, it will use width and gap.
     '''
+    cache_key_attributes = ( "N_air_bridges", "width", "gap", "b", "dr", "gndWidth" )
+    
     def __init__(self,  N_air_bridges, width=None, gap=None, start=DPoint(0,0), end=DPoint(0,0), gndWidth=-1, trans_in=None, cpw_params=None ):
         if( cpw_params  is None ):
             self.width = width
@@ -117,27 +159,43 @@ class Air_bridges( Element_Base ):
         self.alpha_start = self.angle_connections[0]
         self.alpha_end = self.angle_connections[1]
         
-    def init_regions( self ):
+    def init_connections( self ):
         self.connections = [DPoint(0,0),self.dr]
         self.start = DPoint(0,0)
         self.end = self.start + self.dr
-        self.L0 = self.start.distance(self.end) / (self.N_air_bridges +1)
         alpha = atan2( self.dr.y, self.dr.x )
         self.angle_connections = [alpha,alpha]
+        
+    def init_regions( self ):
+        self.init_connections()
+        self.L0 = self.start.distance(self.end) / (self.N_air_bridges +1)
+        alpha = atan2( self.dr.y, self.dr.x )
         alpha_trans = ICplxTrans().from_dtrans( DCplxTrans( 1,alpha*180/pi,False, self.start ) )
-        for i in range(self.N_air_bridges):
-            self.air_bridge = klayout.db.DBox( DPoint((i+1)*self.L0, -self.b/2 - 2e3), DPoint((i+1)*self.L0+2e3, self.b/2 + 2e3) ) 
-            self.metal_region.insert( klayout.db.Box().from_dbox( self.air_bridge ) )
-            
-            self.air_bridge_2 = klayout.db.DBox( DPoint((i+1)*self.L0-self.b/4+1e3, -self.b/2 - 2e3), DPoint((i+1)*self.L0+1e3+self.b/4, -self.b/2 - 4e3) ) 
-            self.metal_region.insert( klayout.db.Box().from_dbox( self.air_bridge_2 ) )
-            
-            self.air_bridge_3 = klayout.db.DBox( DPoint((i+1)*self.L0-self.b/4+1e3, self.b/2 + 2e3), DPoint((i+1)*self.L0+1e3+self.b/4, self.b/2 + 4e3) ) 
-            self.metal_region.insert( klayout.db.Box().from_dbox( self.air_bridge_3 ) )
+        x = (np.arange( self.N_air_bridges ) + 1)*self.L0
+        ones = np.ones_like( x )
+        # bridge and its two pads, rows (x1, y1, x2, y2) for every bridge
+        bridges = np.stack( (
+            np.column_stack( (x, -(self.b/2 + 2e3)*ones, x + 2e3, (self.b/2 + 2e3)*ones) ),
+            np.column_stack( (x - self.b/4 + 1e3, -(self.b/2 + 2e3)*ones, x + 1e3 + self.b/4, -(self.b/2 + 4e3)*ones) ),
+            np.column_stack( (x - self.b/4 + 1e3, (self.b/2 + 2e3)*ones, x + 1e3 + self.b/4, (self.b/2 + 4e3)*ones) )
+        ), axis=1 )
+        insert_boxes( self.metal_region, bridges )
        
         self.metal_region.transform( alpha_trans )
 
 
+def _arc_centerline( arc ):
+    # centerline piece of CPW_arc or CPW_arc_2 in the layout frame. The turn angle
+    # is the one the arc is built with, the difference of angle_connections is
+    # wrapped to (-pi, pi] and is wrong for the arcs that cross the -x axis.
+    start, center = arc.connections[0], arc.connections[2]
+    delta_alpha = -arc.delta_alpha if arc._local_trans.is_mirror() else arc.delta_alpha
+    sign = 1 if delta_alpha > 0 else -1
+    r = start - center
+    # tangent at the start, the center is on the left of the left turns
+    alpha = atan2( r.y, r.x ) + sign*pi/2
+    return [('R', start, alpha, (center, r.abs(), delta_alpha), arc.width + 2*arc.gap)]
+    
 class CPW_arc( Element_Base ):
     '''
     Base class representing a single coplanar waveguide arc
@@ -155,9 +213,14 @@ class CPW_arc( Element_Base ):
             Width of the ground to be drawn
         trans_in: Transformation
             KLayout transformation to be processed during execution
+        arc_tolerance: float
+            Maximal distance between the arc and its polygon. If None, it will use current_arc_tolerance()
     '''
-    def __init__(self, Z0, start, R, delta_alpha, gndWidth = -1, trans_in=None ):
+    cache_key_attributes = ( "R", "width", "gap", "delta_alpha", "dr", "arc_tolerance" )
+    
+    def __init__(self, Z0, start, R, delta_alpha, gndWidth = -1, trans_in=None, arc_tolerance=None ):
         self.R = R
+        self.arc_tolerance = current_arc_tolerance() if arc_tolerance is None else arc_tolerance
         self.start = start
         self.center = start + DPoint( 0,self.R )
         self.end = self.center + DPoint( sin(delta_alpha), -cos(delta_alpha) )*self.R
@@ -180,63 +243,50 @@ class CPW_arc( Element_Base ):
         self.alpha_start = self.angle_connections[0]
         self.alpha_end = self.angle_connections[1]
 
-    def _get_solid_arc( self, center, R, width, alpha_start, alpha_end, n_inner, n_outer ):
-        pts = []
-#        print(alpha_start/pi, alpha_end/pi, cos( alpha_start ), cos( alpha_end ),
-#                         sin(alpha_start), sin(alpha_end))
-                         
-        if alpha_end > alpha_start:
-            alpha_start = alpha_start - 1e-3 
-            alpha_end = alpha_end + 1e-3
-        else:
-            alpha_start = alpha_start + 1e-3
-            alpha_end = alpha_end - 1e-3
-        
-        d_alpha_inner = (alpha_end - alpha_start)/(n_inner - 1)
-        d_alpha_outer = -d_alpha_inner
-        
-        
-#        print("Center:", center)
-        
-        for i in range(0, n_inner):
-            alpha = alpha_start + d_alpha_inner*i
-            pts.append(center + DPoint(cos(alpha), sin(alpha))*(R - width/2))
-        for i in range(0, n_outer):
-            alpha = alpha_end + d_alpha_outer*i
-            pts.append(center + DPoint(cos(alpha), sin(alpha))*(R + width/2))
-#        print("Points:", pts[:n_inner],"\n       ", pts[n_inner:], "\n")
-        return DSimplePolygon(pts)
-        
-    def init_regions(self):
+    def init_connections(self):
         self.connections = [DPoint(0, 0), self.dr, DPoint(0, self.R)]
         self.angle_connections = [self.alpha_start, self.alpha_end]
         self.start = DPoint(0, 0)
         self.end = self.dr
         self.center = DPoint(0, self.R)
         
-        n_inner = 200
-        n_outer = 200
+    def init_regions(self):
+        self.init_connections()
+        
+        # the outermost edge of the gaps has the largest chord error
+        n_inner = arc_points_number( abs(self.R) + self.width/2 + self.gap,
+                                     self.alpha_end - self.alpha_start + 2e-3, self.arc_tolerance )
+        n_outer = n_inner
+        
+        alpha_start, alpha_end = _overlapping_angles(self.alpha_start - pi/2, self.alpha_end - pi/2)
         
-        metal_arc = self._get_solid_arc(self.center, self.R, self.width, 
-                    self.alpha_start - pi/2, self.alpha_end - pi/2, n_inner, n_outer)  
+        metal_arc = ring_sector(self.center, self.R, self.width, 
+                    alpha_start, alpha_end, n_inner, n_outer)  
         self.connection_edges = [n_inner+n_outer,n_inner]
         
-        empty_arc1 = self._get_solid_arc(self.center, self.R - (self.width + self.gap)/2, 
-                    self.gap, self.alpha_start - pi/2, self.alpha_end - pi/2, n_inner, n_outer)  
+        empty_arc1 = ring_sector(self.center, self.R - (self.width + self.gap)/2, 
+                    self.gap, alpha_start, alpha_end, n_inner, n_outer)  
         
-        empty_arc2 = self._get_solid_arc(self.center, self.R + (self.width + self.gap)/2, 
-                    self.gap, self.alpha_start - pi/2, self.alpha_end - pi/2, n_inner, n_outer)  
+        empty_arc2 = ring_sector(self.center, self.R + (self.width + self.gap)/2, 
+                    self.gap, alpha_start, alpha_end, n_inner, n_outer)  
         
-        self.metal_region.insert(SimplePolygon().from_dpoly(metal_arc))
-        self.empty_region.insert(SimplePolygon().from_dpoly(empty_arc1))
-        self.empty_region.insert(SimplePolygon().from_dpoly(empty_arc2))
+        self.metal_region.insert(to_simple_polygon(metal_arc))
+        self.empty_region.insert(to_simple_polygon(empty_arc1))
+        self.empty_region.insert(to_simple_polygon(empty_arc2))
+    
+    def _centerline(self):
+        # see centerline_pieces(...)
+        return _arc_centerline(self), DCplxTrans()
         
         
 class CPW_arc_2( Element_Base ):
 # Just a small change compared to CPW_arc, now alpha-start is an input parameter so that 
 # we can start with a non-horizontal segment 
-    def __init__(self, Z0, start, R, delta_alpha, alpha_start, gndWidth = -1, trans_in=None ):
+    cache_key_attributes = ( "R", "width", "gap", "alpha_start", "delta_alpha", "dr", "arc_tolerance" )
+    
+    def __init__(self, Z0, start, R, delta_alpha, alpha_start, gndWidth = -1, trans_in=None, arc_tolerance=None ):
         self.R = R
+        self.arc_tolerance = current_arc_tolerance() if arc_tolerance is None else arc_tolerance
         self.start = start
         self.delta_alpha = delta_alpha
         self.alpha_start = alpha_start
@@ -260,56 +310,40 @@ class CPW_arc_2( Element_Base ):
         self.alpha_start = self.angle_connections[0]
         self.alpha_end = self.angle_connections[1]
 
-    def _get_solid_arc( self, center, R, width, alpha_start, alpha_end, n_inner, n_outer ):
-        pts = []
-#        print(alpha_start/pi, alpha_end/pi, cos( alpha_start ), cos( alpha_end ),
-#                         sin(alpha_start), sin(alpha_end))
-                         
-        if alpha_end > alpha_start:
-            alpha_start = alpha_start - 1e-3 
-            alpha_end = alpha_end + 1e-3
-        else:
-            alpha_start = alpha_start + 1e-3
-            alpha_end = alpha_end - 1e-3
-        
-        d_alpha_inner = (alpha_end - alpha_start)/(n_inner - 1)
-        d_alpha_outer = -d_alpha_inner
-        
-        
-#        print("Center:", center)
-        
-        for i in range(0, n_inner):
-            alpha = alpha_start + d_alpha_inner*i
-            pts.append(center + DPoint(cos(alpha), sin(alpha))*(R - width/2))
-        for i in range(0, n_outer):
-            alpha = alpha_end + d_alpha_outer*i
-            pts.append(center + DPoint(cos(alpha), sin(alpha))*(R + width/2))
-#        print("Points:", pts[:n_inner],"\n       ", pts[n_inner:], "\n")
-        return DSimplePolygon(pts)
-        
-    def init_regions(self):
+    def init_connections(self):
         self.connections = [DPoint(0, 0), self.dr,- self.R * DPoint( cos(self.alpha_start), sin(self.alpha_start) ) ]
         self.angle_connections = [self.alpha_start, self.alpha_end]
         self.start = DPoint(0, 0)
         self.end = self.dr
         self.center =  self.start - self.R * DPoint( cos(self.alpha_start), sin(self.alpha_start) )
         
-        n_inner = 200
-        n_outer = 200
+    def init_regions(self):
+        self.init_connections()
+        
+        # the outermost edge of the gaps has the largest chord error
+        n_inner = arc_points_number( abs(self.R) + self.width/2 + self.gap,
+                                     self.alpha_end - self.alpha_start + 2e-3, self.arc_tolerance )
+        n_outer = n_inner
+        
+        alpha_start, alpha_end = _overlapping_angles(self.alpha_start, self.alpha_end)
         
-        metal_arc = self._get_solid_arc(self.center, self.R, self.width, 
-                    self.alpha_start , self.alpha_end , n_inner, n_outer)  
+        metal_arc = ring_sector(self.center, self.R, self.width, 
+                    alpha_start, alpha_end, n_inner, n_outer)  
         self.connection_edges = [n_inner+n_outer,n_inner]
         
-        empty_arc1 = self._get_solid_arc(self.center, self.R - (self.width + self.gap)/2, 
-                    self.gap, self.alpha_start, self.alpha_end, n_inner, n_outer)  
+        empty_arc1 = ring_sector(self.center, self.R - (self.width + self.gap)/2, 
+                    self.gap, alpha_start, alpha_end, n_inner, n_outer)  
         
-        empty_arc2 = self._get_solid_arc(self.center, self.R + (self.width + self.gap)/2, 
-                    self.gap, self.alpha_start, self.alpha_end, n_inner, n_outer)  
+        empty_arc2 = ring_sector(self.center, self.R + (self.width + self.gap)/2, 
+                    self.gap, alpha_start, alpha_end, n_inner, n_outer)  
         
-        self.metal_region.insert(SimplePolygon().from_dpoly(metal_arc))
-        self.empty_region.insert(SimplePolygon().from_dpoly(empty_arc1))
-        self.empty_region.insert(SimplePolygon().from_dpoly(empty_arc2))
+        self.metal_region.insert(to_simple_polygon(metal_arc))
+        self.empty_region.insert(to_simple_polygon(empty_arc1))
+        self.empty_region.insert(to_simple_polygon(empty_arc2))
+    
+    def _centerline(self):
+        # see centerline_pieces(...)
+        return _arc_centerline(self), DCplxTrans()
         
         
 class Air_bridges_arc( Element_Base ):
@@ -412,11 +446,14 @@ class CPW2CPW( Element_Base ):
         self.alpha_start = self.angle_connections[0]
         self.alpha_end = self.angle_connections[1]
         
-    def init_regions(self):
+    def init_connections(self):
         self.connections = [DPoint(0, 0), DPoint(self.dr.abs(), 0)]
-        self.angle_connections = [0, 0]
         alpha = atan2(self.dr.y, self.dr.x)
         self.angle_connections = [alpha,alpha]
+        
+    def init_regions(self):
+        self.init_connections()
+        alpha = atan2(self.dr.y, self.dr.x)
         alpha_trans = DCplxTrans(1, alpha*180/pi, False, 0, 0)
         
         m_poly = DSimplePolygon([DPoint(0,-self.Z0.width/2), DPoint(self.dr.abs(), -self.Z1.width/2), 
@@ -612,6 +649,195 @@ class Coil_air_bridges_type_2( Complex_Base ):
             
 from collections import Counter
 
+def _broadcast_turns(shape, turn_radiuses, turn_angles):
+    N_turns = shape.count('R')
+    if hasattr(turn_radiuses, "__len__"):
+        if len(turn_radiuses) != N_turns:
+            raise ValueError("Turn raduises dimension mismatch")
+        turn_radiuses = list(turn_radiuses)
+    else:
+        turn_radiuses = [turn_radiuses]*N_turns
+    if hasattr(turn_angles, "__len__"):
+        if len(turn_angles) != N_turns:
+            raise ValueError("Turn angles dimension mismatch")
+        turn_angles = list(turn_angles)
+    else:
+        turn_angles = [turn_angles]*N_turns
+    return turn_radiuses, turn_angles
+
+def _reduced_straight_lengths(shape, turn_radiuses, segment_lengths, turn_angles):
+    '''
+    @brief: lengths of the straight pieces of CPW_RL_Path after they are
+            reduced by the adjacent turns, for a batch of parameter sets.
+            A turn reduces the straight before it and the straight after it
+            by R*|tan(delta_alpha/2)|, so the corners of the equivalent line
+            with sharp turns stay in place. 180 deg turns do not reduce.
+            A turn at the very start of the shape does not reduce the
+            straight after it: the path starts at the beginning of the turn.
+            Lengths that are negative after the reduction are returned as they are.
+    @params:  str shape
+              numpy arrays (B, N_turns), (B, N_straight), (B, N_turns)
+    @return: numpy array (B, N_straight)
+    '''
+    reductions = np.where(np.abs(turn_angles) < pi, turn_radiuses*np.abs(np.tan(turn_angles/2)), 0)
+    straight_lengths = np.array(segment_lengths[:, :shape.count('L')], dtype=float)
+    R_index = 0
+    L_index = 0
+    for i, symbol in enumerate(shape):
+        if( symbol == 'R' ):
+            R_index += 1
+        elif( symbol == 'L' ):
+            # next 'R' segment if exists
+            if( i+1 < len(shape) and shape[i+1] == 'R' ):
+                straight_lengths[:,L_index] -= reductions[:,R_index]
+            # previous 'R' segment if exists
+            if( i-1 > 0 and shape[i-1] == 'R' ):
+                straight_lengths[:,L_index] -= reductions[:,R_index-1]
+            L_index += 1
+    
+    return straight_lengths
+
+class RLPathPlan:
+    
+    def __init__(self, shape, turn_radiuses, segment_lengths, turn_angles):
+        '''
+        Centerline of the CPW_RL_Path computed without building
+        any polygons. The path starts at (0,0) in the direction of
+        the x axis, as the local frame of CPW_RL_Path.
+        
+        Parameters:
+            shape, turn_radiuses, segment_lengths, turn_angles:
+                see CPW_RL_Path
+        
+        Attributes:
+            straight_lengths: list
+                Lengths of the 'L' pieces after they are reduced by the
+                adjacent turns. A negative length is drawn by CPW_RL_Path
+                as a CPW that points backwards, the rest of the path is
+                turned by 180 deg.
+            feasible: bool
+                False if any of the straight_lengths is negative
+            turn_lengths: list
+                Arc lengths of the 'R' pieces
+            pieces: list
+                Tuples (symbol, start, alpha, piece_params) for every symbol
+                of the shape, piece_params is a length for 'L' and
+                (center, R, delta_alpha) for 'R'
+            end: DPoint
+            alpha_end: float
+            total_length: float
+        '''
+        self.shape = shape
+        self.turn_radiuses, self.turn_angles = _broadcast_turns(shape, turn_radiuses, turn_angles)
+        if len(segment_lengths) < shape.count('L'):
+            raise ValueError("Segment lengths dimension mismatch")
+        
+        self.straight_lengths = _reduced_straight_lengths(shape, np.atleast_2d(np.asarray(self.turn_radiuses, dtype=float)),
+                                                          np.atleast_2d(np.asarray(segment_lengths, dtype=float)),
+                                                          np.atleast_2d(np.asarray(self.turn_angles, dtype=float)))[0].tolist()
+        self.turn_lengths = []
+        self.pieces = []
+        R_index = 0
+        L_index = 0
+        position = DPoint(0,0)
+        alpha = 0
+        
+        for symbol in shape:
+            if( symbol == 'R' ):
+                delta_alpha = self.turn_angles[R_index]
+                R = self.turn_radiuses[R_index]
+                # positive angles turn to the left
+                sign = 1 if delta_alpha > 0 else -1
+                center = position + DPoint(-sin(alpha), cos(alpha))*(sign*R)
+                self.pieces.append((symbol, position, alpha, (center, R, delta_alpha)))
+                self.turn_lengths.append(abs(R*delta_alpha))
+                alpha += delta_alpha
+                position = center + DPoint(sin(alpha), -cos(alpha))*(sign*R)
+                R_index += 1
+                
+            elif( symbol == 'L' ):
+                length = self.straight_lengths[L_index]
+                self.pieces.append((symbol, position, alpha, length))
+                position = position + DPoint(cos(alpha), sin(alpha))*length
+                if( length < 0 ):
+                    alpha += pi
+                L_index += 1
+        
+        self.feasible = min(self.straight_lengths, default=0) >= 0
+        self.end = position
+        self.alpha_end = alpha
+        self.total_length = sum(self.straight_lengths) + sum(self.turn_lengths)
+
+def plan_rl_paths(shape, turn_radiuses, segment_lengths, turn_angles):
+    '''
+    @brief: evaluates RLPathPlan for a batch of parameter sets of the same shape
+            with numpy, no polygons and no DPoints are created
+    @params:  str shape - see CPW_RL_Path
+              turn_radiuses - array-like (B, N_turns), (N_turns,) or a float
+              segment_lengths - array-like (B, N_straight) or (N_straight,)
+              turn_angles - array-like (B, N_turns), (N_turns,) or a float
+              B is the number of parameter sets, the inputs are broadcasted against it.
+    @return: dict of numpy arrays
+                "end" - (B,2) end points
+                "alpha_end" - (B,) end angles
+                "straight_lengths" - (B, N_straight) reduced lengths of the 'L' pieces
+                "turn_lengths" - (B, N_turns) arc lengths of the 'R' pieces
+                "total_length" - (B,)
+                "feasible" - (B,) bool, no straight piece is negative after the
+                             reduction, see RLPathPlan.straight_lengths
+    '''
+    N_turns = shape.count('R')
+    N_straight = shape.count('L')
+    segment_lengths = np.atleast_2d(np.asarray(segment_lengths, dtype=float))
+    turn_radiuses = np.asarray(turn_radiuses, dtype=float)
+    turn_angles = np.asarray(turn_angles, dtype=float)
+    if( turn_radiuses.ndim == 0 ):
+        turn_radiuses = np.full(N_turns, turn_radiuses)
+    if( turn_angles.ndim == 0 ):
+        turn_angles = np.full(N_turns, turn_angles)
+    turn_radiuses = np.atleast_2d(turn_radiuses)
+    turn_angles = np.atleast_2d(turn_angles)
+    
+    if( segment_lengths.shape[1] < N_straight ):
+        raise ValueError("Segment lengths dimension mismatch")
+    if( turn_radiuses.shape[1] != N_turns ):
+        raise ValueError("Turn raduises dimension mismatch")
+    if( turn_angles.shape[1] != N_turns ):
+        raise ValueError("Turn angles dimension mismatch")
+    B = max(segment_lengths.shape[0], turn_radiuses.shape[0], turn_angles.shape[0])
+    segment_lengths = np.broadcast_to(segment_lengths, (B, N_straight))
+    turn_radiuses = np.broadcast_to(turn_radiuses, (B, N_turns))
+    turn_angles = np.broadcast_to(turn_angles, (B, N_turns))
+    
+    straight_lengths = _reduced_straight_lengths(shape, turn_radiuses, segment_lengths, turn_angles)
+    
+    # the path is integrated in complex numbers, position += direction*length
+    # for a straight piece and += R*(exp(i*alpha_end) - exp(i*alpha))/i for a turn
+    position = np.zeros(B, dtype=complex)
+    alpha = np.zeros(B)
+    R_index = 0
+    L_index = 0
+    for symbol in shape:
+        if( symbol == 'R' ):
+            new_alpha = alpha + turn_angles[:,R_index]
+            position += np.sign(turn_angles[:,R_index])*turn_radiuses[:,R_index]* \
+                            (np.exp(1j*new_alpha) - np.exp(1j*alpha))/1j
+            alpha = new_alpha
+            R_index += 1
+        elif( symbol == 'L' ):
+            position += np.exp(1j*alpha)*straight_lengths[:,L_index]
+            # a negative straight points backwards
+            alpha = alpha + np.where(straight_lengths[:,L_index] < 0, pi, 0)
+            L_index += 1
+    
+    turn_lengths = np.abs(turn_radiuses*turn_angles)
+    return {"end": np.column_stack((position.real, position.imag)),
+            "alpha_end": alpha,
+            "straight_lengths": straight_lengths,
+            "turn_lengths": turn_lengths,
+            "total_length": straight_lengths.sum(axis=1) + turn_lengths.sum(axis=1),
+            "feasible": (straight_lengths >= 0).all(axis=1)}
+
 class CPW_RL_Path(Complex_Base):
 
     def __init__(self, origin, shape, cpw_parameters, turn_radiuses, 
@@ -622,6 +848,10 @@ class CPW_RL_Path(Complex_Base):
         Segment lengths are treated as the lengths of the segments of
         a line with turn_raduises = 0. Changing turning raduises
         will not alter the position of the end of the line.
+        A turn at the start of the shape begins at the origin, the
+        segment after it is not reduced. A segment that is shorter than
+        the reduction by its turns is drawn backwards and turns the rest
+        of the line by 180 deg, see RLPathPlan.feasible.
         
         TODO: 180 deg turns
         
@@ -660,21 +890,10 @@ class CPW_RL_Path(Complex_Base):
         else:
             self._cpw_parameters = [cpw_parameters]*self._N_elements
         
-        if hasattr(turn_radiuses, "__len__"):
-            if len(turn_radiuses) !=  self._N_turns:
-                raise ValueError("Turn raduises dimension mismatch")
-            self._turn_radiuses = turn_radiuses
-        else:
-            self._turn_radiuses = [turn_radiuses]* self._N_turns
-    
-        self._segment_lengths = segment_lengths
-        
-        if hasattr(turn_angles, "__len__"):
-            if len(turn_angles) !=  self._N_turns:
-                raise ValueError("Turn angles dimension mismatch")
-            self._turn_angles = turn_angles
-        else:
-            self._turn_angles = [turn_angles]* self._N_turns
+        self._turn_radiuses, self._turn_angles = _broadcast_turns(shape, turn_radiuses, turn_angles)
+        # copied, so the lengths of the caller are not reduced by the turns
+        self._segment_lengths = list(segment_lengths)
+        self._plan = RLPathPlan(shape, self._turn_radiuses, self._segment_lengths, self._turn_angles)
         
         super().__init__(origin, trans_in)
         self.start = self.connections[0]
@@ -708,30 +927,10 @@ class CPW_RL_Path(Complex_Base):
                 R_index += 1    
                 
             elif symbol == 'L':
-            
-                # Turns are reducing segments' lengths so as if there were no roundings at all
-                
-                # next 'R' segment if exists
-                if( i+1 < self._N_elements
-                    and self._shape_string[i+1] == 'R' 
-                    and abs(self._turn_angles[R_index]) < pi ):
-                            coeff = abs(tan(self._turn_angles[R_index]/2))
-                            self._segment_lengths[L_index] -= self._turn_radiuses[R_index]*coeff
-                # previous 'R' segment if exists
-                if( i-1 > 0
-                    and self._shape_string[i-1] == 'R' 
-                    and abs(self._turn_angles[R_index-1]) < pi ):    
-                        coeff = abs(tan(self._turn_angles[R_index-1]/2))
-                        self._segment_lengths[L_index] -= self._turn_radiuses[R_index-1]*coeff
-                        
-                #if( self._segment_lengths[L_index] < 0 ):
-                #    print(self._segment_lengths[L_index])
-                #    print("CPW_RL_Path warning: segment length is less than zero")
-                #    print("L_index = {}".format(L_index))
-
-                    
+                # lengths are reduced by the turns, see RLPathPlan
+                length = self._plan.straight_lengths[L_index]
                 cpw = CPW(self._cpw_parameters[i].width, self._cpw_parameters[i].gap,
-                        prev_primitive_end, prev_primitive_end + DPoint(self._segment_lengths[L_index], 0),
+                        prev_primitive_end, prev_primitive_end + DPoint(length, 0),
                             trans_in=DCplxTrans(1, prev_primitive_end_angle*180/pi, False, 0, 0))
                             
                 self.primitives["cpw_"+str(L_index)] = cpw
@@ -745,8 +944,181 @@ class CPW_RL_Path(Complex_Base):
         self.angle_connections = [0, list(self.primitives.values())[-1].alpha_end]
         
     def get_total_length(self):
-        return sum(self._segment_lengths) + \
-            sum([abs(R*alpha) for R, alpha in zip(self._turn_radiuses, self._turn_angles)])
+        return self._plan.total_length
+
+class CPW_Centerline_Path( Element_Base ):
+
+    def __init__(self, origin, shape, cpw_parameters, turn_radiuses, 
+        segment_lengths, turn_angles, trans_in = None, arc_tolerance = None):
+        '''
+        A piecewise-linear coplanar waveguide with rounded turns that
+        is drawn along its centerline. Takes the same parameters as
+        CPW_RL_Path and has the same connections, but the central
+        conductor and each of the gaps are single polygons. There are
+        no primitives per segment and no seams between them.
+        
+        Parameters:
+            origin, shape, cpw_parameters, turn_radiuses, segment_lengths,
+            turn_angles, trans_in:
+                see CPW_RL_Path
+            arc_tolerance: float
+                Maximal distance between the turns and their polygons.
+                If None, it will use current_arc_tolerance()
+        '''
+        self._shape_string = shape
+        self._N_elements = len(shape)
+        self._N_turns = Counter(shape)['R']
+        
+        if hasattr(cpw_parameters, "__len__"):
+            if len(cpw_parameters) != self._N_elements:
+                raise ValueError("CPW parameters dimension mismatch")
+            self._cpw_parameters = list(cpw_parameters)
+        else:
+            self._cpw_parameters = [cpw_parameters]*self._N_elements
+        
+        self._turn_radiuses, self._turn_angles = _broadcast_turns(shape, turn_radiuses, turn_angles)
+        self._segment_lengths = list(segment_lengths)
+        
+        self.arc_tolerance = current_arc_tolerance() if arc_tolerance is None else arc_tolerance
+        
+        super().__init__(origin, trans_in)
+        self.start = self.connections[0]
+        self.end = self.connections[1]
+        self.alpha_start = self.angle_connections[0]
+        self.alpha_end = self.angle_connections[1]
+    
+    def _pieces(self):
+        '''
+        @brief: walks along the centerline
+        @return: (pieces, end) 
+                    pieces - list of tuples (symbol, cpw_params, start, alpha, piece_params),
+                             piece_params is a length for 'L' and (center, R, delta_alpha) for 'R'
+                    end - (DPoint, alpha) at the end of the path
+        '''
+        plan = RLPathPlan(self._shape_string, self._turn_radiuses, self._segment_lengths, self._turn_angles)
+        pieces = [(symbol, cpw_params, start, alpha, piece_params) for cpw_params, (symbol, start, alpha, piece_params)
+                    in zip(self._cpw_parameters, plan.pieces)]
+        return pieces, (plan.end, plan.alpha_end)
+    
+    def _offset_line(self, pieces, offset):
+        '''
+        @brief: points of the line that is parallel to the centerline
+        @params:  pieces - see _pieces()
+                  offset - function of CPWParameters that returns the distance
+                           to the left from the centerline
+        @return: numpy.ndarray (N,2)
+        '''
+        parts = []
+        for symbol, cpw_params, start, alpha, piece_params in pieces:
+            d = offset(cpw_params)
+            if( symbol == 'R' ):
+                center, R, delta_alpha = piece_params
+                sign = 1 if delta_alpha > 0 else -1
+                n = arc_points_number( R + cpw_params.b/2, delta_alpha, self.arc_tolerance )
+                # left side is closer to the center of the left turns
+                parts.append( arc( center, R - sign*d, alpha - sign*pi/2,
+                                   alpha + delta_alpha - sign*pi/2, n ) )
+            else:
+                normal = np.array((-sin(alpha), cos(alpha)))
+                direction = np.array((cos(alpha), sin(alpha)))
+                p1 = np.array((start.x, start.y)) + d*normal
+                parts.append( np.array((p1, p1 + piece_params*direction)) )
+        return np.concatenate( parts )
+    
+    def _band(self, pieces, offset_right, offset_left):
+        # polygon between two parallel lines
+        return to_simple_polygon( np.concatenate( (self._offset_line( pieces, offset_right ),
+                                                   self._offset_line( pieces, offset_left )[::-1]) ) )
+    
+    def init_connections(self):
+        _, (end, alpha_end) = self._pieces()
+        self.connections = [DPoint(0,0), end]
+        self.angle_connections = [0, alpha_end]
+        
+    def init_regions(self):
+        self.init_connections()
+        pieces, _ = self._pieces()
+        
+        self.metal_region.insert( self._band( pieces, lambda Z: -Z.width/2, lambda Z: Z.width/2 ) )
+        self.empty_region.insert( self._band( pieces, lambda Z: Z.width/2, lambda Z: Z.width/2 + Z.gap ) )
+        self.empty_region.insert( self._band( pieces, lambda Z: -Z.width/2 - Z.gap, lambda Z: -Z.width/2 ) )
+        
+    def get_total_length(self):
+        return RLPathPlan(self._shape_string, self._turn_radiuses, self._segment_lengths, self._turn_angles).total_length
+    
+    def _centerline(self):
+        # see centerline_pieces(...)
+        pieces, _ = self._pieces()
+        return [(symbol, start, alpha, piece_params, cpw_params.b) 
+                for symbol, cpw_params, start, alpha, piece_params in pieces], self._local_trans
+
+def synthesize_meanders(full_lengths, R, max_meander_widths, Z0=None):
+    '''
+    @brief: closed-form parameters of CPW_Meander_Resonator for a batch of
+            designs, no geometry is created. The path consists of two quarter
+            turns at the ends and N loops of two half turns and two straight
+            parts of inner_len:
+                full_length = (pi - 2)*R + 2*N*(pi*R + inner_len)
+            N = int(N0), where N0 is the fractional number of loops of the
+            width max_meander_width (inner_len + 2*R, centre-to-centre), as
+            CPW_Meander_Resonator computes it. Rounding down makes the loops
+            longer, so the width can exceed max_meander_width, see "width".
+    @params:  full_lengths, R, max_meander_widths - floats or array-likes (B,)
+              CPWParameters Z0 - if given, the footprints include the gaps
+    @return: dict of numpy arrays (B,) in the local frame of the resonator
+             (start at (0,0), the meander goes along the x axis):
+                "full_length", "R", "max_meander_width" - broadcasted inputs
+                "N" - int, number of loops
+                "inner_len" - length of the long straight parts
+                "width" - centre-to-centre width of the meander
+                "feasible" - bool, at least one loop and the straight parts are
+                             not shorter than needed for the end turns
+                             (inner_len is nan if there are no loops)
+                "end" - (B,2) end point, the end direction is the same as at the start
+                "bbox" - (B,4) footprint as (left, bottom, right, top)
+    '''
+    full_lengths, R, max_meander_widths = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(full_lengths, dtype=float)),
+        np.atleast_1d(np.asarray(R, dtype=float)),
+        np.atleast_1d(np.asarray(max_meander_widths, dtype=float)) )
+    
+    loops_length = 0.5*(full_lengths - (pi - 2)*R)
+    # loop length is pi*R + inner_len, the longest one fits max_meander_width
+    N0 = loops_length/(max_meander_widths - 2*R + pi*R)
+    # truncation towards zero as int(N0)
+    N = np.trunc(N0).astype(int)
+    inner_len = np.divide(loops_length, N, out=np.full_like(loops_length, np.nan), where=N != 0) - pi*R
+    feasible = (N > 0) & (inner_len >= 2*R)
+    
+    half_height = inner_len/2 + R + (0 if Z0 is None else Z0.b/2)
+    length = R*(4*N + 2)
+    return {"full_length": full_lengths,
+            "R": R,
+            "max_meander_width": max_meander_widths,
+            "N": N,
+            "inner_len": inner_len,
+            "width": inner_len + 2*R,
+            "feasible": feasible,
+            "end": np.column_stack((length, np.zeros_like(length))),
+            "bbox": np.column_stack((np.zeros_like(length), -half_height, length, half_height))}
+
+def meanders_from_synthesis(Z0, starts, synthesis, indices=None, trans_in=None):
+    '''
+    @brief: builds the geometry only for the selected designs of synthesize_meanders(...)
+    @params:  CPWParameters Z0
+              starts - DPoint or list of DPoints, one for every selected design
+              dict synthesis - result of synthesize_meanders(...)
+              indices - indexes of the selected designs, all feasible ones if None
+              trans_in - transformation of every resonator
+    @return: list of CPW_Meander_Resonator
+    '''
+    if( indices is None ):
+        indices = np.flatnonzero(synthesis["feasible"])
+    if( not hasattr(starts, "__len__") ):
+        starts = [starts]*len(indices)
+    return [CPW_Meander_Resonator(Z0, start, synthesis["full_length"][i], synthesis["R"][i],
+                                  synthesis["max_meander_width"][i], trans_in)
+            for start, i in zip(starts, indices)]
 
 class CPW_Meander_Resonator( Element_Base ):
     def __init__(self, Z0, start, full_length, R, max_meander_width, trans_in=None ):
@@ -764,60 +1136,40 @@ class CPW_Meander_Resonator( Element_Base ):
             - R - Radii to use on the meandering arcs
             - max_meander_width - Maximum meander width (centre-to-centre)
             - trans_in: KLayout transformation to be processed during execution
+        
+        The parameters of the meander are given by synthesize_meanders(...).
         '''
         self.R = R
         self.width = Z0.width
         self.gap = Z0.gap
         
         #Calculate the meander parameters
-        N0 = 0.5 * (full_length - (np.pi-2)*R) / (max_meander_width-2*R + np.pi*R)
-        self.N = int(N0)
-        self.inner_len = 0.5 * (full_length - (np.pi-2)*R) / self.N - np.pi*R
+        synthesis = synthesize_meanders(full_length, R, max_meander_width)
+        self.N = int(synthesis["N"][0])
+        if( self.N == 0 ):
+            # the division of the length between zero loops
+            raise ZeroDivisionError("CPW_Meander_Resonator: length {} is too short for a single loop "
+                                    "with R = {}".format(full_length, R))
+        self.inner_len = float(synthesis["inner_len"][0])
         
         super().__init__( start, trans_in )
         self.start = self.connections[0]
         self.end = self.connections[-1]
 
-    def _get_solid_arc( self, center, R, width, alpha_start, alpha_end, n_inner, n_outer ):
-        pts = []
-
-        n_inner = int(n_inner)
-        n_outer = int(n_outer)
-
-        if alpha_end > alpha_start:
-            alpha_start = alpha_start
-            alpha_end = alpha_end
-        else:
-            alpha_start = alpha_start
-            alpha_end = alpha_end
-        
-        d_alpha_inner = (alpha_end - alpha_start)/(n_inner - 1)
-        d_alpha_outer = -d_alpha_inner
-        
-        path_pts = []
-
-        for i in range(0, n_inner):
-            alpha = alpha_start + d_alpha_inner*i
-            pts.append(center + DPoint(cos(alpha), sin(alpha))*(R - width*0.5))
-            path_pts.append(center + DPoint(cos(alpha), sin(alpha))*R)
-        for i in range(0, n_outer):
-            alpha = alpha_end + d_alpha_outer*i
-            pts.append(center + DPoint(cos(alpha), sin(alpha))*(R + width*0.5))
-        return (path_pts,DSimplePolygon(pts))
-        
     def _place_arc(self, center, R, alpha_start, alpha_end, num_segments = 200):
-        n_inner = num_segments
-        n_outer = num_segments
+        n_inner = int(num_segments)
+        n_outer = int(num_segments)
 
-        connpts,metal_arc = self._get_solid_arc(center, R, self.width, 
+        connpts = points_list(arc(center, R, alpha_start - pi/2, alpha_end - pi/2, n_inner), DPoint)
+        metal_arc = ring_sector(center, R, self.width, 
                     alpha_start - pi/2, alpha_end - pi/2, n_inner, n_outer)
-        _,empty_arc1 = self._get_solid_arc(center, R - (self.width + self.gap)*0.5, 
+        empty_arc1 = ring_sector(center, R - (self.width + self.gap)*0.5, 
                     self.gap, alpha_start - pi/2, alpha_end - pi/2, n_inner, n_outer)  
-        _,empty_arc2 = self._get_solid_arc(center, R + (self.width + self.gap)*0.5, 
+        empty_arc2 = ring_sector(center, R + (self.width + self.gap)*0.5, 
                     self.gap, alpha_start - pi/2, alpha_end - pi/2, n_inner, n_outer)  
-        self.metal_region.insert(SimplePolygon().from_dpoly(metal_arc))
-        self.empty_region.insert(SimplePolygon().from_dpoly(empty_arc1))
-        self.empty_region.insert(SimplePolygon().from_dpoly(empty_arc2))
+        self.metal_region.insert(to_simple_polygon(metal_arc))
+        self.empty_region.insert(to_simple_polygon(empty_arc1))
+        self.empty_region.insert(to_simple_polygon(empty_arc2))
         return connpts
 
     def _place_straight(self, pt1, pt2):
@@ -854,6 +1206,132 @@ class CPW_Meander_Resonator( Element_Base ):
         #Final left arc
         p1 = p2+DPoint(self.R,0)
         self.connections += self._place_arc(p1, self.R, -np.pi/2, 0, num_segments_half/2)
+    
+    def _centerline(self):
+        # see centerline_pieces(...), straight lengths are given as if the quarter turns were sharp,
+        # the initial turn does not reduce the first straight (see _reduced_straight_lengths)
+        shape = "RL" + "RLRL"*self.N + "R"
+        segment_lengths = [self.inner_len/2 - self.R] + [self.inner_len]*(2*self.N - 1) + [self.inner_len/2]
+        turn_angles = [-pi/2] + [pi, -pi]*self.N + [pi/2]
+        plan = RLPathPlan(shape, self.R, segment_lengths, turn_angles)
+        b = self.width + 2*self.gap
+        return [piece + (b,) for piece in plan.pieces], self._local_trans
 
 
             
+
+
+def centerline_pieces(path):
+    '''
+    @brief: pieces of the centerline of a CPW path in the order along the path
+    @params:  path - CPW, CPW_arc, CPW_arc_2, CPW_Centerline_Path, CPW_Meander_Resonator
+                     or Complex_Base consisting of them (CPW_RL_Path, Path_RS, ...)
+    @return: list of (pieces, DCplxTrans) - pieces in the frame that is mapped to
+             the layout by the transformation. Pieces are tuples
+             (symbol, start, alpha, piece_params, b) as in RLPathPlan.pieces,
+             b is the full width of the CPW (width + 2*gap)
+    '''
+    if( hasattr(path, "_centerline") ):
+        return [path._centerline()]
+    if( isinstance(path, Complex_Base) ):
+        segments = []
+        for primitive in path.primitives.values():
+            segments += centerline_pieces(primitive)
+        return segments
+    raise ValueError("centerline_pieces: {} is not a CPW path".format(type(path).__name__))
+
+def path_samples(path, pitch, offset=None):
+    '''
+    @brief: points on the centerline of a CPW path spaced by 'pitch' along the path
+    @params:  path - see centerline_pieces(...)
+              float pitch - distance between the points along the path
+              float offset - distance from the start of the path to the first point, pitch/2 if None
+    @return: (points, alphas, b, straight) - numpy arrays, coordinates (M,2),
+             tangent angles, CPW full widths and the indexes of the straight pieces
+             of the points (-1 for the turns)
+    '''
+    if( offset is None ):
+        offset = pitch/2
+    points, alphas, bs, straight = [], [], [], []
+    s_start = 0     # length of the path before the piece
+    piece_index = 0
+    for pieces, trans in centerline_pieces(path):
+        for symbol, start, alpha, piece_params, b in pieces:
+            length = abs(piece_params[1]*piece_params[2]) if symbol == 'R' else piece_params
+            length *= trans.mag
+            k_first = max(0, int(np.ceil((s_start - offset)/pitch - 1e-9)))
+            s = offset + pitch*np.arange(k_first, int(np.floor((s_start + length - offset)/pitch + 1e-9)) + 1)
+            s = s[(s >= s_start - 1e-6) & (s < s_start + length - 1e-6)]
+            t = (s - s_start)/length if length > 0 else s*0
+            if( symbol == 'R' ):
+                center, R, delta_alpha = piece_params
+                sign = 1 if delta_alpha > 0 else -1
+                theta = alpha + t*delta_alpha
+                xy = np.column_stack((center.x + sign*R*np.sin(theta), center.y - sign*R*np.cos(theta)))
+            else:
+                theta = alpha + 0*t
+                xy = np.column_stack((start.x + t*piece_params*cos(alpha), start.y + t*piece_params*sin(alpha)))
+            # to the layout frame
+            m = _linear_part(trans)
+            xy = xy.dot(m) + (trans.disp.x, trans.disp.y)
+            directions = np.column_stack((np.cos(theta), np.sin(theta))).dot(m)
+            points.append(xy)
+            alphas.append(np.arctan2(directions[:,1], directions[:,0]))
+            bs.append(np.full(len(s), b*trans.mag))
+            straight.append(np.full(len(s), piece_index if symbol == 'L' else -1))
+            s_start += length
+            piece_index += 1
+    if( not points ):
+        return np.zeros((0,2)), np.zeros(0), np.zeros(0), np.zeros(0, dtype=int)
+    return np.concatenate(points), np.concatenate(alphas), np.concatenate(bs), np.concatenate(straight)
+
+def _air_bridge_cell(layout, layer_i, b):
+    # one bridge across the CPW of the full width b, centered at the origin
+    # and oriented along the x axis, geometry is the same as in Air_bridges
+    digest = hashlib.sha1(repr((round(b, 6), layer_i)).encode()).hexdigest()[:16]
+    cell = layout.cell("Air_bridge_" + digest)
+    if( cell is None ):
+        cell = layout.create_cell("Air_bridge_" + digest)
+        r = Region()
+        insert_boxes(r, [(-1e3, -(b/2 + 2e3), 1e3, b/2 + 2e3),
+                         (-b/4, -(b/2 + 2e3), b/4, -(b/2 + 4e3)),
+                         (-b/4, b/2 + 2e3, b/4, b/2 + 4e3)])
+        cell.shapes(layer_i).insert(r)
+    return cell
+
+def place_air_bridges(cell, layer_i, path, pitch, offset=None):
+    '''
+    @brief: places air bridges along the centerline of a CPW path every 'pitch',
+            rotated along the local direction of the path.
+            Bridges are instances of one shared cell per CPW width, so the memory
+            per bridge is constant. Bridges on the straight pieces that are parallel
+            to the axes are placed as regular cell arrays.
+    @params:  klayout.db.Cell cell - parent cell
+              int layer_i - layer index in the cell's layout
+              path - see centerline_pieces(...)
+              float pitch - distance between the bridges along the path
+              float offset - distance from the start of the path to the first bridge, pitch/2 if None
+    @return: list of klayout.db.Instance
+    '''
+    layout = cell.layout()
+    points, alphas, bs, straight = path_samples(path, pitch, offset)
+    instances = []
+    i = 0
+    while( i < len(points) ):
+        # run of the bridges on the same straight piece
+        j = i + 1
+        if( straight[i] >= 0 ):
+            while( j < len(points) and straight[j] == straight[i] ):
+                j += 1
+        bridge_cell = _air_bridge_cell(layout, layer_i, bs[i])
+        trans = ICplxTrans().from_dtrans(DCplxTrans(1, alphas[i]*180/pi, False, points[i][0], points[i][1]))
+        step = pitch*np.array((cos(alphas[i]), sin(alphas[i])))
+        if( j - i > 1 and np.abs(step - np.round(step)).max() < 1e-6 ):
+            step = np.round(step).astype(int)
+            instances.append(cell.insert(klayout.db.CellInstArray(bridge_cell.cell_index(), trans,
+                                                                   klayout.db.Vector(int(step[0]), int(step[1])), klayout.db.Vector(0, 0), j - i, 1)))
+        else:
+            j = i + 1
+            instances.append(cell.insert(klayout.db.CellInstArray(bridge_cell.cell_index(), trans)))
+        i = j
+    return instances
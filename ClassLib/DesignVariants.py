@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import traceback
+from itertools import product
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import klayout.db
+from klayout.db import Region
+
+
+def params_grid(swept_params):
+    '''
+    @brief: tensor product of the swept design parameters
+    @params:  OrderedDict swept_params - {"par_name": list of values}
+    @return: list of OrderedDict - design_params for every variant
+    '''
+    names = list(swept_params.keys())
+    return [OrderedDict(zip(names, values)) for values in product(*swept_params.values())]
+
+
+def _layers_stats(cell):
+    stats = OrderedDict()
+    layout = cell.layout()
+    for layer_i in layout.layer_indexes():
+        region = Region(cell.begin_shapes_rec(layer_i))
+        if( region.is_empty() ):
+            continue
+        info = layout.get_info(layer_i)
+        stats["{}/{}".format(info.layer, info.datatype)] = {
+            "polygons": region.count(),
+            "vertices": sum(polygon.num_points() for polygon in region.each())
+        }
+    return stats
+
+
+def _build_variant(design_class, cell_name, design_params, filename):
+    start = time.perf_counter()
+    design = design_class(cell_name)
+    design.draw(design_params)
+    design.show()
+    build_time = time.perf_counter() - start
+
+    if( filename.lower().endswith(".oas") ):
+        design.save_as_oasis(filename)
+    else:
+        design.save_as_gds2(filename)
+    save_time = time.perf_counter() - start - build_time
+
+    return {"file": os.path.basename(filename),
+            "params": design_params,
+            "build_time": build_time,
+            "save_time": save_time,
+            "layers": _layers_stats(design.cell)}
+
+
+def _failed_variant(design_params, filename, error):
+    return {"file": os.path.basename(filename),
+            "params": design_params,
+            "error": "{}: {}".format(type(error).__name__, error),
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__))}
+
+
+def generate_variants(design_class, params_list, output_dir, cell_name="design",
+                      file_format="gds", processes=None, manifest_name="manifest.json"):
+    '''
+    @brief: builds design variants in a pool of processes on headless layouts
+            and writes one layout file per variant together with a json manifest
+            (parameters, build time, polygon and vertex counts per layer).
+            A variant that fails does not stop the others, its manifest entry
+            has "error" and "traceback" fields instead of the statistics.
+            The manifest is written even if the generation is interrupted,
+            variants that are not built then have the error "not built".
+    @params:  design_class - Chip_Design subclass, has to be importable by the
+                            worker processes (defined at the module level)
+              list params_list - design_params for every variant, see params_grid(...)
+              str output_dir - directory for layout files and the manifest
+              str cell_name - name of the design cell
+              str file_format - "gds" or "oas"
+              int processes - number of worker processes, os.cpu_count() if None
+              str manifest_name - name of the manifest file in output_dir
+    @return: list of dict - manifest entries in the order of params_list
+    '''
+    if( not os.path.exists(output_dir) ):
+        os.makedirs(output_dir)
+
+    filenames = [os.path.join(output_dir, "{}_{:04d}.{}".format(cell_name, i, file_format))
+                 for i in range(len(params_list))]
+
+    manifest = [None]*len(params_list)
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(_build_variant, design_class, cell_name, design_params, filename)
+                       for design_params, filename in zip(params_list, filenames)]
+            for i, future in enumerate(futures):
+                try:
+                    manifest[i] = future.result()
+                except Exception as e:
+                    manifest[i] = _failed_variant(params_list[i], filenames[i], e)
+    finally:
+        for i, entry in enumerate(manifest):
+            if( entry is None ):
+                manifest[i] = {"file": os.path.basename(filenames[i]), "params": params_list[i],
+                               "error": "not built"}
+        with open(os.path.join(output_dir, manifest_name), "w") as f:
+            # parameters that are not json types (DPoint, CPWParameters, ...) are stored as strings
+            json.dump({"design": design_class.__module__ + "." + design_class.__qualname__,
+                       "cell": cell_name,
+                       "variants": manifest}, f, indent=2, default=repr)
+    return manifest
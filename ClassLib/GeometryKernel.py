@@ -0,0 +1,165 @@
+'''
+@brief: vectorized generation of the curved outlines.
+        Outlines are numpy arrays of shape (N,2) with the coordinates of the
+        polygon points. They are converted to klayout polygons in one call.
+'''
+from math import acos, ceil
+from functools import lru_cache
+from contextlib import contextmanager
+
+import numpy as np
+from klayout.db import SimplePolygon, Polygon, Box
+
+from ClassLib._PROG_SETTINGS import PROGRAM
+
+
+def dbu_arc_tolerance( dbu=0.001 ):
+    '''
+    @brief: arc tolerance in the design units (nm) on the grid of the layout
+    @params:  float dbu - database unit of the layout, um
+    @return: float - PROGRAM.ARC_TOLERANCE_DBU steps of the grid
+    '''
+    return PROGRAM.ARC_TOLERANCE_DBU*dbu*1e3
+
+
+def current_arc_tolerance():
+    '''
+    @brief: arc tolerance for the elements that are created now,
+            PROGRAM.ARC_TOLERANCE or the one of the default grid if it is None
+    '''
+    if( PROGRAM.ARC_TOLERANCE is None ):
+        return dbu_arc_tolerance()
+    return PROGRAM.ARC_TOLERANCE
+
+
+@contextmanager
+def arc_tolerance( tolerance ):
+    '''
+    @brief: sets PROGRAM.ARC_TOLERANCE for the elements created in the block
+            and restores the previous value afterwards
+    @usage:
+            with arc_tolerance( dbu_arc_tolerance( layout.dbu ) ):
+                turn = CPW_arc( ... )
+    '''
+    previous = PROGRAM.ARC_TOLERANCE
+    PROGRAM.ARC_TOLERANCE = tolerance
+    try:
+        yield tolerance
+    finally:
+        PROGRAM.ARC_TOLERANCE = previous
+
+
+def arc_points_number( R, delta_alpha, tolerance=None ):
+    '''
+    @brief: number of points on an arc edge such that the sagitta of every
+            chord does not exceed the tolerance
+    @params:  float R - radius of the arc
+              float delta_alpha - angle of the arc, rad
+              float tolerance - maximal sagitta, current_arc_tolerance() if None
+    @return: int - number of points, from 3 to PROGRAM.ARC_MAX_POINTS
+    '''
+    if( tolerance is None ):
+        tolerance = current_arc_tolerance()
+    R = abs( R )
+    if( tolerance >= R ):
+        return 3
+    d_alpha = 2*acos( 1 - tolerance/R )
+    n = int( ceil( abs( delta_alpha )/d_alpha ) ) + 1
+    return max( 3, min( n, PROGRAM.ARC_MAX_POINTS ) )
+
+
+@lru_cache( maxsize=1024 )
+def _unit_arc( alpha_start, alpha_end, n, endpoint ):
+    # equal elements mostly share the same angles, so the tables are reused
+    alphas = alpha_start + (alpha_end - alpha_start)/((n - 1) if endpoint else n)*np.arange( n )
+    table = np.column_stack( (np.cos( alphas ), np.sin( alphas )) )
+    table.flags.writeable = False
+    return table
+
+
+def arc( center, R, alpha_start, alpha_end, n ):
+    '''
+    @brief: n points on the arc from alpha_start to alpha_end inclusive
+    @params:  DPoint center, float R, float alpha_start, float alpha_end, int n
+    @return: numpy.ndarray (n,2)
+    '''
+    return _unit_arc( alpha_start, alpha_end, int(n), True )*R + (center.x, center.y)
+
+
+def circle( center, R, n, offset_angle=0 ):
+    '''
+    @brief: n points on the circle, the first one is at offset_angle
+    @return: numpy.ndarray (n,2)
+    '''
+    return _unit_arc( offset_angle, offset_angle + 2*np.pi, int(n), False )*R + (center.x, center.y)
+
+
+def ring_sector( center, R, width, alpha_start, alpha_end, n_inner, n_outer ):
+    '''
+    @brief: outline of the ring sector with the middle radius R. Points of the
+            inner arc go from alpha_start to alpha_end, points of the outer arc go back.
+    @return: numpy.ndarray (n_inner + n_outer, 2)
+    '''
+    return np.concatenate( (arc( center, R - width/2, alpha_start, alpha_end, n_inner ),
+                            arc( center, R + width/2, alpha_end, alpha_start, n_outer )) )
+
+
+def annulus( center, r_inner, r_outer, n ):
+    '''
+    @brief: outlines of the ring
+    @return: (hull, hole) - numpy.ndarray (n,2) each
+    '''
+    return circle( center, r_outer, n ), circle( center, r_inner, n )
+
+
+def _round_dbu( values ):
+    # rounding as in klayout: half away from zero
+    return np.where( values >= 0, np.floor( values + 0.5 ), np.ceil( values - 0.5 ) ).astype( np.int64 )
+
+
+def _points_string( xy ):
+    xy = _round_dbu( xy )
+    return ";".join( map( "%d,%d".__mod__, map( tuple, xy.tolist() ) ) )
+
+
+def to_simple_polygon( xy ):
+    '''
+    @brief: converts outline coordinates to SimplePolygon in database units,
+            same as SimplePolygon().from_dpoly( DSimplePolygon( points ) )
+    '''
+    return SimplePolygon.from_s( "(" + _points_string( xy ) + ")" )
+
+
+def to_polygon( hull, holes=() ):
+    '''
+    @brief: converts outline coordinates of the hull and the holes to Polygon in database units
+    '''
+    return Polygon.from_s( "(" + "/".join( _points_string( xy ) for xy in (hull,) + tuple(holes) ) + ")" )
+
+
+def points_list( xy, point_class ):
+    '''
+    @brief: converts coordinates array to the list of points (DPoint, DVector, ...)
+    '''
+    return [point_class( x, y ) for x, y in xy.tolist()]
+
+
+def boxes( corners ):
+    '''
+    @brief: converts coordinates of the opposite corners to the list of Box in database units,
+            same as Box().from_dbox( DBox( DPoint( x1, y1 ), DPoint( x2, y2 ) ) ) for every row
+    @params:  corners - array-like (M,4) of (x1, y1, x2, y2)
+    @return: list of Box
+    '''
+    corners = _round_dbu( np.asarray( corners, dtype=float ).reshape( -1, 4 ) )
+    return list( map( Box, *corners.T.tolist() ) )
+
+
+def insert_boxes( region, corners ):
+    '''
+    @brief: inserts boxes( corners ) into the region in one call
+    '''
+    box_list = boxes( corners )
+    # insert( [] ) is ambiguous in klayout
+    if( box_list ):
+        region.insert( box_list )
@@ -0,0 +1,125 @@
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+
+
+class _ProfileEntry():
+    def __init__( self, class_name ):
+        self.class_name = class_name
+        self.name = None
+        self.times = defaultdict( float )   # phase -> inclusive time, s
+        self.polygons = 0
+        self.vertices = 0
+
+
+class BuildProfiler():
+    '''
+    @brief: collects build statistics of the elements: time spent in
+            init_regions/init_primitives, transformations and place()
+            and polygon and vertex counts of the placed metal and empty regions.
+            Statistics are aggregated per class and per instance name,
+            instance name is the key of the element in the primitives of its parent.
+    @params:  str trace_file - if not None, dump() writes the trace in the
+                               "folded stacks" format (flamegraph.pl, speedscope) there
+    @usage:
+            Element_Base.profiler = BuildProfiler( trace_file="build.folded" )
+            ... build and place elements ...
+            design.show()   # calls Element_Base.profiler.dump()
+    '''
+    PHASES = ( "init_regions", "init_primitives", "transform", "place" )
+
+    def __init__( self, trace_file=None ):
+        self.trace_file = trace_file
+        self.entries = []
+        self._entries_by_element = weakref.WeakKeyDictionary()
+        self._stack = []    # frames [entry, phase, start time, children time]
+        self._folded = defaultdict( float )     # stack -> self time, s
+
+    def _entry( self, element ):
+        entry = self._entries_by_element.get( element )
+        if( entry is None ):
+            entry = _ProfileEntry( type(element).__name__ )
+            self._entries_by_element[element] = entry
+            self.entries.append( entry )
+        return entry
+
+    def start( self, element, phase ):
+        self._stack.append( [self._entry( element ), phase, time.perf_counter(), 0.0] )
+
+    def stop( self ):
+        entry, phase, start, children_time = self._stack[-1]
+        elapsed = time.perf_counter() - start
+        stack = ";".join( frame[0].class_name + ":" + frame[1] for frame in self._stack )
+        self._stack.pop()
+        entry.times[phase] += elapsed
+        self._folded[stack] += elapsed - children_time
+        if( self._stack ):
+            self._stack[-1][3] += elapsed
+
+    def set_name( self, element, name ):
+        self._entry( element ).name = name
+
+    def add_geometry( self, element, *regions ):
+        entry = self._entry( element )
+        for region in regions:
+            entry.polygons += region.count()
+            entry.vertices += sum( polygon.num_points() for polygon in region.each() )
+
+    def clear( self ):
+        self.entries = []
+        self._entries_by_element = weakref.WeakKeyDictionary()
+        self._stack = []
+        self._folded = defaultdict( float )
+
+    def _aggregate( self, key_func ):
+        rows = OrderedDict()
+        for entry in self.entries:
+            key = key_func( entry )
+            row = rows.get( key )
+            if( row is None ):
+                row = rows[key] = { "count": 0, "polygons": 0, "vertices": 0, "times": defaultdict( float ) }
+            row["count"] += 1
+            row["polygons"] += entry.polygons
+            row["vertices"] += entry.vertices
+            for phase, t in entry.times.items():
+                row["times"][phase] += t
+        return rows
+
+    def _format_table( self, title, rows, limit ):
+        lines = [title, "{:<40}{:>8}".format( "", "count" ) +
+                 "".join( "{:>19}".format( phase + ",ms" ) for phase in self.PHASES ) +
+                 "{:>12}{:>12}".format( "polygons", "vertices" )]
+        # inclusive times of the nested phases are not summed up
+        # for sorting, the largest one is used
+        order = sorted( rows.items(), key=lambda item: max( item[1]["times"].values(), default=0 ), reverse=True )
+        for key, row in order[:limit]:
+            lines.append( "{:<40}{:>8}".format( key[:40], row["count"] ) +
+                          "".join( "{:>19.2f}".format( 1e3*row["times"][phase] ) for phase in self.PHASES ) +
+                          "{:>12}{:>12}".format( row["polygons"], row["vertices"] ) )
+        return "\n".join( lines )
+
+    def report( self, limit=None ):
+        '''
+        @brief: text tables of the statistics per class and per instance name,
+                sorted by time. Times are inclusive (nested elements are counted
+                in the phases of their parents as well).
+        @params:  int limit - maximal number of rows in every table
+        '''
+        by_class = self._aggregate( lambda entry: entry.class_name )
+        by_name = self._aggregate( lambda entry: entry.class_name + ( "" if entry.name is None else ":" + entry.name ) )
+        return ( self._format_table( "Build profile by class", by_class, limit ) + "\n\n" +
+                 self._format_table( "Build profile by instance name", by_name, limit ) )
+
+    def write_trace( self, filename ):
+        '''
+        @brief: writes "folded stacks" trace, one line per stack:
+                "Parent:phase;Child:phase self_time_in_microseconds"
+        '''
+        with open( filename, "w" ) as f:
+            for stack, t in self._folded.items():
+                f.write( "{} {}\n".format( stack, int( round( 1e6*t ) ) ) )
+
+    def dump( self ):
+        print( self.report() )
+        if( self.trace_file is not None ):
+            self.write_trace( self.trace_file )
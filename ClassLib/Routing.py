@@ -0,0 +1,574 @@
+'''
+@brief: routing of CPW connections on a grid.
+        Obstacles are rasterized to a numpy occupancy grid, the route is
+        found by A* with a binary heap and is returned as parameters of CPW_RL_Path.
+'''
+import time
+import heapq
+from math import pi, ceil, atan2
+from collections import OrderedDict, deque
+
+import numpy as np
+import klayout.db
+from klayout.db import Point, DPoint, DVector, DBox, Vector, Region, DCplxTrans
+
+from ClassLib.BaseClasses import Element_Base, BucketIndex
+from ClassLib.Coplanars import CPW_RL_Path, RLPathPlan
+
+# grid directions: +x, +y, -x, -y
+_DIRECTIONS = ( (1, 0), (0, 1), (-1, 0), (0, -1) )
+
+
+def _direction_index( alpha ):
+    return int( round( alpha/(pi/2) ) ) % 4
+
+
+class Route():
+    '''
+    @brief: centerline of the routed CPW as a polyline with sharp corners.
+            Segment lengths follow the convention of CPW_RL_Path: the turns
+            are rounded by CPW_RL_Path without moving the corners.
+    @params:  list points - DPoints of the start, the corners and the end
+              CPWParameters cpw_params
+              float turn_radius
+    '''
+    def __init__( self, points, cpw_params, turn_radius ):
+        self.points = points
+        self.cpw_params = cpw_params
+        self.turn_radius = turn_radius
+
+    @property
+    def segment_lengths( self ):
+        return [p1.distance( p2 ) for p1, p2 in zip( self.points[:-1], self.points[1:] )]
+
+    @property
+    def turn_angles( self ):
+        angles = []
+        for p0, p1, p2 in zip( self.points[:-2], self.points[1:-1], self.points[2:] ):
+            d1 = p1 - p0
+            d2 = p2 - p1
+            angles.append( pi/2 if d1.x*d2.y - d1.y*d2.x > 0 else -pi/2 )
+        return angles
+
+    @property
+    def n_bends( self ):
+        return len( self.points ) - 2
+
+    @property
+    def length( self ):
+        # every 90 degrees turn replaces 2*R of the corner by the arc of pi*R/2
+        return sum( self.segment_lengths ) - self.n_bends*(2 - pi/2)*self.turn_radius
+
+    @property
+    def alpha_start( self ):
+        dr = self.points[1] - self.points[0]
+        return atan2( dr.y, dr.x )
+
+    def rl_path_params( self ):
+        '''
+        @return: dict of CPW_RL_Path constructor arguments
+        '''
+        return { "origin": self.points[0],
+                 "shape": "L" + "RL"*self.n_bends,
+                 "cpw_parameters": self.cpw_params,
+                 "turn_radiuses": self.turn_radius,
+                 "segment_lengths": self.segment_lengths,
+                 "turn_angles": self.turn_angles,
+                 "trans_in": DCplxTrans( 1, self.alpha_start*180/pi, False, 0, 0 ) }
+
+    @property
+    def feasible( self ):
+        # every straight part is not shorter than its reduction by the turns,
+        # see RLPathPlan.feasible
+        params = self.rl_path_params()
+        return RLPathPlan( params["shape"], params["turn_radiuses"], params["segment_lengths"],
+                           params["turn_angles"] ).feasible
+
+    def make_path( self ):
+        return CPW_RL_Path( **self.rl_path_params() )
+
+
+class GridRouter():
+    '''
+    @brief: A* router of CPW connections on a square grid of 'cell_size'.
+            The centerline of a route goes through the centers of the free cells
+            with 90 degrees turns. A cell is occupied if any obstacle, grown by the
+            keep-out distance (half of the CPW width with gaps plus clearance),
+            overlaps it. Turns are allowed only where the rounded arc and the
+            straight parts of 2*turn_radius between the turns fit.
+    @params:  DBox bbox - routing area
+              float cell_size - grid step
+              CPWParameters cpw_params - CPW of the routes
+              float turn_radius - radius of the rounded turns
+              float clearance - distance between the gaps of the route and the obstacles
+              float turn_penalty - cost of a turn in length units, turn_radius if None
+    '''
+    def __init__( self, bbox, cell_size, cpw_params, turn_radius, clearance=0, turn_penalty=None ):
+        self.bbox = bbox
+        self.cell_size = cell_size
+        self.cpw_params = cpw_params
+        self.turn_radius = turn_radius
+        self.clearance = clearance
+        self.turn_penalty = turn_radius if turn_penalty is None else turn_penalty
+        self.Nx = int( ceil( bbox.width()/cell_size ) )
+        self.Ny = int( ceil( bbox.height()/cell_size ) )
+        self.occupancy = np.zeros( (self.Nx, self.Ny), dtype=bool )
+
+        # cell moves between the corners, one cell is reserved for the snapping of the ends
+        self._min_run = int( ceil( 2*turn_radius/cell_size - 1e-9 ) ) + 1
+        self._end_run = int( ceil( turn_radius/cell_size - 1e-9 ) ) + 1
+        self._turn_cells = self._arc_offsets()
+
+    @property
+    def keep_out( self ):
+        return self.cpw_params.b/2 + self.clearance
+
+    def _arc_offsets( self ):
+        # cells under the rounded turn, relative to the corner cell, for every
+        # (incoming direction, outgoing direction)
+        offsets = {}
+        R = self.turn_radius/self.cell_size
+        for d_in in range( 4 ):
+            for turn in ( 1, 3 ):
+                d_out = (d_in + turn) % 4
+                e_in = np.array( _DIRECTIONS[d_in] )
+                e_out = np.array( _DIRECTIONS[d_out] )
+                center = R*(e_out - e_in)
+                t = np.linspace( 0, pi/2, max( 3, int( ceil( 2*R ) ) + 2 ) )[:, None]
+                # from the entry point -R*e_in to the exit point R*e_out
+                pts = center - R*np.cos( t )*e_out - R*np.sin( t )*e_in
+                cells = set( map( tuple, np.round( pts ).astype( int ).tolist() ) )
+                offsets[(d_in, d_out)] = tuple( cells )
+        return offsets
+
+    def _to_region( self, obstacle ):
+        if( isinstance( obstacle, Element_Base ) ):
+            return obstacle.metal_region + obstacle.empty_region
+        if( isinstance( obstacle, Region ) ):
+            return obstacle
+        if( isinstance( obstacle, DBox ) ):
+            return Region( klayout.db.Box().from_dbox( obstacle ) )
+        return Region( obstacle )
+
+    def _rasterize( self, region ):
+        ix0, iy0, mask = self.rasterize_window( region )
+        occupied = np.zeros( (self.Nx, self.Ny), dtype=bool )
+        occupied[ix0:ix0 + mask.shape[0], iy0:iy0 + mask.shape[1]] = mask
+        return occupied
+
+    def rasterize_window( self, region ):
+        '''
+        @brief: cells overlapped by the region, only the cells inside the bounding
+                box of the region are rasterized
+        @return: (ix0, iy0, mask) - numpy bool array mask (nx, ny) of the cells
+                 starting from the cell (ix0, iy0)
+        '''
+        box = region.bbox()
+        if( region.is_empty() ):
+            return 0, 0, np.zeros( (0, 0), dtype=bool )
+        ix0, iy0 = self.cell_of( DPoint( box.left, box.bottom ) )
+        ix1, iy1 = self.cell_of( DPoint( box.right, box.top ) )
+        step = int( round( self.cell_size ) )
+        origin = Point().from_dpoint( self.center_of( ix0, iy0 ) - DPoint( self.cell_size/2, self.cell_size/2 ) )
+        areas = np.array( region.rasterize( origin, Vector( step, step ), ix1 - ix0 + 1, iy1 - iy0 + 1 ) )
+        # rasterize() returns rows along y
+        return ix0, iy0, areas.T > 0
+
+    def add_obstacle( self, obstacle, keep_out=None ):
+        '''
+        @brief: marks the cells that are closer than keep_out to the obstacle as occupied
+        @params:  obstacle - Element_Base (metal and empty regions), Region, Box or DBox
+                  float keep_out - self.keep_out if None
+        '''
+        if( keep_out is None ):
+            keep_out = self.keep_out
+        region = self._to_region( obstacle )
+        if( keep_out > 0 ):
+            region = region.sized( int( round( keep_out ) ) )
+        self.occupancy |= self._rasterize( region )
+
+    def remove_obstacle( self, obstacle, keep_out=None ):
+        '''
+        @brief: frees the cells marked by add_obstacle( obstacle, keep_out )
+                (cells of other obstacles overlapping them are freed as well)
+        '''
+        if( keep_out is None ):
+            keep_out = self.keep_out
+        region = self._to_region( obstacle )
+        if( keep_out > 0 ):
+            region = region.sized( int( round( keep_out ) ) )
+        self.occupancy &= ~self._rasterize( region )
+
+    def cell_of( self, point ):
+        return ( min( self.Nx - 1, max( 0, int( (point.x - self.bbox.left)//self.cell_size ) ) ),
+                 min( self.Ny - 1, max( 0, int( (point.y - self.bbox.bottom)//self.cell_size ) ) ) )
+
+    def center_of( self, ix, iy ):
+        return DPoint( self.bbox.left + (ix + 0.5)*self.cell_size, self.bbox.bottom + (iy + 0.5)*self.cell_size )
+
+    def _free_tables( self, start_cell, end_cell, escape_cells=() ):
+        # free cells, cells where the turns fit and cells followed by straight
+        # runs of free cells, as nested lists for fast indexing
+        P = max( self._min_run, self._end_run,
+                 max( max( abs( dx ), abs( dy ) ) for cells in self._turn_cells.values() for dx, dy in cells ) ) + 1
+        free = np.zeros( (self.Nx + 2*P, self.Ny + 2*P), dtype=bool )
+        free[P:P + self.Nx, P:P + self.Ny] = ~self.occupancy
+        # the ends are connected to the obstacles they start from
+        for x, y in ( start_cell, end_cell ) + tuple( escape_cells ):
+            if( 0 <= x < self.Nx and 0 <= y < self.Ny ):
+                free[x + P, y + P] = True
+
+        def shifted( dx, dy ):
+            return free[P + dx:P + dx + self.Nx, P + dy:P + dy + self.Ny]
+
+        turn_ok = {}
+        for key, cells in self._turn_cells.items():
+            ok = np.ones( (self.Nx, self.Ny), dtype=bool )
+            for dx, dy in cells:
+                ok &= shifted( dx, dy )
+            turn_ok[key] = ok.tolist()
+        runs_free = {}
+        for n in ( self._min_run, self._end_run ):
+            for d, (dx, dy) in enumerate( _DIRECTIONS ):
+                ok = np.ones( (self.Nx, self.Ny), dtype=bool )
+                for i in range( 1, n + 1 ):
+                    ok &= shifted( i*dx, i*dy )
+                runs_free[(n, d)] = ok.tolist()
+        # free[x + 1][y + 1], padded by one cell
+        return free[P - 1:P + self.Nx + 1, P - 1:P + self.Ny + 1].tolist(), turn_ok, runs_free
+
+    def _connected( self, start_cell, end_cell, escape_cells=() ):
+        # flood fill of the free cells from the start, a necessary condition
+        # of a route that is much cheaper than a search that fails
+        free = ~self.occupancy
+        for x, y in ( start_cell, end_cell ) + tuple( escape_cells ):
+            if( 0 <= x < self.Nx and 0 <= y < self.Ny ):
+                free[x, y] = True
+        reached = np.zeros_like( free )
+        reached[start_cell] = True
+        while( not reached[end_cell] ):
+            grown = reached.copy()
+            grown[1:,:] |= reached[:-1,:]
+            grown[:-1,:] |= reached[1:,:]
+            grown[:,1:] |= reached[:,:-1]
+            grown[:,:-1] |= reached[:,1:]
+            grown &= free
+            if( (grown == reached).all() ):
+                return False
+            reached = grown
+        return True
+
+    def _escape_cells( self, cell, d, sign ):
+        # straight corridor through the keep-out of the obstacle the end is connected to
+        n = int( ceil( self.keep_out/self.cell_size ) ) + 1
+        dx, dy = _DIRECTIONS[d]
+        return tuple( (cell[0] + sign*i*dx, cell[1] + sign*i*dy) for i in range( 1, n + 1 ) )
+
+    def _search( self, start_cell, end_cell, d_start, d_end, deadline=None ):
+        # states are (x, y, d) after at least a straight run of _min_run cells since
+        # the last turn (or _end_run since the start), so a turn is always allowed.
+        # A turn is followed by the run of _min_run cells in one step.
+        K = self._min_run
+        E = self._end_run
+        sx, sy = start_cell
+        ex, ey = end_cell
+        step = self.cell_size
+        penalty = self.turn_penalty
+        escape_cells = ()
+        if( d_start is not None ):
+            escape_cells += self._escape_cells( start_cell, d_start, 1 )
+        if( d_end is not None ):
+            escape_cells += self._escape_cells( end_cell, d_end, -1 )
+        if( not self._connected( start_cell, end_cell, escape_cells ) ):
+            return None, {}
+        free, turn_ok, runs_free = self._free_tables( start_cell, end_cell, escape_cells )
+
+        def heuristic( x, y ):
+            # not aligned ends need at least one turn
+            return step*(abs( ex - x ) + abs( ey - y )) + (penalty if x != ex and y != ey else 0)
+
+        heap = []
+        g = {}
+        parent = {}
+
+        def push( state, cost, prev ):
+            if( cost < g.get( state, np.inf ) ):
+                g[state] = cost
+                parent[state] = prev
+                h = heuristic( state[0], state[1] )
+                # ties are broken towards the end
+                heapq.heappush( heap, (cost + h, h, state, cost) )
+
+        def run_to( x, y, d, n, cost, prev, min_goal ):
+            # straight run of n cells, the end may be reached within it
+            dx, dy = _DIRECTIONS[d]
+            j = (ex - x)*dx + (ey - y)*dy
+            if( (ex - x)*dy == (ey - y)*dx and min_goal <= j <= n ):
+                if( all( free[x + i*dx + 1][y + i*dy + 1] for i in range( 1, j + 1 ) ) ):
+                    push( (ex, ey, d), cost + j*step, prev )
+            if( runs_free[(n, d)][x][y] ):
+                push( (x + n*dx, y + n*dy, d), cost + n*step, prev )
+
+        start = (sx, sy, -1)
+        g[start] = 0
+        parent[start] = None
+        for d in ( range( 4 ) if d_start is None else (d_start,) ):
+            run_to( sx, sy, d, E, 0, start, 0 )
+
+        pops = 0
+        while( heap ):
+            _, _, state, cost = heapq.heappop( heap )
+            pops += 1
+            if( deadline is not None and pops % 4096 == 0 and time.perf_counter() > deadline ):
+                return None, parent
+            if( cost > g[state] ):
+                continue
+            x, y, d = state
+            if( x == ex and y == ey and (d_end is None or d == d_end) ):
+                return state, parent
+            dx, dy = _DIRECTIONS[d]
+            if( free[x + dx + 1][y + dy + 1] ):
+                push( (x + dx, y + dy, d), cost + step, state )
+            for turn in ( 1, 3 ):
+                d_new = (d + turn) % 4
+                if( turn_ok[(d, d_new)][x][y] ):
+                    run_to( x, y, d_new, K, cost + penalty, state, E )
+        return None, parent
+
+    def route( self, start, end, alpha_start=None, alpha_end=None, deadline=None ):
+        '''
+        @brief: finds the shortest route with the turn penalties from 'start' to 'end'.
+                Cells of the ends are always free. If the direction at an end is given,
+                the straight corridor through the keep-out around the end is free as well.
+        @params:  DPoint start, DPoint end
+                  float alpha_start - direction at the start, multiple of pi/2, any if None
+                  float alpha_end - direction at the end, multiple of pi/2, any if None
+                  float deadline - time.perf_counter() value, the search gives up after it
+        @return: Route or None if there is no route (or the deadline has passed)
+        '''
+        start_cell = self.cell_of( start )
+        end_cell = self.cell_of( end )
+        d_start = None if alpha_start is None else _direction_index( alpha_start )
+        d_end = None if alpha_end is None else _direction_index( alpha_end )
+        state, parent = self._search( start_cell, end_cell, d_start, d_end, deadline )
+        if( state is None ):
+            return None
+
+        states = []
+        while( state is not None ):
+            states.append( state )
+            state = parent[state]
+        states.reverse()
+
+        # corners are the states where the direction changes
+        points = [DPoint( start.x, start.y )]
+        for (x, y, d), (_, _, d_next) in zip( states[1:-1], states[2:] ):
+            if( d_next != d ):
+                points.append( self.center_of( x, y ) )
+        points.append( DPoint( end.x, end.y ) )
+
+        # the ends are not at the centers of their cells, the first and the last
+        # corners are moved to keep the first and the last segments straight
+        d_first = _DIRECTIONS[states[1][2]]
+        d_last = _DIRECTIONS[states[-1][2]]
+        if( len( points ) == 2 ):
+            misalignment = abs( start.y - end.y ) if d_first[0] != 0 else abs( start.x - end.x )
+            if( misalignment > 1e-6 ):
+                raise ValueError( "GridRouter: start and end are not aligned for a straight route" )
+        else:
+            if( d_first[0] != 0 ):
+                points[1].y = start.y
+            else:
+                points[1].x = start.x
+            if( d_last[0] != 0 ):
+                points[-2].y = end.y
+            else:
+                points[-2].x = end.x
+        return Route( points, self.cpw_params, self.turn_radius )
+
+
+class Net():
+    '''
+    @brief: connection to be routed by MultiNetRouter
+    @params:  str name
+              DPoint start, DPoint end
+              float alpha_start, alpha_end - directions at the ends, see GridRouter.route(...)
+    '''
+    def __init__( self, name, start, end, alpha_start=None, alpha_end=None ):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.alpha_start = alpha_start
+        self.alpha_end = alpha_end
+        self.route = None
+        self.rip_ups = 0
+
+
+class MultiNetRouter():
+    '''
+    @brief: routes several nets without crossings on one GridRouter grid.
+            Obstacles and routed nets are kept in a BucketIndex of their bounding
+            boxes together with their rasterized cells, the occupancy is a count
+            of the items over every cell. Adding or ripping up an item only touches
+            the cells of its bounding box, nothing is rasterized twice.
+            A net that can not be routed rips up the routed nets in the neighbourhood
+            of its ends and is routed again. If it succeeds, the ripped nets are
+            queued again, otherwise they get their old routes back and the net is
+            retried after the routes of the other nets have changed.
+    @params:  DBox bbox, float cell_size, CPWParameters cpw_params, float turn_radius,
+              float clearance, float turn_penalty - see GridRouter
+              order - "input", "short_first", "long_first" or a function of Net
+                      that gives the sorting key
+              int max_rip_ups - limit of the rip-up-and-reroute iterations
+              int max_searches - limit of the searches of one route_all() call,
+                                 4 per net if None
+    '''
+    def __init__( self, bbox, cell_size, cpw_params, turn_radius, clearance=0, turn_penalty=None,
+                  order="short_first", max_rip_ups=20, max_searches=None ):
+        self.router = GridRouter( bbox, cell_size, cpw_params, turn_radius, clearance, turn_penalty )
+        self.order = order
+        self.max_rip_ups = max_rip_ups
+        self.max_searches = max_searches
+        self.index = BucketIndex( max( 16*cell_size, 4*turn_radius ) )
+        self.nets = OrderedDict()
+        self._counts = np.zeros( (self.router.Nx, self.router.Ny), dtype=np.int32 )
+        self._cells = {}       # key -> (ix0, iy0, mask)
+        self._n_obstacles = 0
+
+    def _add_item( self, key, region, keep_out ):
+        if( keep_out > 0 ):
+            region = region.sized( int( round( keep_out ) ) )
+        ix0, iy0, mask = self.router.rasterize_window( region )
+        self._counts[ix0:ix0 + mask.shape[0], iy0:iy0 + mask.shape[1]] += mask
+        self._cells[key] = (ix0, iy0, mask)
+        self.index.insert( key, klayout.db.DBox().from_ibox( region.bbox() ) )
+
+    def _remove_item( self, key ):
+        ix0, iy0, mask = self._cells.pop( key )
+        self._counts[ix0:ix0 + mask.shape[0], iy0:iy0 + mask.shape[1]] -= mask
+        self.index.remove( key )
+
+    def add_obstacle( self, obstacle, keep_out=None ):
+        '''
+        @brief: see GridRouter.add_obstacle(...)
+        @return: key of the obstacle in self.index
+        '''
+        key = ("obstacle", self._n_obstacles)
+        self._n_obstacles += 1
+        self._add_item( key, self.router._to_region( obstacle ), self.router.keep_out if keep_out is None else keep_out )
+        return key
+
+    def add_net( self, name, start, end, alpha_start=None, alpha_end=None ):
+        self.nets[name] = Net( name, start, end, alpha_start, alpha_end )
+        return self.nets[name]
+
+    def _ordered_nets( self ):
+        nets = list( self.nets.values() )
+        if( self.order == "input" ):
+            return nets
+        def manhattan( net ):
+            return abs( net.end.x - net.start.x ) + abs( net.end.y - net.start.y )
+        if( self.order == "short_first" ):
+            return sorted( nets, key=manhattan )
+        if( self.order == "long_first" ):
+            return sorted( nets, key=manhattan, reverse=True )
+        return sorted( nets, key=self.order )
+
+    def _route( self, net, deadline=None ):
+        self.router.occupancy = self._counts > 0
+        return self.router.route( net.start, net.end, net.alpha_start, net.alpha_end, deadline )
+
+    def _commit( self, net, route ):
+        '''
+        @brief: adds the route of the net to the occupancy
+        @return: False if the route can not be drawn by CPW_RL_Path,
+                 nothing is changed then
+        '''
+        if( not route.feasible ):
+            return False
+        try:
+            path = route.make_path()
+        except ValueError:
+            return False
+        self._add_item( ("net", net.name), path.metal_region + path.empty_region, self.router.keep_out )
+        net.route = route
+        return True
+
+    def rip_up( self, name ):
+        net = self.nets[name]
+        if( net.route is not None ):
+            self._remove_item( ("net", name) )
+            net.route = None
+            net.rip_ups += 1
+
+    def _neighbours( self, net ):
+        # routed nets around the ends of the net
+        margin = 4*self.router.turn_radius + self.router.keep_out
+        window = DBox( net.start, net.end ).enlarged( DVector( margin, margin ) )
+        return [key[1] for key in self.index.query( window ) if key[0] == "net" and key[1] != net.name]
+
+    def route_all( self, time_limit=None ):
+        '''
+        @brief: routes all nets that are not routed yet
+        @params:  float time_limit - seconds, the nets that are not routed when
+                                     it expires stay unrouted
+        @return: list of the names of the unrouted nets
+        '''
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        max_searches = 4*len( self.nets ) if self.max_searches is None else self.max_searches
+        queue = deque( net for net in self._ordered_nets() if net.route is None )
+        deferred = []       # failed nets, retried after a route has changed
+        changed = False
+        rip_ups = 0
+        searches = 0
+        while( queue or (deferred and changed) ):
+            if( not queue ):
+                queue.extend( deferred )
+                deferred = []
+                changed = False
+            if( searches >= max_searches or (deadline is not None and time.perf_counter() > deadline) ):
+                break
+            net = queue.popleft()
+            route = self._route( net, deadline )
+            searches += 1
+            # a route that can not be drawn is a failed one
+            committed = route is not None and self._commit( net, route )
+            if( not committed and rip_ups < self.max_rip_ups and searches < max_searches ):
+                victims = self._neighbours( net )
+                if( victims ):
+                    rip_ups += 1
+                    routes = { name: self.nets[name].route for name in victims }
+                    for name in victims:
+                        self.rip_up( name )
+                    route = self._route( net, deadline )
+                    searches += 1
+                    committed = route is not None and self._commit( net, route )
+                    if( committed ):
+                        queue.extend( self.nets[name] for name in victims )
+                    else:
+                        # the ripped nets are restored as they were
+                        for name in victims:
+                            self._commit( self.nets[name], routes[name] )
+            if( committed ):
+                changed = True
+            else:
+                deferred.append( net )
+        return [net.name for net in self._ordered_nets() if net.route is None]
+
+    @property
+    def total_length( self ):
+        return sum( net.route.length for net in self.nets.values() if net.route is not None )
+
+    def report( self ):
+        '''
+        @brief: text table with the length and the number of bends of every net
+        '''
+        lines = ["{:<24}{:>10}{:>16}{:>8}{:>10}".format( "net", "status", "length", "bends", "rip-ups" )]
+        for net in self.nets.values():
+            if( net.route is None ):
+                lines.append( "{:<24}{:>10}{:>16}{:>8}{:>10}".format( net.name[:24], "unrouted", "-", "-", net.rip_ups ) )
+            else:
+                lines.append( "{:<24}{:>10}{:>16.1f}{:>8}{:>10}".format( net.name[:24], "routed", net.route.length,
+                                                                        net.route.n_bends, net.rip_ups ) )
+        lines.append( "{:<24}{:>10}{:>16.1f}".format( "total", "", self.total_length ) )
+        return "\n".join( lines )
@@ -4,7 +4,9 @@ from klayout.db import Point,DPoint,DSimplePolygon,SimplePolygon,DPolygon,Polygo
 from klayout.db import Trans, DTrans, CplxTrans, DCplxTrans, ICplxTrans
 
 from ClassLib._PROG_SETTINGS import *
+import numpy as np
 from ClassLib.BaseClasses import Element_Base
+from ClassLib.GeometryKernel import circle, arc, annulus, to_simple_polygon, to_polygon
 
 class Rectangle( Element_Base ):
     def __init__( self, origin, a,b, trans_in=None, inverse=False ):
@@ -66,11 +68,11 @@ class Circle( Element_Base ):
         super().__init__( center,trans_in )
 
     def init_regions(self):
-        dpts_arr = [DPoint(self.r*cos(2*pi*i/self.n_pts+self._offset_angle),self.r*sin(2*pi*i/self.n_pts+self._offset_angle)) for i in range(0,self.n_pts)]
+        circle_poly = to_simple_polygon( circle( DPoint(0,0), self.r, self.n_pts, self._offset_angle ) )
         if( self.solid == True ):
-            self.metal_region.insert( SimplePolygon().from_dpoly( DSimplePolygon(dpts_arr) ) )
+            self.metal_region.insert( circle_poly )
         else:
-            self.empty_region.insert( SimplePolygon().from_dpoly( DSimplePolygon(dpts_arr) ) )
+            self.empty_region.insert( circle_poly )
         self.connections.extend([self.center, self.center + DVector(0,-self.r)])
         self.angle_connections.extend([0, 0])
 
@@ -101,16 +103,14 @@ class Circle_arc( Element_Base ):
         super( Circle_arc,self ). __init__( center,trans_in )
 
     def init_regions( self ):
-        d_alpha = (self.alpha_end - self.alpha_start)/(self.n_pts - 1)
-        alphas = [(self.alpha_start + d_alpha*i) for i in range(0,self.n_pts)]
-        dpts_arr = [DPoint(self.r*cos(alpha),self.r*sin(alpha)) for alpha in alphas]
-        dpts_arr.append( DPoint(0,0) )
+        arc_pts = arc( DPoint(0,0), self.r, self.alpha_start, self.alpha_end, self.n_pts )
+        sector_poly = to_simple_polygon( np.concatenate( (arc_pts, [(0,0)]) ) )
 
         if( self.solid == True ):
-            self.metal_region.insert( SimplePolygon().from_dpoly( DSimplePolygon(dpts_arr) ) )
+            self.metal_region.insert( sector_poly )
         else:
-            self.empty_region.insert( SimplePolygon().from_dpoly( DSimplePolygon(dpts_arr) ) )
-        self.connections.extend([self._center, self._center+DVector(0, -self.r)])
+            self.empty_region.insert( sector_poly )
+        self.connections.extend([self.center, self.center+DVector(0, -self.r)])
         self.angle_connections.extend([0,0])
 
 class Ring(Element_Base):
@@ -132,11 +132,8 @@ class Ring(Element_Base):
         origin = DPoint(0,0)
         Rin = self.r - self.t
         Rout = self.r
-        dpts_arr_Rout = [DPoint(Rout * cos(2 * pi * i / self.n_pts), Rout * sin(2 * pi * i / self.n_pts)) for i in range(0, self.n_pts)]
-        dpts_arr_Rin = [DPoint(Rin * cos(2 * pi * i / self.n_pts), Rin * sin(2 * pi * i / self.n_pts)) for i in range(0, self.n_pts)]
-        outer_circle = Region(SimplePolygon().from_dpoly(DSimplePolygon(dpts_arr_Rout)))
-        inner_circle = Region(SimplePolygon().from_dpoly(DSimplePolygon(dpts_arr_Rin)))
-        ring = outer_circle - inner_circle
+        hull, hole = annulus( origin, Rin, Rout, self.n_pts )
+        ring = Region( to_polygon( hull, [hole] ) )
         #self.metal_region.insert(ring)   
         if self.inverse:
             self.empty_region = ring
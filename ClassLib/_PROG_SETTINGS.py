@@ -6,6 +6,22 @@ from klayout.db import Trans, DTrans, CplxTrans, DCplxTrans, ICplxTrans
 class PROGRAM:
     LAYER1_NUM = 7
     LAYER2_NUM = 8  
+    # if True, elements that implement init_connections() compute only
+    # their connections in the constructor, polygons are generated on the
+    # first access to metal_region/empty_region or on place()
+    LAZY_REGIONS = False
+    # maximal distance between an arc and its polygonal approximation
+    # (sagitta of a chord) in the layout database units.
+    # A 90 degree turn of R = 20 um gets 37 points per edge, R = 100 um - 80.
+    ARC_TOLERANCE_DBU = 5.0
+    # the same distance in the design units (nm) if it is set explicitly,
+    # see GeometryKernel.arc_tolerance(...). If None, ARC_TOLERANCE_DBU
+    # of the 0.001 um grid is used. Can be overridden per element with
+    # the 'arc_tolerance' argument and per design with Chip_Design.arc_tolerance
+    ARC_TOLERANCE = None
+    # upper limit of the number of points on a single arc edge (the number
+    # that was used for every arc before), 90 degree turns reach it at R = 636 um
+    ARC_MAX_POINTS = 200
   
 class CHIP:
     dx = 10.1e6
@@ -11,6 +11,18 @@ from . import BaseClasses
 reload(BaseClasses)
 from .BaseClasses import *
 
+from . import Profiling
+reload(Profiling)
+from .Profiling import *
+
+from . import GeometryKernel
+reload(GeometryKernel)
+from .GeometryKernel import *
+
+from . import CPWCalculator
+reload(CPWCalculator)
+from .CPWCalculator import *
+
 from . import Shapes
 reload(Shapes)
 from .Shapes import *
@@ -60,3 +72,11 @@ reload(ChipDesign)
 from .ChipDesign import *
 
 
+
+from . import DesignVariants
+reload(DesignVariants)
+from .DesignVariants import *
+
+from . import Routing
+reload(Routing)
+from .Routing import *
@@ -11,5 +11,8 @@ classdef CMD < uint16
       SIMULATE(8)
       VISUALIZE(9)
       SET_LINSPACE_SWEEP(10)
+      PROTOCOL_VERSION(11)
+      SYNC(12)
+      POLYGONS(13)
    end
 end
\ No newline at end of file
@@ -3,6 +3,8 @@ sock.InputBufferSize = 100000*8;
 
 DATA_FILENAME = "S_DATA.csv";
 SONNET_PROJ_DIRNAME = "Sonnet_projects";
+% the highest supported protocol version, see MatlabClient._say_hello()
+PROTOCOL_VERSION = 2;
 
 while 1
     % waiting for connection
@@ -26,7 +28,57 @@ while 1
     metal_type_name = "Al-supercond";
     proj.defineNewResistorMetalType(metal_type_name,0);
     csv_name = pwd + "\" + SONNET_PROJ_DIRNAME + "\" + DATA_FILENAME;
+    protocol = 1;
+    accepted_protocol = 1;
     while 1
+        if protocol >= 2
+            % frames are not acknowledged, only SYNC, SIMULATE, CLOSE
+            % and the frames that caused errors are answered
+            [data, seq, payload] = receive_frame(sock);
+            try
+                if data == CMD.CLOSE
+                    respond_frame(sock, RESPONSE.OK, seq, []);
+                    fclose(sock);
+                    break
+                elseif data == CMD.SYNC
+                    respond_frame(sock, RESPONSE.OK, seq, []);
+                elseif data == CMD.POLYGON
+                    add_polygon(proj, parse_polygon(payload));
+                elseif data == CMD.POLYGONS
+                    add_polygons(proj, payload);
+                elseif data == CMD.BOX_PROPS
+                    [dims, pos] = take(payload, 1, "double", 2);
+                    cells = take(payload, pos, "uint32", 2);
+                    proj.changeBoxSizeXY(dims(1), dims(2));
+                    proj.changeNumberOfCells(cells(1), cells(2));
+                elseif data == CMD.CLEAR_POLYGONS
+                    for i = 1:length(proj.GeometryBlock.ArrayOfPolygons)
+                        proj.deletePolygonUsingIndex(1);
+                    end
+                elseif data == CMD.SET_ABS
+                    freqs = take(payload, 1, "double", 2);
+                    proj.addAbsFrequencySweep(freqs(1), freqs(2));
+                elseif data == CMD.SET_LINSPACE_SWEEP
+                    [freqs, pos] = take(payload, 1, "double", 2);
+                    points_n = take(payload, pos, "uint32", 1);
+                    proj.addFrequencySweep("LSWEEP", freqs(1), freqs(2), points_n)
+                elseif data == CMD.SIMULATE
+                    respond_frame(sock, RESPONSE.START_SIMULATION, seq, []);
+                    proj.addFileOutput("CSV","D","Y",DATA_FILENAME,"IC","Y","S","RI","R",50);
+                    proj.simulate('-c');
+                    respond_frame(sock, RESPONSE.SIMULATION_FINISHED, seq, uint8(char(csv_name)));
+                elseif data == CMD.VISUALIZE
+                    visualize(csv_name);
+                else
+                    error("unknown command %d", data);
+                end
+            catch err
+                % the error is attributed to the frame by its sequence number
+                respond_frame(sock, RESPONSE.ERROR, seq, uint8(err.message));
+            end
+            continue
+        end
+
         data = fread(sock, 1,"uint16");
         if data == CMD.CLOSE
             respond( sock, RESPONSE.OK )
@@ -35,26 +87,17 @@ while 1
         elseif data == CMD.SAY_HELLO
             respond( sock, RESPONSE.OK )
             disp("HELLO");
+            % SAY_HELLO closes the handshake
+            protocol = accepted_protocol;
+        elseif data == CMD.PROTOCOL_VERSION
+            % the high bit of the version is set, see MatlabClient.VERSION_TAG
+            accepted_protocol = min(bitand(fread(sock, 1, "uint16"), 32767), PROTOCOL_VERSION);
+            respond( sock, RESPONSE.PROTOCOL_VERSION )
+            respond( sock, accepted_protocol )
         elseif data == CMD.POLYGON
             respond( sock, RESPONSE.OK )
             polygon = receive_polygon(sock);
-            
-            % ATOMIC EXPRESSION START
-            polygon_sonnet = proj.addMetalPolygonEasy(0,polygon.points_x,polygon.points_y,1);
-            poly_idx = length(proj.GeometryBlock.ArrayOfPolygons);
-            if polygon.ports == FLAG.TRUE
-                for i = 1:length(polygon.port_edges_num_list)
-                    edge_i = polygon.port_edges_num_list(i);
-                    if polygon.port_types(i) == PORT_TYPES.BOX_WALL
-                        proj.addPort('STD',polygon_sonnet,edge_i,50,0,0,0);
-                    elseif polygon.port_types(i) == PORT_TYPES.AUTOGROUNDED
-                        proj.addPort('AGND',polygon_sonnet,edge_i,50,0,0,0,'FIX',0)
-                    elseif polygon.port_types(i) == PORT_TYPES.COCALIBRATED
-                        % not implemented
-                    end
-                end
-            end
-            % ATOMIC EXPRESSION END
+            add_polygon(proj, polygon);
         elseif data == CMD.BOX_PROPS
             respond( sock, RESPONSE.OK )
             boxSettings = receive_boxProps(sock);
@@ -74,7 +117,7 @@ while 1
             pars = receive_abs_parameters_step(sock);
             proj.addFrequencySweep("LSWEEP", pars.start_freq, pars.stop_freq, pars.points_n)
         elseif data == CMD.SIMULATE
-            respond( sock, RESPONSE.OK )
+            respond( sock, RESPONSE.START_SIMULATION )
             
             % output csv file
             % de-embeded data
@@ -91,14 +134,126 @@ while 1
             fwrite(sock, csv_name + newline);
         elseif data == CMD.VISUALIZE
             respond( sock, RESPONSE.OK )
-            response_data = csvread(csv_name,8);
-            freq = response_data(:,1);
-            s21_re = response_data(:,4);
-            s21_im = response_data(:,5);
-            plot(freq,20*log10(sqrt(s21_re.^2 + s21_im.^2)) );
-            drawnow;
+            visualize(csv_name);
+        end
+    end
+end
+
+function add_polygon(proj, polygon)
+    % ATOMIC EXPRESSION START
+    polygon_sonnet = proj.addMetalPolygonEasy(0,polygon.points_x,polygon.points_y,1);
+    if polygon.ports == FLAG.TRUE
+        for i = 1:length(polygon.port_edges_num_list)
+            edge_i = polygon.port_edges_num_list(i);
+            if polygon.port_types(i) == PORT_TYPES.BOX_WALL
+                proj.addPort('STD',polygon_sonnet,edge_i,50,0,0,0);
+            elseif polygon.port_types(i) == PORT_TYPES.AUTOGROUNDED
+                proj.addPort('AGND',polygon_sonnet,edge_i,50,0,0,0,'FIX',0)
+            elseif polygon.port_types(i) == PORT_TYPES.COCALIBRATED
+                % not implemented
+            end
         end
     end
+    % ATOMIC EXPRESSION END
+end
+
+function add_polygons(proj, payload)
+    % POLYGONS frame: all tables are parsed at once, polygons are added in one pass
+    [counts, pos] = take(payload, 1, "uint32", 3); % polygons, vertices, ports
+    [offsets, pos] = take(payload, pos, "uint32", counts(1) + 1);
+    [points_x, pos] = take(payload, pos, "double", counts(2));
+    [points_y, pos] = take(payload, pos, "double", counts(2));
+    [port_polygons, pos] = take(payload, pos, "uint32", counts(3));
+    [port_edges, pos] = take(payload, pos, "uint32", counts(3));
+    port_types = take(payload, pos, "uint16", counts(3));
+
+    for i = 1:counts(1)
+        polygon = Polygon();
+        polygon.points_x = points_x(offsets(i)+1:offsets(i+1));
+        polygon.points_y = points_y(offsets(i)+1:offsets(i+1));
+        ports_mask = port_polygons == i - 1;
+        if any(ports_mask)
+            polygon.ports = FLAG.TRUE;
+            polygon.port_edges_num_list = transpose(port_edges(ports_mask));
+            polygon.port_types = transpose(port_types(ports_mask));
+        else
+            polygon.ports = FLAG.FALSE;
+        end
+        add_polygon(proj, polygon);
+    end
+end
+
+function visualize(csv_name)
+    response_data = csvread(csv_name,8);
+    freq = response_data(:,1);
+    s21_re = response_data(:,4);
+    s21_im = response_data(:,5);
+    plot(freq,20*log10(sqrt(s21_re.^2 + s21_im.^2)) );
+    drawnow;
+end
+
+function [cmd, seq, payload]=receive_frame(sock)
+    % uint16 CMD, uint32 sequence number, uint32 payload length, payload
+    cmd = fread(sock, 1, "uint16");
+    seq = fread(sock, 1, "uint32");
+    len = fread(sock, 1, "uint32");
+    payload = zeros(len, 1, "uint8");
+    pos = 0;
+    % fread can not read more than InputBufferSize at once
+    while pos < len
+        n = min(len - pos, sock.InputBufferSize);
+        payload(pos+1:pos+n) = fread(sock, n, "uint8");
+        pos = pos + n;
+    end
+end
+
+function respond_frame(sock, response, seq, payload)
+    fwrite(sock, response, "uint16");
+    fwrite(sock, seq, "uint32");
+    fwrite(sock, length(payload), "uint32");
+    if ~isempty(payload)
+        fwrite(sock, payload, "uint8");
+    end
+end
+
+function [values, pos]=take(payload, pos, type, n)
+    % reads n big-endian values of the type starting from payload(pos)
+    switch type
+        case "uint16"
+            width = 2;
+        case "uint32"
+            width = 4;
+        case "double"
+            width = 8;
+    end
+    if pos + n*width - 1 > length(payload)
+        error("frame payload is too short");
+    end
+    bytes = payload(pos:pos + n*width - 1);
+    % the host is little-endian
+    values = double(swapbytes(typecast(bytes(:), type)));
+    pos = pos + n*width;
+end
+
+function result_poly=parse_polygon(payload)
+    result_poly = Polygon();
+
+    [result_poly.ports, pos] = take(payload, 1, "uint16", 1);
+    if result_poly.ports == FLAG.TRUE
+        [num, pos] = take(payload, pos, "uint32", 1);
+        [result_poly.port_edges_num_list, pos] = take(payload, pos, "uint32", num);
+        [num, pos] = take(payload, pos, "uint32", 1);
+        [result_poly.port_types, pos] = take(payload, pos, "uint16", num);
+    else
+        result_poly.port_edges_num_list = -1;
+    end
+    result_poly.port_edges_num_list = transpose(result_poly.port_edges_num_list);
+    result_poly.port_types = transpose(result_poly.port_types);
+
+    [num, pos] = take(payload, pos, "uint32", 1);
+    [result_poly.points_x, pos] = take(payload, pos, "double", num);
+    [num, pos] = take(payload, pos, "uint32", 1);
+    result_poly.points_y = take(payload, pos, "double", num);
 end
 
 function respond(sock, response)
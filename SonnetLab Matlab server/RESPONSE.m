@@ -5,5 +5,6 @@ classdef RESPONSE < uint16
         START_SIMULATION(2)
         BUSY_SIMULATION(3)
         SIMULATION_FINISHED(4)
+        PROTOCOL_VERSION(5)
     end
 end
\ No newline at end of file
@@ -2,6 +2,7 @@ from importlib import reload
 
 from . import matlabClient
 reload(matlabClient)
+from .matlabClient import ProtocolError
 
 from . import sonnetLab
 reload(sonnetLab)
@@ -13,4 +14,12 @@ from .pORT_TYPES import PORT_TYPES
 
 from . import simulatedDesign
 reload(simulatedDesign)
-from .simulatedDesign import SimulatedDesign
\ No newline at end of file
+from .simulatedDesign import SimulatedDesign
+
+from . import echoServer
+reload(echoServer)
+from .echoServer import EchoServer
+
+from . import asyncSonnetLab
+reload(asyncSonnetLab)
+from .asyncSonnetLab import AsyncSonnetLab
\ No newline at end of file
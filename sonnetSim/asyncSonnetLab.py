@@ -0,0 +1,256 @@
+'''
+@brief: asyncio client of the matlab-sonnet server (protocol 2 only).
+        One event loop can drive several servers (or several connections
+        to sonnetSim.echoServer) at once:
+
+        async def job(port, region, ports):
+            async with AsyncSonnetLab(port=port) as SL:
+                await SL.set_boxProps(SimulationBox(...))
+                await SL.set_ABS_sweep(1, 10)
+                await SL.upload(region, ports)
+                await SL.simulate(timeout=3600)
+                return await SL.get_s_params()
+
+        results = await asyncio.gather(*(job(port, ...) for port in ports_list))
+'''
+import struct
+import asyncio
+from functools import partial
+
+from .cMD import CMD
+from .flags import RESPONSE
+from .matlabClient import MatlabClient, ProtocolError
+from .sonnetLab import region_tables, read_s_params
+
+
+def _forget(future):
+    # the result of the future is not needed anymore
+    if( future.done() ):
+        if( not future.cancelled() ):
+            future.exception()
+    else:
+        future.cancel()
+
+
+class AsyncSonnetLab:
+    '''
+    @brief: asyncio counterpart of SonnetLab. Frames are written without
+            waiting, a background task receives the answers and resolves
+            the futures by the sequence numbers of the frames.
+    @params:  str host, int port - address of the server
+              float timeout - seconds to wait for the acknowledgements
+                              (SYNC, start of the simulation, CLOSE_CONNECTION)
+    '''
+    def __init__(self, host="localhost", port=MatlabClient.MATLAB_PORT, timeout=MatlabClient.TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+        self.protocol = None
+        self.ports = None  # list of SonnetPort() instances of the last upload
+        self.sim_res_file = None  # csv file of the last finished simulation
+        # task of the last simulation, many coroutines can await it
+        self.simulation = None
+
+        self._reader = None
+        self._writer = None
+        self._receiver = None  # task that receives the answers
+        self._seq = 0
+        self._commands = {}  # seq -> cmd of the frames that are not acknowledged yet
+        self._waiters = {}  # (seq, RESPONSE) -> future
+        self._errors = []  # errors of the frames without waiters, reported on SYNC
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if( exc_type is None ):
+            await self.close()
+        else:
+            self.abort()
+
+    async def connect(self):
+        '''
+        @brief: opens the connection and negotiates the protocol,
+                see MatlabClient._say_hello
+        @return:  self
+        '''
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        self._writer.write(CMD.SAY_HELLO + CMD.PROTOCOL_VERSION +
+                           struct.pack("!H", MatlabClient.VERSION_TAG | MatlabClient.PROTOCOL_VERSION) +
+                           CMD.SAY_HELLO)
+        response = None
+        responses = struct.unpack("!HH", await asyncio.wait_for(self._reader.readexactly(4), self.timeout))
+        if( responses == (RESPONSE.OK, RESPONSE.PROTOCOL_VERSION) ):
+            self.protocol, response = struct.unpack("!HH", await asyncio.wait_for(self._reader.readexactly(4),
+                                                                                  self.timeout))
+        if( self.protocol is None or self.protocol < 2 or response != RESPONSE.OK ):
+            self.abort()
+            raise ConnectionError("server does not support protocol 2, use SonnetLab")
+        self._receiver = asyncio.ensure_future(self._receive())
+        return self
+
+    def abort(self):
+        '''
+        @brief: closes the connection without CLOSE_CONNECTION,
+                all pending futures fail with ConnectionError
+        '''
+        if( self._receiver is not None ):
+            self._receiver.cancel()
+        if( self._writer is not None ):
+            self._writer.close()
+        self._fail(ConnectionError("connection is closed"))
+
+    async def close(self):
+        seq = self._send_frame(CMD.CLOSE_CONNECTION)
+        try:
+            await self._wait(seq, RESPONSE.OK, self.timeout)
+        finally:
+            self.abort()
+
+    ### frames ###
+
+    def _send_frame(self, cmd, payload=b""):
+        if( self._writer is None or self._writer.is_closing() ):
+            raise ConnectionError("connection is closed")
+        self._seq += 1
+        self._writer.write(cmd + struct.pack("!II", self._seq, len(payload)) + payload)
+        self._commands[self._seq] = struct.unpack("!H", cmd)[0]
+        return self._seq
+
+    def _waiter(self, seq, response):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[(seq, response)] = future
+        return future
+
+    async def _wait(self, seq, response, timeout):
+        future = self._waiter(seq, response)
+        await self._writer.drain()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._waiters.pop((seq, response), None)
+
+    async def _receive(self):
+        try:
+            while( True ):
+                response, seq, length = struct.unpack("!HII", await self._reader.readexactly(10))
+                self._dispatch(response, seq, await self._reader.readexactly(length))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self._fail(ConnectionError("connection is closed by the server"))
+        except Exception as error:
+            # e.g. a malformed frame, the following answers can not be
+            # matched to their frames, the connection is closed
+            self._writer.close()
+            self._fail(error)
+
+    def _dispatch(self, response, seq, payload):
+        if( response == RESPONSE.ERROR ):
+            error = ProtocolError(seq, self._commands.get(seq), payload.decode(errors="replace"))
+            waiters = [future for key, future in self._waiters.items() if key[0] == seq]
+            if( not waiters ):
+                self._errors.append(error)
+            for future in waiters:
+                if( not future.done() ):
+                    future.set_exception(error)
+            return
+
+        future = self._waiters.get((seq, response))
+        if( response == RESPONSE.OK and self._commands.get(seq) == struct.unpack("!H", CMD.SYNC)[0] ):
+            # the frames before SYNC are processed
+            for acked in [key for key in self._commands if key <= seq]:
+                del self._commands[acked]
+            errors, self._errors = self._errors, []
+            if( future is not None and not future.done() and errors ):
+                future.set_exception(errors[0])
+                return
+        # answers without waiters (e.g. of a cancelled simulation) are dropped
+        if( future is not None and not future.done() ):
+            future.set_result(payload)
+
+    def _fail(self, error):
+        for future in self._waiters.values():
+            if( not future.done() ):
+                future.set_exception(error)
+        self._waiters.clear()
+
+    async def sync(self):
+        '''
+        @brief: waits until the server has processed all frames sent before,
+                raises ProtocolError of the first failed frame
+        '''
+        await self._wait(self._send_frame(CMD.SYNC), RESPONSE.OK, self.timeout)
+
+    ### commands ###
+
+    async def clear(self):
+        self._send_frame(CMD.CLEAR_POLYGONS)
+        await self._writer.drain()
+
+    async def set_boxProps(self, simBox):
+        self._send_frame(CMD.BOX_PROPS, struct.pack(">ddII", simBox.x/1e3, simBox.y/1e3, simBox.x_n, simBox.y_n))
+        await self._writer.drain()
+
+    async def set_ABS_sweep(self, start_f_GHz, stop_f_GHz):
+        self._send_frame(CMD.SET_ABS, struct.pack(">dd", start_f_GHz, stop_f_GHz))
+        await self._writer.drain()
+
+    async def set_linspace_sweep(self, start_f_GHz, stop_f_GHz, points_n):
+        self._send_frame(CMD.SET_LINSPACE_SWEEP, struct.pack(">ddI", start_f_GHz, stop_f_GHz, points_n))
+        await self._writer.drain()
+
+    async def upload(self, region, ports=None):
+        '''
+        @brief: uploads all polygons of the region in one POLYGONS frame
+                and waits until the server has added them
+        @params:  Region region
+                  list ports - SonnetPort instances, see SonnetLab.set_ports
+        @return:  int - number of polygons
+        '''
+        self.ports = list(ports) if ports is not None else []
+        # serialization of a large region does not block the event loop
+        tables = await asyncio.get_running_loop().run_in_executor(None, region_tables, region, self.ports)
+        if( tables is not None ):
+            self._send_frame(CMD.POLYGONS, MatlabClient._polygons_payload(*tables))
+        await self.sync()
+        return 0 if tables is None else len(tables[0]) - 1
+
+    def simulate(self, timeout=None):
+        '''
+        @brief: starts the simulation
+        @params:  float timeout - overall time limit of the simulation in seconds
+        @return:  asyncio.Task with the csv file name as the result, it is also
+                  stored in self.simulation, so many coroutines can await it.
+                  Cancelling the task stops waiting, the server finishes the
+                  simulation anyway and its answer is dropped. Use
+                  asyncio.shield(SL.simulation) to limit the waiting of a single
+                  awaiting coroutine without cancelling the simulation.
+        '''
+        self.simulation = asyncio.ensure_future(self._simulate(timeout))
+        return self.simulation
+
+    async def _simulate(self, timeout):
+        seq = self._send_frame(CMD.SIMULATE)
+        # both answers may arrive at once, so both waiters are registered before
+        finished = self._waiter(seq, RESPONSE.SIMULATION_FINISHED)
+        try:
+            await self._wait(seq, RESPONSE.START_SIMULATION, self.timeout)
+            self.sim_res_file = (await asyncio.wait_for(finished, timeout)).decode()
+            return self.sim_res_file
+        finally:
+            self._waiters.pop((seq, RESPONSE.SIMULATION_FINISHED), None)
+            _forget(finished)
+
+    async def get_s_params(self):
+        '''
+        @brief: waits for the last simulation and parses its csv file,
+                see SonnetLab.get_s_params
+        @return:  (freqs, sMatrices)
+        '''
+        if( self.simulation is not None ):
+            await self.simulation
+        if( self.sim_res_file is None ):
+            raise RuntimeError("no simulation results, call simulate() first")
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(read_s_params, self.sim_res_file, len(self.ports) if self.ports else None))
@@ -9,4 +9,8 @@ class CMD:
     SET_ABS = (7).to_bytes(2,byteorder="big")
     SIMULATE = (8).to_bytes(2,byteorder="big")
     VISUALIZE = (9).to_bytes(2,byteorder="big")
-    SET_LINSPACE_SWEEP = (10).to_bytes(2,byteorder="big")
\ No newline at end of file
+    SET_LINSPACE_SWEEP = (10).to_bytes(2,byteorder="big")
+    # protocol 2, see MatlabClient._say_hello()
+    PROTOCOL_VERSION = (11).to_bytes(2,byteorder="big")
+    SYNC = (12).to_bytes(2,byteorder="big")
+    POLYGONS = (13).to_bytes(2,byteorder="big")
\ No newline at end of file
@@ -0,0 +1,395 @@
+'''
+@brief: pure python stand-in for "SonnetLab Matlab server/EchoServer.m".
+        Implements the same CMD/RESPONSE state machine (protocols 1 and 2),
+        keeps the uploaded geometry and answers SIMULATE with synthetic
+        S-parameters written to a csv file after a configurable delay.
+        MATLAB, SonnetLab and Sonnet are not required, so the client side
+        can be tested and profiled anywhere.
+
+usage:
+    python -m sonnetSim.echoServer --port 30000 --delay 1.0
+    or from python:
+        server = EchoServer(port=0, simulation_delay=0.1).start_in_thread()
+        SL = SonnetLab(port=server.port)
+        ...
+        server.stop()
+'''
+import os
+import struct
+import asyncio
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+from .cMD import CMD
+from .flags import FLAG, RESPONSE
+from .matlabClient import MatlabClient
+
+
+class SonnetProject:
+    '''
+    @brief: geometry and settings uploaded by the client,
+            counterpart of the SonnetLab project of EchoServer.m
+    '''
+    # number of points of the synthetic adaptive sweep
+    ABS_POINTS_N = 101
+
+    def __init__(self):
+        self.polygons = []  # (points_x, points_y) in um
+        self.ports = []  # (polygon index, edge number starting from 1, port type)
+        self.box = None  # (dim_X_um, dim_Y_um, cells_X_num, cells_Y_num)
+        self.sweep = None  # ("ABS", start_f, stop_f) or ("LSWEEP", start_f, stop_f, points_n)
+
+    def add_polygon(self, points_x, points_y, port_edges=(), port_types=()):
+        self.polygons.append((points_x, points_y))
+        for edge, port_type in zip(port_edges, port_types):
+            self.ports.append((len(self.polygons) - 1, int(edge), int(port_type)))
+
+    def clear_polygons(self):
+        self.polygons = []
+        self.ports = []
+
+    def frequencies(self):
+        if( self.sweep is None ):
+            raise ValueError("frequency sweep is not set")
+        if( self.sweep[0] == "ABS" ):
+            return np.linspace(self.sweep[1], self.sweep[2], self.ABS_POINTS_N)
+        return np.linspace(self.sweep[1], self.sweep[2], int(self.sweep[3]))
+
+    def s_parameters(self):
+        '''
+        @brief: synthetic S-matrices: every port is connected to every other one
+                by a delay line with a notch-type resonance in the middle of the sweep
+        @return: (freqs, sMatrices) - shapes (freqs_N,) and (freqs_N, ports_N, ports_N)
+        '''
+        freqs = self.frequencies()
+        ports_n = max(1, len(self.ports))
+        f0 = (freqs[0] + freqs[-1])/2
+        Q, Qc = 1e4, 2e4
+        resonance = 1 - (Q/Qc)/(1 + 2j*Q*(freqs/f0 - 1))
+        transmission = resonance*np.exp(-2j*np.pi*freqs*0.1)
+        reflection = 0.05*(1 - resonance)
+        coupling = np.ones((ports_n, ports_n)) - np.eye(ports_n)
+        sMatrices = reflection[:, None, None]*np.eye(ports_n) + transmission[:, None, None]*coupling
+        return freqs, sMatrices
+
+    def write_csv(self, file_name):
+        '''
+        @brief: writes S-parameters in the layout of the Sonnet csv output
+                that is read by SonnetLab.get_s_params: 8 header lines, then
+                frequency and Re, Im of S11, S21, ..., Sn1, S12, ... in every row
+        '''
+        freqs, sMatrices = self.s_parameters()
+        ports_n = sMatrices.shape[1]
+        # column-major order of the S-matrix elements
+        s_data = sMatrices.transpose(0, 2, 1).reshape(len(freqs), -1)
+        data = np.empty((len(freqs), 1 + 2*ports_n**2))
+        data[:, 0] = freqs
+        data[:, 1::2] = s_data.real
+        data[:, 2::2] = s_data.imag
+        header = ["Synthetic S-parameters of sonnetSim.echoServer",
+                  "polygons: {}".format(len(self.polygons)),
+                  "ports: {}".format(ports_n),
+                  "box: {}".format(self.box),
+                  "sweep: {}".format(self.sweep),
+                  "", "",
+                  "Frequency (GHz)," + ",".join("RE[S{0}{1}],IM[S{0}{1}]".format(i + 1, j + 1)
+                                                for j in range(ports_n) for i in range(ports_n))]
+        with open(file_name, "w") as f:
+            f.write("\n".join(header) + "\n")
+            np.savetxt(f, data, delimiter=",", fmt="%.12e")
+
+
+class _Payload:
+    # sequential reading of big-endian values from the frame payload, "take" of EchoServer.m
+    def __init__(self, payload):
+        self.payload = payload
+        self.pos = 0
+
+    def take(self, dtype, n=None):
+        dtype = np.dtype(dtype)
+        count = 1 if n is None else int(n)
+        if( self.pos + count*dtype.itemsize > len(self.payload) ):
+            raise ValueError("frame payload is too short")
+        values = np.frombuffer(self.payload, dtype, count, self.pos)
+        self.pos += count*dtype.itemsize
+        return values[0] if n is None else values
+
+
+class _Session:
+    '''
+    @brief: connection with one client, a new project is created for every connection
+    '''
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.project = SonnetProject()
+        self.protocol = 1
+        self.accepted_protocol = 1
+
+    async def run(self):
+        self.server.stats["connections"] += 1
+        try:
+            while( await (self._frame() if self.protocol >= 2 else self._command()) ):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # client is gone
+        finally:
+            self.writer.close()
+
+    async def _read(self, n):
+        data = await self.reader.readexactly(n)
+        self.server.stats["bytes_received"] += n
+        return data
+
+    async def _simulate(self):
+        self.server.stats["simulations"] += 1
+        # concurrent sessions write separate files
+        file_name = os.path.join(self.server.data_dir, "S_DATA_{}.csv".format(self.server.stats["simulations"]))
+        await asyncio.sleep(self.server.simulation_delay)
+        self.project.write_csv(file_name)
+        return file_name
+
+    ### protocol 1: every field is acknowledged ###
+
+    def _respond(self, response):
+        self.writer.write(struct.pack("!H", response))
+
+    async def _uint16_x1(self):
+        return struct.unpack("!H", await self._read(2))[0]
+
+    async def _uint32_x1(self):
+        result = struct.unpack("!I", await self._read(4))[0]
+        self._respond(RESPONSE.OK)
+        return result
+
+    async def _float64_x1(self):
+        result = struct.unpack(">d", await self._read(8))[0]
+        self._respond(RESPONSE.OK)
+        return result
+
+    async def _array_xnum(self, dtype):
+        num = await self._uint32_x1()
+        result = np.frombuffer(await self._read(num*np.dtype(dtype).itemsize), dtype)
+        self._respond(RESPONSE.OK)
+        return result
+
+    async def _command(self):
+        data = await self._read(2)
+        if( data == CMD.CLOSE_CONNECTION ):
+            self._respond(RESPONSE.OK)
+            await self.writer.drain()
+            return False
+        elif( data == CMD.SAY_HELLO ):
+            self._respond(RESPONSE.OK)
+            # SAY_HELLO closes the handshake
+            self.protocol = self.accepted_protocol
+        elif( data == CMD.PROTOCOL_VERSION and self.server.protocol >= 2 ):
+            self.accepted_protocol = min(await self._uint16_x1() & ~MatlabClient.VERSION_TAG, self.server.protocol)
+            self._respond(RESPONSE.PROTOCOL_VERSION)
+            self._respond(self.accepted_protocol)
+        elif( data == CMD.POLYGON ):
+            self._respond(RESPONSE.OK)
+            ports = await self._uint16_x1()
+            self._respond(RESPONSE.OK)
+            port_edges, port_types = (), ()
+            if( ports == struct.unpack("!H", FLAG.TRUE)[0] ):
+                port_edges = await self._array_xnum(">u4")
+                port_types = await self._array_xnum(">u2")
+            points_x = await self._array_xnum(">f8")
+            points_y = await self._array_xnum(">f8")
+            self.project.add_polygon(points_x, points_y, port_edges, port_types)
+            self.server.stats["polygons"] += 1
+        elif( data == CMD.BOX_PROPS ):
+            self._respond(RESPONSE.OK)
+            self.project.box = (await self._float64_x1(), await self._float64_x1(),
+                                await self._uint32_x1(), await self._uint32_x1())
+        elif( data == CMD.CLEAR_POLYGONS ):
+            self._respond(RESPONSE.OK)
+            self.project.clear_polygons()
+        elif( data == CMD.SET_ABS ):
+            self._respond(RESPONSE.OK)
+            self.project.sweep = ("ABS", await self._float64_x1(), await self._float64_x1())
+        elif( data == CMD.SET_LINSPACE_SWEEP ):
+            self._respond(RESPONSE.OK)
+            self.project.sweep = ("LSWEEP", await self._float64_x1(), await self._float64_x1(),
+                                  await self._uint32_x1())
+        elif( data == CMD.SIMULATE ):
+            self._respond(RESPONSE.START_SIMULATION)
+            await self.writer.drain()
+            file_name = await self._simulate()
+            self._respond(RESPONSE.SIMULATION_FINISHED)
+            self.writer.write(file_name.encode() + b"\n")
+        elif( data == CMD.VISUALIZE ):
+            self._respond(RESPONSE.OK)
+        # unknown commands are skipped as in EchoServer.m
+        await self.writer.drain()
+        return True
+
+    ### protocol 2: frames, see MatlabClient ###
+
+    def _respond_frame(self, response, seq, payload=b""):
+        self.writer.write(struct.pack("!HII", response, seq, len(payload)) + payload)
+
+    async def _frame(self):
+        data, seq, length = struct.unpack("!2sII", await self._read(10))
+        payload = _Payload(await self._read(length))
+        self.server.stats["frames"] += 1
+        try:
+            if( data == CMD.CLOSE_CONNECTION ):
+                self._respond_frame(RESPONSE.OK, seq)
+                await self.writer.drain()
+                return False
+            elif( data == CMD.SYNC ):
+                self._respond_frame(RESPONSE.OK, seq)
+            elif( data == CMD.POLYGON ):
+                port_edges, port_types = (), ()
+                if( payload.take(">u2") == struct.unpack("!H", FLAG.TRUE)[0] ):
+                    port_edges = payload.take(">u4", payload.take(">u4"))
+                    port_types = payload.take(">u2", payload.take(">u4"))
+                points_x = payload.take(">f8", payload.take(">u4"))
+                points_y = payload.take(">f8", payload.take(">u4"))
+                self.project.add_polygon(points_x, points_y, port_edges, port_types)
+                self.server.stats["polygons"] += 1
+            elif( data == CMD.POLYGONS ):
+                polygons_n, vertices_n, ports_n = payload.take(">u4", 3)
+                offsets = payload.take(">u4", polygons_n + 1)
+                points_x = payload.take(">f8", vertices_n)
+                points_y = payload.take(">f8", vertices_n)
+                port_polygons = payload.take(">u4", ports_n)
+                port_edges = payload.take(">u4", ports_n)
+                port_types = payload.take(">u2", ports_n)
+                for i in range(polygons_n):
+                    mask = port_polygons == i
+                    self.project.add_polygon(points_x[offsets[i]:offsets[i + 1]], points_y[offsets[i]:offsets[i + 1]],
+                                             port_edges[mask], port_types[mask])
+                self.server.stats["polygons"] += int(polygons_n)
+            elif( data == CMD.BOX_PROPS ):
+                self.project.box = (*payload.take(">f8", 2), *payload.take(">u4", 2))
+            elif( data == CMD.CLEAR_POLYGONS ):
+                self.project.clear_polygons()
+            elif( data == CMD.SET_ABS ):
+                self.project.sweep = ("ABS", *payload.take(">f8", 2))
+            elif( data == CMD.SET_LINSPACE_SWEEP ):
+                self.project.sweep = ("LSWEEP", *payload.take(">f8", 2), payload.take(">u4"))
+            elif( data == CMD.SIMULATE ):
+                self._respond_frame(RESPONSE.START_SIMULATION, seq)
+                await self.writer.drain()
+                file_name = await self._simulate()
+                self._respond_frame(RESPONSE.SIMULATION_FINISHED, seq, file_name.encode())
+            elif( data == CMD.VISUALIZE ):
+                pass
+            else:
+                raise ValueError("unknown command {}".format(struct.unpack("!H", data)[0]))
+        except Exception as e:
+            # the error is attributed to the frame by its sequence number
+            self._respond_frame(RESPONSE.ERROR, seq, str(e).encode())
+        await self.writer.drain()
+        return True
+
+
+class EchoServer:
+    '''
+    @brief: asyncio server that emulates EchoServer.m
+    @params:  str host, int port - address to listen, port=0 picks a free port
+              float simulation_delay - duration of every simulation, seconds
+              int protocol - the highest protocol version, 1 emulates servers
+                             without protocol negotiation
+              str data_dir - directory for the csv files. If None, a temporary
+                             directory is created that is removed by stop()
+                             together with the csv files
+    '''
+    def __init__(self, host="localhost", port=MatlabClient.MATLAB_PORT, simulation_delay=0.0,
+                 protocol=MatlabClient.PROTOCOL_VERSION, data_dir=None):
+        self.host = host
+        self.port = port
+        self.simulation_delay = simulation_delay
+        self.protocol = protocol
+        self._data_dir = None  # TemporaryDirectory owned by the server
+        if( data_dir is None ):
+            self._data_dir = tempfile.TemporaryDirectory(prefix="sonnet_echo_")
+            data_dir = self._data_dir.name
+        self.data_dir = data_dir
+        self.stats = {"connections": 0, "frames": 0, "polygons": 0, "simulations": 0, "bytes_received": 0}
+
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def _handle(self, reader, writer):
+        try:
+            await _Session(self, reader, writer).run()
+        except asyncio.CancelledError:
+            pass  # the server is stopped
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # actual port if port=0 was requested
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if( self._server is None ):
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self):
+        '''
+        @brief: runs the server in the event loop of a daemon thread,
+                returns when the server is listening
+        '''
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            # connections that are still open
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if( self._thread is not None ):
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+        elif( self._server is not None ):
+            self._server.close()
+        if( self._data_dir is not None ):
+            self._data_dir.cleanup()
+            self._data_dir = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="stand-in for the MATLAB/Sonnet EchoServer")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=MatlabClient.MATLAB_PORT)
+    parser.add_argument("--delay", type=float, default=0.0, help="simulation duration, seconds")
+    parser.add_argument("--protocol", type=int, default=MatlabClient.PROTOCOL_VERSION)
+    parser.add_argument("--data-dir", default=None, help="directory for the csv files")
+    args = parser.parse_args()
+
+    server = EchoServer(args.host, args.port, args.delay, args.protocol, args.data_dir)
+    print("listening on {}:{}, csv files are written to {}".format(args.host, args.port, server.data_dir))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
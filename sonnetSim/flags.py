@@ -8,4 +8,5 @@ class RESPONSE:
     START_SIMULATION = 2
     BUSY_SIMULATION = 3
     SIMULATION_FINISHED = 4
+    PROTOCOL_VERSION = 5
 
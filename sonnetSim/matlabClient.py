@@ -1,13 +1,51 @@
+import time
+import select
 import socket
 import struct
+from collections import OrderedDict, deque
+
 import numpy as np
 
 from .cMD import CMD
 from .flags import FLAG, RESPONSE
 
+# command names for error messages
+_CMD_NAMES = {struct.unpack("!H", value)[0]: name for name, value in vars(CMD).items() if isinstance(value, bytes)}
+
+
+class ProtocolError(Exception):
+    '''
+    @brief: error reported by the server for the frame of the protocol 2
+    @params:  int seq - sequence number of the frame that caused the error
+              int cmd - command of the frame
+              str message - error description received from the server
+    '''
+    def __init__( self, seq, cmd, message ):
+        self.seq = seq
+        self.cmd = cmd
+        self.message = message
+        super().__init__( "frame #{0} ({1}): {2}".format(seq, _CMD_NAMES.get(cmd, cmd), message) )
+
+
 class MatlabClient():
     MATLAB_PORT = 30000
     TIMEOUT = 10
+    # Protocol 1: every field is acknowledged by the server with 2 bytes.
+    # Protocol 2: every command is a single frame
+    #     uint16 CMD, uint32 sequence number, uint32 payload length, payload
+    # that is not acknowledged. The server answers with frames of the same layout
+    # (RESPONSE instead of CMD) only to SYNC, SIMULATE, CLOSE_CONNECTION and to the
+    # frames that caused errors. The sequence number of the answer is the one of
+    # the frame it refers to.
+    PROTOCOL_VERSION = 2
+    # The version follows CMD.PROTOCOL_VERSION with the high bit set. Protocol 1
+    # servers read it as a command and skip it, a plain version 4 would be
+    # taken for CMD.POLYGON. So the versions are limited to 0x7FFF.
+    VERSION_TAG = 0x8000
+    # frames sent before the client waits for the acknowledgement of the previous window
+    ACK_WINDOW = 256
+    _FRAME_HEADER = struct.Struct("!HII")
+
     # internal state enumeration class
     class STATE:
         INITIALIZING = 0
@@ -17,15 +55,30 @@ class MatlabClient():
         BUSY_SIMULATING = 4
         SIMULATION_FINISHED = 5
 
-    def __init__( self, host="localhost", port=MATLAB_PORT ):
+    def __init__( self, host="localhost", port=MATLAB_PORT, protocol=PROTOCOL_VERSION ):
         self.host = host
         self.port = port
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.timeout = MatlabClient.TIMEOUT
         self.sock.settimeout( self.timeout )
+        # the OS probes the idle connection, so a dead server is detected during long simulations
+        self.sock.setsockopt( socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1 )
+        for option, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 6)):
+            if( hasattr(socket, option) ):
+                self.sock.setsockopt( socket.IPPROTO_TCP, getattr(socket, option), value )
         self.address = (host,port)
         self.state = self.STATE.INITIALIZING
 
+        # protocol 2 state
+        self.protocol = 1
+        self._seq = 0
+        self._out = bytearray()  # frames that are not sent yet
+        self._unacked = OrderedDict()  # seq -> cmd for frames sent after the last acknowledged SYNC
+        self._syncs = deque()  # sequence numbers of SYNC frames in flight
+        self._window = 0  # frames sent after the last SYNC
+        self._simulate_seq = None  # sequence number of the last SIMULATE frame
+        self._result_line = None  # csv file name received with SIMULATION_FINISHED
+
         try:
             self.sock.connect(self.address)
             self.state = self.STATE.READY
@@ -33,29 +86,145 @@ class MatlabClient():
             print( "connection refused: ", e )
             self.state = self.STATE.ERROR
 
+        if( self.state == self.STATE.READY and protocol > 1 ):
+            self.protocol = self._say_hello( protocol )
+
     def _send( self, byte_arr, confirmation_value=RESPONSE.OK ):
         confirm_byte = None
         self.sock.sendall( byte_arr )
 
         # waiting for 2 confirmation bytes received or timeout expired
         try:
-            while( True ):
-                confirm_byte = self.sock.recv(2,socket.MSG_PEEK)
-                if( len(confirm_byte) == 2 ):
-                    confirm_byte = self.sock.recv(2)
-                    confirm_val = struct.unpack("!H",confirm_byte)[0]
-                    if( confirm_val == confirmation_value ):
-                        return True
-                    else:
-                        self.state = self.STATE.ERROR
-                        return False
+            confirm_byte = self._recv_exact(2)
+            confirm_val = struct.unpack("!H",confirm_byte)[0]
+            if( confirm_val == confirmation_value ):
+                return True
+            else:
+                self.state = self.STATE.ERROR
+                return False
         except Exception as e:
             print("exception on reception of confirm byte, following exception:")
             print(e)
             raise e
 
+    def _recv_exact( self, n ):
+        data = bytearray()
+        while( len(data) < n ):
+            chunk = self.sock.recv( n - len(data) )
+            if( not chunk ):
+                self.state = self.STATE.ERROR
+                raise ConnectionError( "connection is closed by the server" )
+            data += chunk
+        return bytes(data)
+
+    def _wait_readable( self, timeout ):
+        '''
+        @brief: sleeps in select() until data (or EOF) is available
+        @params:  float timeout - seconds, None waits forever, 0 only checks
+        @return:  bool - True if the socket is readable
+        '''
+        return len( select.select([self.sock], [], [], timeout)[0] ) > 0
+
+    def _recv_uint16( self ):
+        return struct.unpack( "!H", self._recv_exact(2) )[0]
+
+    def _say_hello( self, protocol ):
+        '''
+        @brief: SAY_HELLO handshake that negotiates the protocol version.
+                SAY_HELLO, PROTOCOL_VERSION <uint16 VERSION_TAG | version>, SAY_HELLO
+                are sent at once. Protocol 1 servers answer OK to both SAY_HELLO and
+                skip the rest as unknown commands,
+                newer servers answer PROTOCOL_VERSION <uint16 accepted version>
+                in between and switch to it after the second SAY_HELLO.
+        @params:  int protocol - the highest protocol version supported by the client
+        @return:  int - protocol version accepted by the server
+        '''
+        self.sock.sendall( CMD.SAY_HELLO + CMD.PROTOCOL_VERSION + struct.pack("!H", self.VERSION_TAG | protocol) + CMD.SAY_HELLO )
+        responses = [self._recv_uint16(), self._recv_uint16()]
+        if( responses == [RESPONSE.OK, RESPONSE.OK] ):
+            return 1
+        elif( responses == [RESPONSE.OK, RESPONSE.PROTOCOL_VERSION] ):
+            version = self._recv_uint16()
+            if( self._recv_uint16() == RESPONSE.OK ):
+                return version
+        self.state = self.STATE.ERROR
+        raise ConnectionError( "unexpected response on SAY_HELLO: {}".format(responses) )
+
+    def _send_frame( self, cmd, payload=b"" ):
+        '''
+        @brief: appends the frame to the output buffer. Every ACK_WINDOW frames
+                the buffer is sent followed by SYNC, so the server is never more than
+                two windows behind.
+        @return:  int - sequence number of the frame
+        '''
+        self._seq += 1
+        self._out += cmd + struct.pack( "!II", self._seq, len(payload) )
+        self._out += payload
+        self._unacked[self._seq] = struct.unpack( "!H", cmd )[0]
+        self._window += 1
+        if( cmd != CMD.SYNC and self._window >= self.ACK_WINDOW ):
+            self._sync( wait=False )
+        return self._seq
+
+    def _flush( self ):
+        if( self._out ):
+            self.sock.sendall( self._out )
+            self._out = bytearray()
+
+    def _recv_frame( self ):
+        response, seq, length = self._FRAME_HEADER.unpack( self._recv_exact(self._FRAME_HEADER.size) )
+        return response, seq, self._recv_exact(length)
+
+    def _wait_response( self, seq, expected ):
+        '''
+        @brief: receives frames until the answer with the sequence number seq.
+                Errors for the preceding frames are collected on the way,
+                so the stream stays consistent when the exception is raised.
+        @return:  bytes - payload of the answer
+        '''
+        errors = []
+        while( True ):
+            response, response_seq, payload = self._recv_frame()
+            if( response == RESPONSE.ERROR ):
+                errors.append( ProtocolError(response_seq, self._unacked.get(response_seq), payload.decode(errors="replace")) )
+                if( response_seq == seq ):
+                    break
+            elif( response_seq == seq and response == expected ):
+                break
+            else:
+                self.state = self.STATE.ERROR
+                raise ConnectionError( "unexpected response {0} for the frame #{1}".format(response, response_seq) )
+
+        for acked in list(self._unacked):
+            if( acked > seq ):
+                break
+            del self._unacked[acked]
+        if( errors ):
+            self.state = self.STATE.ERROR
+            raise errors[0]
+        return payload
+
+    def _sync( self, wait=True ):
+        '''
+        @brief: sends buffered frames followed by SYNC.
+                If wait is False, only the previous SYNC is waited for.
+        '''
+        if( self.protocol < 2 ):
+            return
+        self._syncs.append( self._send_frame(CMD.SYNC) )
+        self._window = 0
+        self._flush()
+        while( len(self._syncs) > (0 if wait else 1) ):
+            self._wait_response( self._syncs.popleft(), RESPONSE.OK )
+
     def _close(self):
-        self._send(CMD.CLOSE_CONNECTION)
+        if( self.protocol >= 2 ):
+            self._sync()
+            seq = self._send_frame( CMD.CLOSE_CONNECTION )
+            self._flush()
+            self._wait_response( seq, RESPONSE.OK )
+        else:
+            self._send(CMD.CLOSE_CONNECTION)
         self.sock.close()
 
     def _send_float64( self, val ):
@@ -81,21 +250,53 @@ class MatlabClient():
         self._send_uint32( len(array) )
         self._send( raw_data )
 
-    def read_line( self ):
-        self.sock.settimeout(None) # entering nonblocking mode
+    @staticmethod
+    def _pack_array( array, dtype ):
+        # uint32 length followed by big-endian elements
+        array = np.asarray( array, dtype=dtype )
+        return struct.pack( "!I", len(array) ) + array.tobytes()
+
+    def read_line( self, timeout=None ):
+        '''
+        @brief: returns the csv file name received with SIMULATION_FINISHED,
+                otherwise reads the line from the socket
+        @params:  float timeout - seconds, self.timeout if None
+        '''
+        if( self._result_line is not None ):
+            data, self._result_line = self._result_line, None
+            return data
+        if( self.protocol >= 2 ):
+            return None
+
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        data = bytearray()
         while( True ):
-            data = self.sock.recv(1024,socket.MSG_PEEK)
-            idx = data.find(b'\n')
+            if( not self._wait_readable(max(0, deadline - time.monotonic())) ):
+                raise TimeoutError( "line is not received in time" )
+            chunk = self.sock.recv(1024,socket.MSG_PEEK)
+            if( not chunk ):
+                self.state = self.STATE.ERROR
+                raise ConnectionError( "connection is closed by the server" )
+            idx = chunk.find(b'\n')
             if( idx != - 1 ):
-                self.sock.settimeout(MatlabClient.TIMEOUT) # leaving nonblocking mode
-                data = self.sock.recv(idx+1)[:-1]
+                data += self.sock.recv(idx+1)[:-1]
                 break
-            else:
-                continue
+            # nothing after the line is consumed
+            data += self.sock.recv(len(chunk))
 
-        return data
+        return bytes(data)
 
     def _send_polygon( self, array_x, array_y, port_edges_numbers_list=None, port_edges_types=None ):
+        if( self.protocol >= 2 ):
+            if (port_edges_numbers_list is None) or (len(port_edges_numbers_list)==0):
+                payload = FLAG.FALSE
+            else:
+                payload = FLAG.TRUE + self._pack_array( port_edges_numbers_list, ">u4" ) +\
+                          self._pack_array( port_edges_types, ">u2" )
+            payload += self._pack_array( array_x, ">f8" ) + self._pack_array( array_y, ">f8" )
+            self._send_frame( CMD.POLYGON, payload )
+            return
+
         self._send(CMD.POLYGON)
         # print(port_edges_numbers_list, port_edges_types)
         if (port_edges_numbers_list is None) or (len(port_edges_numbers_list)==0):
@@ -108,7 +309,35 @@ class MatlabClient():
         self._send_array_float64(array_x)
         self._send_array_float64(array_y)
 
+    def _send_polygons( self, offsets, points_x, points_y, port_polygons, port_edges, port_types ):
+        '''
+        @brief: sends all polygons in one POLYGONS frame, protocol 2 only.
+                Payload: uint32 polygons_n, vertices_n, ports_n,
+                         uint32 offsets[polygons_n + 1] of the first vertices of the polygons,
+                         float64 points_x[vertices_n], points_y[vertices_n],
+                         uint32 port_polygons[ports_n] - polygon indexes starting from 0,
+                         uint32 port_edges[ports_n] - edge numbers starting from 1,
+                         uint16 port_types[ports_n]
+        '''
+        self._send_frame( CMD.POLYGONS, self._polygons_payload(offsets, points_x, points_y,
+                                                               port_polygons, port_edges, port_types) )
+
+    @staticmethod
+    def _polygons_payload( offsets, points_x, points_y, port_polygons, port_edges, port_types ):
+        offsets = np.asarray( offsets )
+        port_polygons = np.asarray( port_polygons )
+        return b"".join( (struct.pack("!III", len(offsets) - 1, offsets[-1], len(port_polygons)),
+                          offsets.astype(">u4").tobytes(),
+                          np.asarray(points_x).astype(">f8").tobytes(),
+                          np.asarray(points_y).astype(">f8").tobytes(),
+                          port_polygons.astype(">u4").tobytes(),
+                          np.asarray(port_edges).astype(">u4").tobytes(),
+                          np.asarray(port_types).astype(">u2").tobytes()) )
+
     def _set_boxProps(self, dim_X_um, dim_Y_um, cells_X_num, cells_Y_num):
+        if( self.protocol >= 2 ):
+            self._send_frame( CMD.BOX_PROPS, struct.pack(">ddII", dim_X_um, dim_Y_um, cells_X_num, cells_Y_num) )
+            return
         self._send( CMD.BOX_PROPS )
         self._send_float64( dim_X_um )
         self._send_float64( dim_Y_um )
@@ -116,46 +345,93 @@ class MatlabClient():
         self._send_uint32( cells_Y_num )
 
     def _set_ABS_sweep(self, start_f, stop_f ):
+        if( self.protocol >= 2 ):
+            self._send_frame( CMD.SET_ABS, struct.pack(">dd", start_f, stop_f) )
+            return
         self._send( CMD.SET_ABS )
         self._send_float64( start_f )
         self._send_float64( stop_f )
 
     def _set_linspace_sweep(self, start_f, stop_f, points_n):
+        if( self.protocol >= 2 ):
+            self._send_frame( CMD.SET_LINSPACE_SWEEP, struct.pack(">ddI", start_f, stop_f, points_n) )
+            return
         self._send( CMD.SET_LINSPACE_SWEEP )
         self._send_float64(start_f)
         self._send_float64(stop_f)
         self._send_uint32(points_n)
 
     def _send_simulate( self ):
+        if( self.protocol >= 2 ):
+            # geometry upload ends here, its errors are reported before the simulation starts
+            self._sync()
+            self._simulate_seq = self._send_frame( CMD.SIMULATE )
+            self._flush()
+            self._wait_response( self._simulate_seq, RESPONSE.START_SIMULATION )
+            self.state = self.STATE.BUSY_SIMULATING
+            return
         self._send( CMD.SIMULATE, confirmation_value=RESPONSE.START_SIMULATION )
         self.state = self.STATE.BUSY_SIMULATING
 
     def _get_simulation_status( self ):
-        if( self.state == self.STATE.BUSY_SIMULATING ):
-            self.sock.settimeout(None) # entering nonblocking mode
-            try:
-                response = self.sock.recv(2,socket.MSG_PEEK)
-            except Exception as e:
-                print(e)
-
-            if( len(response) < 2 ): # TODO: add large timeout if the simulation side is dead?
-                # leaving nonblocking mode on return
-                self.sock.settimeout(MatlabClient.TIMEOUT)
-                return self.state # equals to self.STATE.BUSY_SIMULATING
-
-            self.sock.settimeout(MatlabClient.TIMEOUT) # leaving nonblocking mode
-
-            response = self.sock.recv(2) # transferring data from socket input QUEUE
-            response = struct.unpack("!H", response)[0]
-            if( response == RESPONSE.SIMULATION_FINISHED ):
+        '''
+        @brief: non-blocking check of the simulation status. When the simulation
+                is finished, the csv file name is stored for read_line().
+                Raises ConnectionError if the server has closed the connection.
+        '''
+        if( self.state != self.STATE.BUSY_SIMULATING or not self._wait_readable(0) ):
+            return self.state
+
+        try:
+            if( self.protocol >= 2 ):
+                self._result_line = self._wait_response( self._simulate_seq, RESPONSE.SIMULATION_FINISHED )
+                self.state = self.STATE.SIMULATION_FINISHED
+            elif( self._recv_uint16() == RESPONSE.SIMULATION_FINISHED ):
+                # the file name follows immediately
+                self._result_line = self.read_line()
                 self.state = self.STATE.SIMULATION_FINISHED
             else:
                 self.state = self.STATE.ERROR
+        except OSError:
+            # connection is closed or reset, keepalive probes have failed
+            self.state = self.STATE.ERROR
+            raise
+        return self.state
 
-            return self.state
+    def _wait_simulation( self, timeout=None, progress=None, poll_interval=1.0 ):
+        '''
+        @brief: waits for the end of the simulation sleeping in select(),
+                the CPU stays idle while the simulation runs
+        @params:  float timeout - overall deadline in seconds, None waits forever
+                  progress - callable(elapsed_s) that is called every
+                             poll_interval seconds while the simulation runs
+                  float poll_interval - seconds
+        @return:  self.state
+        '''
+        start = time.monotonic()
+        while( self.state == self.STATE.BUSY_SIMULATING ):
+            wait = poll_interval
+            if( timeout is not None ):
+                remaining = start + timeout - time.monotonic()
+                if( remaining <= 0 ):
+                    # the state stays BUSY_SIMULATING, waiting can be resumed
+                    raise TimeoutError( "simulation is not finished in {} s".format(timeout) )
+                wait = min(wait, remaining)
+            if( self._wait_readable(wait) ):
+                self._get_simulation_status()
+            elif( progress is not None ):
+                progress( time.monotonic() - start )
+        return self.state
 
     def _visualize_sever( self ):
+        if( self.protocol >= 2 ):
+            self._send_frame( CMD.VISUALIZE )
+            self._sync()
+            return
         self._send( CMD.VISUALIZE )
 
     def _clear( self ):
-        self._send( CMD.CLEAR_POLYGONS )
\ No newline at end of file
+        if( self.protocol >= 2 ):
+            self._send_frame( CMD.CLEAR_POLYGONS )
+            return
+        self._send( CMD.CLEAR_POLYGONS )
@@ -6,8 +6,13 @@ from datetime import datetime
 
 from ClassLib.ChipDesign import Chip_Design
 from .sonnetLab import SonnetLab, SimulationBox
+from .matlabClient import MatlabClient
 
 class SimulatedDesign(Chip_Design):
+    # address of the matlab-sonnet server
+    sonnet_host = "localhost"
+    sonnet_port = MatlabClient.MATLAB_PORT
+
     def __init__(self, cell_name):
         super().__init__(cell_name)
 
@@ -42,7 +47,7 @@ class SimulatedDesign(Chip_Design):
 
     def __reopen_socket(self):
         del self.SL
-        self.SL = SonnetLab()  # new socket for every iteration possible memory leakage
+        self.SL = SonnetLab(self.sonnet_host, self.sonnet_port)  # new socket for every iteration possible memory leakage
 
     def calculate_ports(self, design_params):
         """
@@ -116,9 +121,9 @@ class SimulatedDesign(Chip_Design):
 
         self.SL.clear()
         self.SL.set_boxProps(self.simBox)
-        if self.simulation_type is "LINEAR":
+        if self.simulation_type == "LINEAR":
             self.SL.set_linspace_sweep(self.freqs[0]/1e9, self.freqs[-1]/1e9, len(self.freqs))
-        elif self.simulation_type is "ABS":
+        elif self.simulation_type == "ABS":
             self.SL.set_ABS_sweep(self.freqs[0]/1e9, self.freqs[-1]/1e9)
         else:
             self.SL.set_ABS_sweep(self.freqs[0]/1e9, self.freqs[-1]/1e9)
@@ -1,7 +1,7 @@
 import csv
 
-import pya
-from pya import Point, DPoint, Vector, DVector, DSimplePolygon, SimplePolygon, DPolygon, Polygon, Region
+import klayout.db
+from klayout.db import Point, DPoint, Vector, DVector, DSimplePolygon, SimplePolygon, DPolygon, Polygon, Region
 from ClassLib import *
 from .matlabClient import MatlabClient
 
@@ -22,6 +22,74 @@ class SimulationBox:
         self.x_n = cells_X_num
         self.y_n = cells_Y_num
 
+def region_tables(region, ports):
+    '''
+    @brief: polygons of the region as flat tables of the POLYGONS frame.
+            Port edges are found as in SonnetLab.send_polygon: the middle of
+            the edge is closer than 10 nm to the port point, the first such
+            port in the list is taken.
+    @params:  Region region
+              list ports - SonnetPort instances
+    @return:  (offsets, points_x, points_y, port_polygons, port_edges, port_types),
+              see MatlabClient._send_polygons; coordinates are in um.
+              None if the region is empty.
+    '''
+    hulls = [[(p.x, p.y) for p in poly.resolved_holes().each_point_hull()] for poly in region.each()]
+    if( len(hulls) == 0 ):
+        return None
+    offsets = np.zeros(len(hulls) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(hull) for hull in hulls])
+    pts = np.array([p for hull in hulls for p in hull], dtype=np.float64).reshape(-1, 2)
+
+    port_polygons = port_edges = port_types = np.zeros(0, dtype=np.int64)
+    if( ports ):
+        polygon_idxs = np.repeat(np.arange(len(hulls)), np.diff(offsets))
+        # the next point of every edge, the last edge of the polygon ends at its first point
+        next_idxs = np.arange(1, len(pts) + 1)
+        next_idxs[offsets[1:] - 1] = offsets[:-1]
+        middles = (pts + pts[next_idxs])/2
+        ports_xy = np.array([(port.point.x, port.point.y) for port in ports], dtype=np.float64)
+        close = np.hypot(*(middles[:, None, :] - ports_xy[None, :, :]).transpose(2, 0, 1)) < 10
+        edges = np.flatnonzero(close.any(axis=1))
+        port_polygons = polygon_idxs[edges]
+        port_edges = edges - offsets[port_polygons] + 1  # matlab polygon edge indexing starts from 1
+        port_types = np.array([port.port_type for port in ports])[close[edges].argmax(axis=1)]
+
+    return offsets, pts[:, 0]/1.0e3, pts[:, 1]/1.0e3, port_polygons, port_edges, port_types
+
+
+def read_s_params(file_name, ports_N=None):
+    '''
+    @brief: parses the csv file output from Sonnet, see SonnetLab.get_s_params
+    @params:  str file_name
+              int ports_N - expected number of ports, checked if not None
+    @return:  (freqs, sMatrices)
+    '''
+    data = None
+    with open(file_name, "r") as my_csv_file:
+        data = np.array(list(csv.reader(my_csv_file))[8:], dtype=np.float64)
+    freqs = np.array(data[:, 0], dtype=np.float64)
+    s_data = np.array(data[:, 1::2] + 1j*data[:, 2::2], dtype=np.complex128)
+
+    file_ports_N = int(round(np.sqrt(s_data.shape[1])))
+    if( ports_N is not None and ports_N != file_ports_N ):
+        print("sonnetLab.get_s_params(): internal ports number does not match\
+              file ports number,\nfile ports number:{}".format(file_ports_N))
+
+    '''
+    The original data is shaped as follows:
+    0 - frequency index for example
+    data[0] = [S11,S21,S31,...,Sn1, S21,S22,...,Sn2, ...,Snn]
+    we want to reshape it to the following form:
+    data[0] = [ [S11, S12, ..., S1n],
+                [S21, S22, ..., S2n],
+                      ...          ,
+                [Sn1, Sn2, ..., Snn] ]
+    '''
+    sMatrices = s_data.reshape((len(freqs), file_ports_N, file_ports_N)).transpose(0, 2, 1)
+    return freqs, sMatrices
+
+
 class SonnetLab( MatlabClient ):        
     def __init__(self, host="localhost", port=MatlabClient.MATLAB_PORT):
         super(SonnetLab,self).__init__(host, port)
@@ -84,11 +152,24 @@ class SonnetLab( MatlabClient ):
         else:
             r_cell = Region(cell.begin_shapes_rec(layer_i))
 
-        for poly in r_cell:
-            # print("sending polygon")
-            self.send_polygon(poly.resolved_holes())
+        if( self.protocol >= 2 ):
+            self._send_region(r_cell)
+        else:
+            for poly in r_cell:
+                # print("sending polygon")
+                self.send_polygon(poly.resolved_holes())
+        # end of the batch, errors are attributed to the polygons that caused them
+        self._sync()
+
+    def _send_region(self, region):
+        '''
+        @brief: sends all polygons of the region in one POLYGONS frame
+        '''
+        tables = region_tables(region, self.ports)
+        if( tables is not None ):
+            self._send_polygons(*tables)
     
-    def start_simulation(self, wait=True):
+    def start_simulation(self, wait=True, timeout=None, progress=None, poll_interval=1.0):
         '''
         @brief: function that start simulation on the remote matlab-sonnet server
         @params:
@@ -97,6 +178,12 @@ class SonnetLab( MatlabClient ):
                             Simulation status can be checked later using "get_simulation_status"
                             that performs non-blocking check of the simulation status
                             default value: True
+            float timeout - overall deadline of the waiting in seconds, TimeoutError
+                            is raised when it expires. None waits forever.
+            progress - callable(elapsed_s), called every poll_interval seconds
+                            while the simulation runs
+            float poll_interval - seconds
+            Waiting sleeps in select(), ConnectionError is raised if the server is dead.
         @return:
             bool - True if function has been terminated successfully
                       False otherwise          
@@ -107,13 +194,13 @@ class SonnetLab( MatlabClient ):
         self._send_simulate()
 
         if( wait == True ):
-            while( self.state == self.STATE.BUSY_SIMULATING ):
-                self.get_simulation_status() # updates self.state
-
-        self.sim_res_file = self.read_line()
+            self._wait_simulation(timeout, progress, poll_interval)
+            self.get_simulation_status()
             
     def get_simulation_status( self ):
         self._get_simulation_status()
+        if( self.state == self.STATE.SIMULATION_FINISHED and self._result_line is not None ):
+            self.sim_res_file = self.read_line()
         return self.state
 
     def get_s_params(self):
@@ -137,30 +224,7 @@ class SonnetLab( MatlabClient ):
                    None is returned")
             return None
 
-        data = None
-        with open(self.sim_res_file, "r") as my_csv_file:
-            data = np.array(list(csv.reader(my_csv_file))[8:], dtype=np.float64)
-        freqs = np.array(data[:, 0], dtype=np.float64)
-        s_data = np.array(data[:, 1::2] + 1j*data[:, 2::2], dtype=np.complex128)
-
-        ports_N = len(self.ports)
-        file_ports_N = int(round(np.sqrt(s_data.shape[1])))
-        if( ports_N != file_ports_N ):
-            print("sonnetLab.get_s_params(): internal ports number does not match\
-                  file ports number,\nfile ports number:{}".format(file_ports_N))
-
-        '''
-        The original data is shaped as follows:
-        0 - frequency index for example
-        data[0] = [S11,S21,S31,...,Sn1, S21,S22,...,Sn2, ...,Snn]
-        we want to reshape it to the following form:
-        data[0] = [ [S11, S12, ..., S1n],
-                    [S21, S22, ..., S2n],
-                          ...          ,
-                    [Sn1, Sn2, ..., Snn] ]
-        '''
-        sMatrices = s_data.reshape((len(freqs), file_ports_N, file_ports_N)).transpose(0, 2, 1)
-        return freqs, sMatrices
+        return read_s_params(self.sim_res_file, len(self.ports))
 
     def visualize_sever( self ):
         self._visualize_sever()
@@ -172,7 +236,7 @@ class SonnetLab( MatlabClient ):
 
 if __name__ == "__main__":
 # getting main references of the application
-    app = pya.Application.instance()
+    app = klayout.db.Application.instance()
     mw = app.main_window()
     lv = mw.current_view()
     cv = None
@@ -192,8 +256,8 @@ if __name__ == "__main__":
     else:
         cell = layout.create_cell( "testScript" )
     
-    info = pya.LayerInfo(1,0)
-    info2 = pya.LayerInfo(2,0)
+    info = klayout.db.LayerInfo(1,0)
+    info2 = klayout.db.LayerInfo(2,0)
     layer_ph = layout.layer( info )
     layer_el = layout.layer( info2 )
 
@@ -212,7 +276,7 @@ if __name__ == "__main__":
     
     # Chip drwaing START #
     cpw_pars = CPWParameters( 14.5e3, 6.7e3 ) 
-    box = pya.Box( 0,0, X_SIZE,Y_SIZE )
+    box = klayout.db.Box( 0,0, X_SIZE,Y_SIZE )
     cell.shapes( layer_ph ).insert( box )
     
     cop = CPW_RL_Path( DPoint(0,Y_SIZE/2), "LRL", cpw_pars, 10e3, [X_SIZE/2,Y_SIZE/2], np.pi/2 )
@@ -221,11 +285,9 @@ if __name__ == "__main__":
     ### DRAW SECTION END ###
     
     lv.zoom_fit()
-    from sonnetLab.cMD import CMD
     ### MATLAB COMMANDER SECTION START ###
-    ml_terminal = SonnetLab()
     print("starting connection...")
-    ml_terminal._send( CMD.SAY_HELLO )
+    ml_terminal = SonnetLab()  # protocol version is negotiated on connection
     ml_terminal.clear()
     ml_terminal.set_boxProps( X_SIZE,Y_SIZE, 300,300 )
     print( "sending cell and layer" )
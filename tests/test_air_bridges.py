@@ -0,0 +1,41 @@
+import pytest
+import klayout.db
+
+from ClassLib import CPW_RL_Path, CPWParameters, DPoint, DCplxTrans, Point, pi, centerline_pieces, place_air_bridges
+
+Z = CPWParameters(10e3, 6e3)
+
+
+def _covers(region, point):
+    return region.interacting(klayout.db.Region(klayout.db.Box(point.x - 10, point.y - 10,
+                                                               point.x + 10, point.y + 10))).count() > 0
+
+
+@pytest.mark.parametrize("trans", [DCplxTrans(1, 0, False, 0, 0), DCplxTrans(1, 180, False, 0, 0),
+                                   DCplxTrans(1, 135, False, 0, 0), DCplxTrans(1, 90, True, 0, 0)])
+def test_bridges_sit_on_rotated_path(trans):
+    path = CPW_RL_Path(DPoint(100e3, -50e3), "LRLRL", Z, 50e3, [200e3, 200e3, 200e3], [pi/2, -pi/2], trans_in=trans)
+    # turn angles of the centerline are the ones the arcs are built with
+    turns = [piece[3][2] for pieces, _ in centerline_pieces(path) for piece in pieces if piece[0] == 'R']
+    sign = -1 if trans.is_mirror() else 1
+    assert turns == pytest.approx([sign*pi/2, -sign*pi/2])
+
+    layout = klayout.db.Layout()
+    layout.dbu = 0.001
+    cell = layout.create_cell("top")
+    layer_i = layout.layer(klayout.db.LayerInfo(3, 0))
+    instances = place_air_bridges(cell, layer_i, path, 20e3)
+
+    metal = path.metal_region
+    gaps = path.empty_region
+    n = 0
+    for instance in instances:
+        for bridge_trans in instance.cell_inst.each_cplx_trans():
+            n += 1
+            # the middle of the bridge is on the central conductor,
+            # its pads are on the ground on both sides
+            assert _covers(metal, bridge_trans*Point(0, 0))
+            for side in (-1, 1):
+                pad = bridge_trans*Point(0, side*(Z.b/2 + 3e3))
+                assert not _covers(metal, pad) and not _covers(gaps, pad)
+    assert n == pytest.approx(path.get_total_length()/20e3, abs=1)
@@ -0,0 +1,68 @@
+from math import pi, cos
+
+from ClassLib import (PROGRAM, Chip_Design, CPW_arc, CPWParameters, DPoint, arc_points_number,
+                      arc_tolerance, current_arc_tolerance, dbu_arc_tolerance)
+
+
+class CoarseDesign(Chip_Design):
+    arc_tolerance = 50.0
+
+    def draw(self, design_params=None):
+        self.design_pars = design_params
+        with self.arc_tolerance_scope():
+            self.tolerance_in_draw = current_arc_tolerance()
+            self.turn = CPW_arc(CPWParameters(10e3, 6e3), DPoint(0, 0), 100e3, pi/2)
+        self.turn.place(self.region_ph)
+
+
+def test_design_tolerance_is_restored_after_draw():
+    tolerance = current_arc_tolerance()
+    design = CoarseDesign("coarse")
+    assert current_arc_tolerance() == tolerance
+    design.draw()
+    assert design.tolerance_in_draw == 50.0
+    assert design.turn.arc_tolerance == 50.0
+    assert current_arc_tolerance() == tolerance
+    # elements created outside of the scope use the global setting
+    assert CPW_arc(CPWParameters(10e3, 6e3), DPoint(0, 0), 100e3, pi/2).arc_tolerance == tolerance
+
+
+def test_tolerance_is_restored_after_failed_draw():
+    class FailingDesign(CoarseDesign):
+        def draw(self, design_params=None):
+            with self.arc_tolerance_scope():
+                raise RuntimeError()
+
+    tolerance = PROGRAM.ARC_TOLERANCE
+    try:
+        FailingDesign("failing").draw()
+    except RuntimeError:
+        pass
+    assert PROGRAM.ARC_TOLERANCE == tolerance
+
+
+def test_default_tolerance_follows_the_dbu():
+    assert PROGRAM.ARC_TOLERANCE is None
+    # 0.001 um grid, the design units are nm
+    assert current_arc_tolerance() == dbu_arc_tolerance(0.001) == PROGRAM.ARC_TOLERANCE_DBU
+    assert dbu_arc_tolerance(0.005) == 5*dbu_arc_tolerance(0.001)
+
+    class DefaultDesign(Chip_Design):
+        pass
+
+    design = DefaultDesign("default")
+    assert design.arc_tolerance == dbu_arc_tolerance(design.layout.dbu)
+    with arc_tolerance(20.0):
+        assert CPW_arc(CPWParameters(10e3, 6e3), DPoint(0, 0), 100e3, pi/2).arc_tolerance == 20.0
+    assert PROGRAM.ARC_TOLERANCE is None
+
+
+def test_arc_points_number_bounds_the_sagitta():
+    for R in (1e3, 20e3, 100e3, 500e3):
+        for delta_alpha in (pi/6, pi/2, pi):
+            n = arc_points_number(R, delta_alpha, 5.0)
+            assert 3 <= n <= PROGRAM.ARC_MAX_POINTS
+            if( n < PROGRAM.ARC_MAX_POINTS ):
+                assert R*(1 - cos(delta_alpha/(n - 1)/2)) <= 5.0
+    # the default reduces the number of points of typical turns below the limit
+    assert arc_points_number(100e3, pi/2) < PROGRAM.ARC_MAX_POINTS/2
@@ -0,0 +1,76 @@
+from math import gamma, sqrt, pi
+
+import numpy as np
+import pytest
+
+from ClassLib import CPWParameters, cpw_electrical, cpw_electrical_scalar, ellipk, ellipk_ratio
+
+C_LIGHT = 299792458.0
+# impedance of the free space over 4, 30*pi Ohm with eta0 = 120*pi
+ETA0_4 = 4e-7*pi*C_LIGHT/4
+
+
+def test_ellipk_reference_values():
+    assert ellipk(0) == pytest.approx(pi/2, rel=1e-15)
+    # K(1/sqrt(2)) = Gamma(1/4)^2/(4 sqrt(pi))
+    assert ellipk(sqrt(0.5)) == pytest.approx(gamma(0.25)**2/(4*sqrt(pi)), rel=1e-14)
+    assert ellipk_ratio(sqrt(0.5)) == pytest.approx(1, rel=1e-14)
+    # Landen: K'(k)/K(k) of k and (1 - k')/(1 + k') differ by the factor of 2
+    k = 0.3
+    kp = sqrt(1 - k**2)
+    assert ellipk_ratio((1 - kp)/(1 + kp)) == pytest.approx(2*ellipk_ratio(k), rel=1e-12)
+
+
+def test_self_dual_cpw_in_vacuum():
+    # k0 = 1/sqrt(2): K(k0')/K(k0) = 1, Z0 = eta0/4 in vacuum
+    width = 10e3
+    gap = width*(sqrt(2) - 1)/2
+    result = cpw_electrical(width, gap, 1)
+    assert result["eps_eff"] == pytest.approx(1)
+    assert result["Z0"] == pytest.approx(ETA0_4, rel=1e-12)
+    assert result["v_ph"] == pytest.approx(C_LIGHT, rel=1e-12)
+
+
+def test_cpw_on_silicon():
+    result = cpw_electrical(10e3, 6e3, 11.45)
+    assert result["eps_eff"] == pytest.approx((11.45 + 1)/2)
+    assert result["Z0"] == pytest.approx(50.9, abs=0.05)
+    assert result["v_ph"] == pytest.approx(C_LIGHT/sqrt(result["eps_eff"]), rel=1e-12)
+    assert result["L"]*result["C"] == pytest.approx(1/result["v_ph"]**2, rel=1e-12)
+    assert result["Z0"] == pytest.approx(ETA0_4/sqrt(result["eps_eff"])*ellipk_ratio(10/22), rel=1e-12)
+    # the impedance depends on the ratio of the dimensions only
+    assert cpw_electrical(20e3, 12e3, 11.45)["Z0"] == pytest.approx(result["Z0"], rel=1e-12)
+
+
+def test_finite_substrate():
+    infinite = cpw_electrical(10e3, 6e3, 11.45)["eps_eff"]
+    thick = cpw_electrical(10e3, 6e3, 11.45, h=1e9)["eps_eff"]
+    wafer = cpw_electrical(10e3, 6e3, 11.45, h=500e3)["eps_eff"]
+    thin = cpw_electrical(10e3, 6e3, 11.45, h=5e3)["eps_eff"]
+    assert thick == pytest.approx(infinite, rel=1e-9)
+    assert 1 < thin < wafer < infinite
+
+
+def test_kinetic_inductance():
+    geometric = cpw_electrical(10e3, 6e3, 11.45)
+    kinetic = cpw_electrical(10e3, 6e3, 11.45, sheet_inductance=1e-12, thickness=100)
+    doubled = cpw_electrical(10e3, 6e3, 11.45, sheet_inductance=2e-12, thickness=100)
+    assert kinetic["L_kin"] > 0
+    assert doubled["L_kin"] == pytest.approx(2*kinetic["L_kin"], rel=1e-12)
+    assert kinetic["L"] == pytest.approx(geometric["L"] + kinetic["L_kin"], rel=1e-12)
+    assert kinetic["C"] == pytest.approx(geometric["C"], rel=1e-12)
+    assert kinetic["Z0"] > geometric["Z0"]
+    with pytest.raises(ValueError):
+        cpw_electrical(10e3, 6e3, 11.45, sheet_inductance=1e-12)
+
+
+def test_broadcasting_and_scalar_cache():
+    widths = np.array([5e3, 10e3, 20e3])
+    result = cpw_electrical(widths[:, None], np.array([3e3, 6e3]), 11.45, h=500e3)
+    assert result["Z0"].shape == (3, 2)
+    for i, width in enumerate(widths):
+        for j, gap in enumerate((3e3, 6e3)):
+            scalar = cpw_electrical_scalar(width, gap, 11.45, h=500e3)
+            assert scalar["Z0"] == pytest.approx(result["Z0"][i, j], rel=1e-14)
+    assert CPWParameters(10e3, 6e3).impedance(11.45, h=500e3) == \
+        pytest.approx(cpw_electrical_scalar(10e3, 6e3, 11.45, h=500e3)["Z0"])
@@ -0,0 +1,29 @@
+import os
+import json
+
+from ClassLib import Chip_Design, CPW, CPWParameters, DPoint, generate_variants, params_grid
+
+
+class LineDesign(Chip_Design):
+    def draw(self, design_params=None):
+        self.design_pars = design_params
+        if( design_params["length"] < 0 ):
+            raise ValueError("negative length")
+        CPW(start=DPoint(0, 0), end=DPoint(design_params["length"], 0),
+            cpw_params=CPWParameters(10e3, 6e3)).place(self.region_ph)
+
+
+def test_failed_variant_is_recorded(tmp_path):
+    params_list = params_grid({"length": [100e3, -1, 200e3]})
+    manifest = generate_variants(LineDesign, params_list, str(tmp_path), processes=2)
+
+    assert [entry.get("error") for entry in manifest] == [None, "ValueError: negative length", None]
+    assert "negative length" in manifest[1]["traceback"]
+    assert os.path.exists(os.path.join(str(tmp_path), manifest[0]["file"]))
+    assert os.path.exists(os.path.join(str(tmp_path), manifest[2]["file"]))
+    assert manifest[2]["layers"]
+
+    with open(os.path.join(str(tmp_path), "manifest.json")) as f:
+        stored = json.load(f)
+    assert [entry["file"] for entry in stored["variants"]] == [entry["file"] for entry in manifest]
+    assert stored["variants"][1]["error"] == "ValueError: negative length"
@@ -0,0 +1,78 @@
+from klayout.db import Region
+
+from ClassLib import (Element_Base, GeometryCache, CPW_RL_Path, Squid, CWave, CPWParameters,
+                      DPoint, DCplxTrans, pi)
+
+
+def _placed(element):
+    region = Region()
+    element.place(region)
+    return region
+
+
+def _path(x, length=100e3):
+    return CPW_RL_Path(DPoint(x, 0), "LRLRL", CPWParameters(10e3, 6e3), 20e3,
+                       [length, 50e3, 80e3], [pi/2, -pi/3], trans_in=DCplxTrans(1, 30, False, 0, 0))
+
+
+def _with_cache(build):
+    Element_Base.geometry_cache = GeometryCache(64)
+    try:
+        return build(), Element_Base.geometry_cache
+    finally:
+        Element_Base.geometry_cache = None
+
+
+def test_equal_parameters_hit_the_cache():
+    paths, cache = _with_cache(lambda: [_path(x*1e6) for x in range(5)])
+    assert cache.hits > 0
+    misses = cache.misses
+    for i, path in enumerate(paths):
+        assert (_placed(path) ^ _placed(_path(i*1e6))).is_empty()
+        assert path.end.distance(_path(i*1e6).end) < 1e-6
+    # a different parameter is a miss
+    Element_Base.geometry_cache = cache
+    try:
+        _path(0, length=120e3)
+    finally:
+        Element_Base.geometry_cache = None
+    assert cache.misses > misses
+
+
+def test_cached_squids_are_equal_to_built_ones():
+    params = [1e4, 5e3, 8e4, 4e3, 1e4, 2e4, 3e5, 5e3, 1e3, 2e3, 1e3, 6, 400]
+    squids, cache = _with_cache(lambda: [Squid(DPoint(k*1e5, 0), params) for k in range(4)])
+    assert cache.hits >= 3
+    for k, squid in enumerate(squids):
+        assert (_placed(squid) ^ _placed(Squid(DPoint(k*1e5, 0), params))).is_empty()
+
+
+def test_composite_is_restored_from_the_cache():
+    def cwave(x):
+        return CWave(DPoint(x, 0), 175e3, 25e3, 4, 10e3, pi/4, 30e3, n_pts=50, trans_in=DCplxTrans(1, 30, False, 0, 0))
+
+    Element_Base.geometry_cache = cache = GeometryCache(64)
+    try:
+        first = cwave(0)
+        hits, misses = cache.hits, cache.misses
+        second = cwave(1e6)
+    finally:
+        Element_Base.geometry_cache = None
+    # a single lookup of the composite, its primitives are not built again
+    assert (cache.hits, cache.misses) == (hits + 1, misses)
+    assert second.primitives["empt_circle"] is second.empt_circle
+    assert second.empt_circle is not first.empt_circle
+    built = cwave(1e6)
+    assert (_placed(second) ^ _placed(built)).is_empty()
+    assert (_placed(first) ^ _placed(cwave(0))).is_empty()
+    assert list(second.connections) == list(built.connections)
+
+
+def test_lru_eviction():
+    cache = GeometryCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 2)
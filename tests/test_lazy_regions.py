@@ -0,0 +1,62 @@
+from klayout.db import Region
+
+import ClassLib
+from ClassLib import (CPW, CPW_arc, CPW2CPW, CPW_RL_Path, CPW_Centerline_Path, Contact_Pad,
+                      CPWParameters, DPoint, DCplxTrans, DTrans, pi)
+
+
+def _elements():
+    Z0 = CPWParameters(10e3, 6e3)
+    Z1 = CPWParameters(20e3, 10e3)
+    trans = DCplxTrans(1, 17, False, 5e3, -3e3)
+    elements = [CPW(start=DPoint(0, 0), end=DPoint(100e3, 30e3), cpw_params=Z0),
+                CPW_arc(Z0, DPoint(0, 200e3), 50e3, 2*pi/3, trans_in=trans),
+                CPW2CPW(Z0, Z1, DPoint(300e3, 0), DPoint(400e3, 0)),
+                CPW_RL_Path(DPoint(0, 400e3), "LRLRL", Z0, 20e3, [100e3, 50e3, 80e3], [pi/2, -pi/3], trans_in=trans),
+                CPW_Centerline_Path(DPoint(0, 600e3), "LRLRL", Z0, 20e3, [100e3, 50e3, 80e3], [pi/2, -pi/3]),
+                Contact_Pad(DPoint(1e6, 0), {"w": 10e3, "g": 6e3}, trans_in=DTrans.R90)]
+    # transformations made after the construction
+    elements[0].make_trans(DCplxTrans(1, 45, True, 10e3, 0))
+    elements[3].make_trans(DCplxTrans(2, 0, False, 0, 0))
+    return elements
+
+
+def _build(lazy):
+    lazy_before = ClassLib.PROGRAM.LAZY_REGIONS
+    ClassLib.PROGRAM.LAZY_REGIONS = lazy
+    try:
+        elements = _elements()
+    finally:
+        ClassLib.PROGRAM.LAZY_REGIONS = lazy_before
+    regions = []
+    for element in elements:
+        region = Region()
+        element.place(region)
+        regions.append(region)
+    return elements, regions
+
+
+def test_lazy_and_eager_geometry_are_equal():
+    eager_elements, eager_regions = _build(False)
+    lazy_elements, lazy_regions = _build(True)
+    for eager, lazy in zip(eager_regions, lazy_regions):
+        assert not eager.is_empty()
+        assert (eager ^ lazy).is_empty()
+    for eager, lazy in zip(eager_elements, lazy_elements):
+        assert len(eager.connections) == len(lazy.connections)
+        for p_eager, p_lazy in zip(eager.connections, lazy.connections):
+            assert p_eager.distance(p_lazy) < 1e-6
+        assert list(eager.angle_connections) == list(lazy.angle_connections)
+
+
+def test_lazy_element_is_built_on_first_access():
+    lazy_before = ClassLib.PROGRAM.LAZY_REGIONS
+    ClassLib.PROGRAM.LAZY_REGIONS = True
+    try:
+        line = CPW(start=DPoint(0, 0), end=DPoint(100e3, 0), cpw_params=CPWParameters(10e3, 6e3))
+    finally:
+        ClassLib.PROGRAM.LAZY_REGIONS = lazy_before
+    assert not line._regions_initialized
+    assert line.end == DPoint(100e3, 0)
+    assert not line.metal_region.is_empty()
+    assert line._regions_initialized
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from ClassLib import (CPW_Meander_Resonator, CPWParameters, DPoint, synthesize_meanders,
+                      meanders_from_synthesis, centerline_pieces, path_samples)
+
+Z0 = CPWParameters(10e3, 6e3)
+LENGTHS = [10e6, 5e6, 3.3e6, 7.77e6]
+RADIUSES = [50e3, 60e3, 40e3, 35e3]
+WIDTHS = [600e3, 400e3, 333e3, 500e3]
+
+
+def test_synthesis_matches_built_meanders():
+    synthesis = synthesize_meanders(LENGTHS, RADIUSES, WIDTHS, Z0)
+    assert synthesis["feasible"].all()
+    meanders = meanders_from_synthesis(Z0, DPoint(0, 0), synthesis)
+    for i, meander in enumerate(meanders):
+        assert meander.N == synthesis["N"][i]
+        assert meander.inner_len == pytest.approx(synthesis["inner_len"][i])
+        assert meander.end.distance(DPoint(*synthesis["end"][i])) < 1e-3
+        # the footprint includes the gaps
+        box = (meander.metal_region + meander.empty_region).bbox()
+        left, bottom, right, top = synthesis["bbox"][i]
+        assert (box.left, box.bottom, box.right, box.top) == pytest.approx((left, bottom, right, top), abs=2)
+
+
+def test_loops_are_rounded_down():
+    # N0 = 7.9 loops of the maximal width give 7 wider loops
+    R, width = 50e3, 600e3
+    full_length = (np.pi - 2)*R + 2*7.9*(np.pi*R + width - 2*R)
+    synthesis = synthesize_meanders(full_length, R, width)
+    meander = CPW_Meander_Resonator(Z0, DPoint(0, 0), full_length, R, width)
+    assert synthesis["N"][0] == meander.N == 7
+    assert synthesis["width"][0] > width
+
+
+def test_too_short_meander():
+    synthesis = synthesize_meanders(2e6, 50e3, 1e6)
+    assert synthesis["N"][0] == 0 and not synthesis["feasible"][0]
+    with pytest.raises(ZeroDivisionError):
+        CPW_Meander_Resonator(Z0, DPoint(0, 0), 2e6, 50e3, 1e6)
+
+
+def test_centerline_length_and_end():
+    meander = CPW_Meander_Resonator(Z0, DPoint(0, 0), 5e6, 60e3, 400e3)
+    (pieces, trans), = centerline_pieces(meander)
+    length = sum(abs(p[3][1]*p[3][2]) if p[0] == 'R' else p[3] for p in pieces)
+    assert length == pytest.approx(5e6)
+    points = path_samples(meander, 1e3)[0]
+    assert DPoint(*points[-1]).distance(meander.end) < 1e3
@@ -0,0 +1,101 @@
+import random
+
+from klayout.db import Layout, Region, Box
+
+from ClassLib import PlacementBatch, BucketIndex, CPW, CPW_RL_Path, CPWParameters, Circle, DPoint, pi
+
+
+def _contributions(n, seed):
+    rnd = random.Random(seed)
+    contributions = []
+    for _ in range(n):
+        x, y = rnd.randint(0, 200000), rnd.randint(0, 200000)
+        metal = Region(Box(x, y, x + rnd.randint(1000, 20000), y + rnd.randint(1000, 20000)))
+        if( rnd.random() < 0.3 ):
+            empty = Region()
+        elif( rnd.random() < 0.05 ):
+            empty = Region(Box(0, y, 300000, y + 2000))
+        else:
+            empty = Region(Box(x + 500, y + 500, x + rnd.randint(600, 8000), y + rnd.randint(600, 8000)))
+        contributions.append((metal, empty))
+    return contributions
+
+
+def test_resolve_layer_equals_sequential_placement():
+    for seed in range(3):
+        contributions = _contributions(300, seed)
+        expected = Region(Box(-1000, -1000, 1000, 1000))
+        for metal, empty in contributions:
+            expected += metal
+            expected -= empty
+        result = PlacementBatch(None)._resolve_layer(Region(Box(-1000, -1000, 1000, 1000)), contributions)
+        assert (result ^ expected).is_empty()
+
+
+def test_commit_writes_the_cell():
+    layout = Layout()
+    layout.dbu = 0.001
+    cell = layout.create_cell("top")
+    layer_i = layout.layer(1, 0)
+    contributions = _contributions(50, 7)
+    with PlacementBatch(cell) as pb:
+        for metal, empty in contributions:
+            pb.add(layer_i, metal, empty)
+    expected = Region()
+    for metal, empty in contributions:
+        expected += metal
+        expected -= empty
+    assert (Region(cell.begin_shapes_rec(layer_i)) ^ expected).is_empty()
+
+
+def _elements():
+    Z = CPWParameters(10e3, 6e3)
+    # crossing lines, the gaps of every line cut the lines placed before it
+    elements = [CPW(start=DPoint(0, y), end=DPoint(300e3, y), cpw_params=Z) for y in (50e3, 150e3)]
+    elements += [CPW(start=DPoint(x, 0), end=DPoint(x, 200e3), cpw_params=Z) for x in (100e3, 200e3)]
+    elements.append(CPW_RL_Path(DPoint(20e3, 20e3), "LRL", Z, 30e3, [150e3, 150e3], [pi/2]))
+    elements.append(Circle(DPoint(150e3, 100e3), 40e3))
+    elements.append(CPW(start=DPoint(150e3, 0), end=DPoint(150e3, 200e3), cpw_params=Z))
+    return elements
+
+
+def _cell_with_ground():
+    layout = Layout()
+    layout.dbu = 0.001
+    cell = layout.create_cell("top")
+    layers = [layout.layer(1, 0), layout.layer(2, 0)]
+    cell.shapes(layers[0]).insert(Box(-10000, -10000, 310000, 210000))
+    return layout, cell, layers
+
+
+def test_batch_placement_equals_sequential_place():
+    elements = _elements()
+    layout, cell, layers = _cell_with_ground()
+    for k, element in enumerate(elements):
+        element.place(cell, layers[k % 2])
+
+    batch_layout, batch_cell, layers = _cell_with_ground()
+    with PlacementBatch(batch_cell) as batch:
+        for k, element in enumerate(elements):
+            element.place(batch, layers[k % 2])
+        # nothing is written before the end of the batch
+        assert Region(batch_cell.begin_shapes_rec(layers[1])).is_empty()
+
+    for layer_i in layers:
+        expected = Region(cell.begin_shapes_rec(layer_i))
+        assert not expected.is_empty()
+        # intersections of the arcs with the other edges are snapped to the grid
+        # in a different order, the results differ by slivers of 1 dbu at most
+        assert (expected ^ Region(batch_cell.begin_shapes_rec(layer_i))).sized(-1).is_empty()
+
+
+def test_bucket_index_query():
+    index = BucketIndex(1000)
+    index.insert("a", Box(0, 0, 500, 500))
+    index.insert("b", Box(5000, 5000, 9000, 9000))
+    index.insert("c", Box(500, 450, 2500, 550))
+    assert index.query(Box(400, 400, 600, 600)) == {"a", "c"}
+    assert index.query(Box(3000, 3000, 4000, 4000)) == set()
+    index.remove("a")
+    assert index.query(Box(0, 0, 100, 100)) == set()
+    assert len(index) == 2 and "b" in index
@@ -0,0 +1,84 @@
+from math import pi, cos, sin, atan2
+
+import pytest
+
+from klayout.db import DVector
+
+from ClassLib import PointArray, AngleArray, CPW, CPWParameters, DPoint, DCplxTrans, GeometryCache, Element_Base
+
+
+def _line():
+    return CPW(start=DPoint(0, 0), end=DPoint(100e3, 0), cpw_params=CPWParameters(10e3, 6e3))
+
+
+def test_list_protocol():
+    points = PointArray([DPoint(0, 0), DPoint(1, 1)])
+    assert [DPoint(5, 5)] + points == [DPoint(5, 5), DPoint(0, 0), DPoint(1, 1)]
+    assert points + [DPoint(5, 5)] == [DPoint(0, 0), DPoint(1, 1), DPoint(5, 5)]
+    points.insert(1, DPoint(2, 2))
+    assert points.index(DPoint(2, 2)) == 1
+    assert points.pop() == DPoint(1, 1)
+    points.remove(DPoint(2, 2))
+    assert points == [DPoint(0, 0)]
+    points.extend([DPoint(3, 3)])
+    points.append(DPoint(4, 4))
+    assert points[1:] == [DPoint(3, 3), DPoint(4, 4)]
+    assert len(points) == 3 and points[-1] == DPoint(4, 4)
+
+
+def test_items_are_mutable_in_place():
+    line = _line()
+    line.connections[0].x = 5
+    assert line.connections[0] == DPoint(5, 0)
+    line.angle_connections[1] = 1.0
+    assert line.angle_connections[1] == 1.0
+
+
+def test_transform_matches_klayout():
+    trans = DCplxTrans(1.5, 30, True, 10, -20)
+    points = [DPoint(1, 2), DPoint(-3, 4), DPoint(0, 0)]
+    array = PointArray(points)
+    array.transform(trans)
+    for transformed, pt in zip(array, points):
+        assert transformed.distance(trans*pt) < 1e-9
+    assert isinstance(array[0], DPoint)
+
+    alphas = [0, pi/2, -pi/4]
+    angles = AngleArray(alphas)
+    angles.transform(trans)
+    for alpha, alpha_0 in zip(angles, alphas):
+        direction = trans*DVector(cos(alpha_0), sin(alpha_0))
+        assert alpha == pytest.approx(atan2(direction.y, direction.x))
+
+
+def test_transform_keeps_in_place_changes():
+    array = PointArray([DPoint(1, 2), DPoint(3, 4)])
+    array[1].x = 5
+    array.transform(DCplxTrans(1, 0, False, 10, 0))
+    assert array.as_array().tolist() == [[11, 2], [15, 4]]
+    # points are created on access only
+    assert array._points == {}
+    assert array[0] is array[0]
+
+
+def test_element_connections_follow_transformations():
+    line = _line()
+    assert isinstance(line.connections, PointArray)
+    line.make_trans(DCplxTrans(1, 90, False, 0, 0))
+    assert line.connections[1].distance(DPoint(0, 100e3)) < 1e-6
+    assert line.angle_connections[1] == pytest.approx(pi/2)
+    line.connections = [DPoint(1, 1)]
+    assert isinstance(line.connections, PointArray)
+
+
+def test_cached_elements_keep_point_arrays():
+    Element_Base.geometry_cache = GeometryCache(16)
+    try:
+        _line()
+        line = _line()
+        assert Element_Base.geometry_cache.hits >= 1
+        assert isinstance(line.connections, PointArray)
+        line.make_trans(DCplxTrans(1, 0, False, 10, 0))
+        assert line.connections[0] == DPoint(10, 0)
+    finally:
+        Element_Base.geometry_cache = None
@@ -0,0 +1,31 @@
+from klayout.db import Region
+
+from ClassLib import CPW, CPW_RL_Path, CPWParameters, DPoint, DCplxTrans, pi
+
+
+def _rl_path():
+    return CPW_RL_Path(DPoint(1e5, 2e5), "LRLRL", CPWParameters(10e3, 6e3), 20e3,
+                       [100e3, 50e3, 80e3], [pi/2, -pi/3], trans_in=DCplxTrans(1, 17, False, 0, 0))
+
+
+def test_complex_metal_regions_are_aggregated_on_access():
+    path = _rl_path()
+    # metal_regions is read before metal_region
+    default = path.metal_regions["default"]
+    metal = Region()
+    empty = Region()
+    for primitive in _rl_path().primitives.values():
+        metal += primitive.metal_region
+        empty += primitive.empty_region
+    assert not default.is_empty()
+    assert (default ^ metal).is_empty()
+    assert (path.empty_regions["default"] ^ empty).is_empty()
+    assert default is path.metal_region
+
+
+def test_metal_regions_follow_pending_transformations():
+    line = CPW(start=DPoint(0, 0), end=DPoint(100e3, 0), cpw_params=CPWParameters(10e3, 6e3))
+    line.make_trans(DCplxTrans(1, 90, False, 5e3, 0))
+    expected = CPW(start=DPoint(5e3, 0), end=DPoint(5e3, 100e3), cpw_params=CPWParameters(10e3, 6e3))
+    assert (line.metal_regions["default"] ^ expected.metal_region).is_empty()
+    assert (line.empty_regions["default"] ^ expected.empty_region).is_empty()
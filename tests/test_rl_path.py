@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from ClassLib import CPW_RL_Path, RLPathPlan, plan_rl_paths, CPWParameters, DPoint, DCplxTrans, pi
+
+CASES = [("LRLRL", 20e3, [100e3, 50e3, 80e3], [pi/2, -pi/3]),
+         ("RLRL", 20e3, [100e3, 60e3], [pi/2, -pi/2]),
+         ("RLR", [10e3, 30e3], [100e3], [-pi/4, pi/3]),
+         ("LRLRLRL", [20e3, 25e3, 30e3], [300e3, 200e3, 100e3, 1e5], [pi/2, -pi/2, pi/3]),
+         ("LL", 20e3, [50e3, 50e3], [])]
+
+
+@pytest.mark.parametrize("shape, radiuses, lengths, angles", CASES)
+def test_plan_matches_built_path(shape, radiuses, lengths, angles):
+    trans = DCplxTrans(1, 30, False, 0, 0)
+    path = CPW_RL_Path(DPoint(10e3, -5e3), shape, CPWParameters(10e3, 6e3), radiuses, lengths, angles, trans_in=trans)
+    plan = RLPathPlan(shape, radiuses, lengths, angles)
+
+    expected_end = DCplxTrans(1, 0, False, 10e3, -5e3)*trans*plan.end
+    assert path.end.distance(expected_end) < 1e-3
+    assert np.cos(path.alpha_end - plan.alpha_end - pi/6) == pytest.approx(1)
+    assert path.get_total_length() == pytest.approx(plan.total_length)
+    # the straight primitives have the planned lengths
+    straights = [p for name, p in path.primitives.items() if name.startswith("cpw_")]
+    for primitive, length in zip(straights, plan.straight_lengths):
+        assert primitive.start.distance(primitive.end) == pytest.approx(length)
+
+
+@pytest.mark.parametrize("shape, radiuses, lengths, angles", CASES)
+def test_batch_plan_matches_plan(shape, radiuses, lengths, angles):
+    lengths_batch = np.array([lengths, np.array(lengths)*1.5])
+    batch = plan_rl_paths(shape, radiuses, lengths_batch, angles)
+    for b, segment_lengths in enumerate(lengths_batch):
+        plan = RLPathPlan(shape, radiuses, list(segment_lengths), angles)
+        assert batch["end"][b] == pytest.approx([plan.end.x, plan.end.y], abs=1e-6)
+        assert batch["straight_lengths"][b] == pytest.approx(plan.straight_lengths)
+        assert batch["total_length"][b] == pytest.approx(plan.total_length)
+
+
+def test_leading_turn_does_not_reduce_the_next_straight():
+    plan = RLPathPlan("RLR", 20e3, [100e3], [pi/2, pi/2])
+    assert plan.straight_lengths == pytest.approx([100e3 - 20e3])
+
+
+def test_negative_straight_is_built_backwards():
+    # the reduced first and last straights are negative, CPW_RL_Path draws them
+    # backwards and the plan follows it
+    shape, lengths, angles = "LRLRL", [10e3, 100e3, 5e3], [pi/2, -pi/3]
+    path = CPW_RL_Path(DPoint(0, 0), shape, CPWParameters(10e3, 6e3), 20e3, lengths, angles)
+    plan = RLPathPlan(shape, 20e3, lengths, angles)
+    assert not plan.feasible
+    assert path.end.distance(plan.end) < 1e-3
+    assert np.cos(path.alpha_end - plan.alpha_end) == pytest.approx(1)
+    assert path.get_total_length() == pytest.approx(plan.total_length)
+
+    batch = plan_rl_paths(shape, 20e3, [lengths, [30e3, 100e3, 50e3]], angles)
+    assert batch["feasible"].tolist() == [False, True]
+    assert batch["end"][0] == pytest.approx([plan.end.x, plan.end.y], abs=1e-6)
+    assert np.cos(batch["alpha_end"][0] - plan.alpha_end) == pytest.approx(1)
+    # exactly the turn radius is feasible
+    assert RLPathPlan("LRL", 20e3, [20e3, 100e3], [pi/2]).feasible
@@ -0,0 +1,88 @@
+from klayout.db import DBox, Region, Box
+
+from ClassLib import MultiNetRouter, Route, CPWParameters, DPoint
+
+
+def _router(**kwargs):
+    router = MultiNetRouter(DBox(0, 0, 2e6, 2e6), 20e3, CPWParameters(20e3, 10e3), 60e3, order="input", **kwargs)
+    # closed ring around (1e6, 1.5e6), nothing can reach its inside
+    router.add_obstacle(Region(Box(0.8e6, 1.3e6, 1.2e6, 1.7e6)) - Region(Box(0.9e6, 1.4e6, 1.1e6, 1.6e6)))
+    return router
+
+
+def _count_searches(router):
+    searches = []
+    route = router._route
+
+    def counted(net, deadline=None):
+        searches.append(net.name)
+        return route(net, deadline)
+    router._route = counted
+    return searches
+
+
+def test_failed_reroute_restores_ripped_nets():
+    router = _router()
+    router.add_net("A", DPoint(0.2e6, 0.5e6), DPoint(1.8e6, 0.5e6))
+    router.add_net("B", DPoint(1e6, 0.1e6), DPoint(1e6, 1.5e6))
+    assert router.route_all() == ["B"]
+    route = router.nets["A"].route
+    assert route is not None
+    rip_ups = router.nets["A"].rip_ups
+
+    searches = _count_searches(router)
+    assert router.route_all() == ["B"]
+    # B rips up A, fails anyway, A gets its old route back
+    assert searches == ["B", "B"]
+    assert router.nets["A"].route is route
+    assert router.nets["A"].rip_ups == rip_ups + 1
+    assert ("net", "A") in router._cells
+
+
+def test_route_that_can_not_be_drawn_is_not_committed():
+    router = _router()
+    router.add_net("A", DPoint(0.2e6, 0.5e6), DPoint(1.8e6, 0.5e6))
+    router.add_net("B", DPoint(1e6, 0.1e6), DPoint(1e6, 1.5e6))
+    assert router.route_all() == ["B"]
+    route = router.nets["A"].route
+    counts = router._counts.copy()
+
+    # the first straight is shorter than its reduction by the turn
+    short = Route([DPoint(1e6, 0.1e6), DPoint(1e6, 0.12e6), DPoint(1.2e6, 0.12e6)],
+                  router.router.cpw_params, router.router.turn_radius)
+    assert not short.feasible
+    searches = _count_searches(router)
+    searched = router._route
+
+    def infeasible(net, deadline=None):
+        searched(net, deadline)
+        return short
+    router._route = infeasible
+    assert router.route_all() == ["B"]
+    # the route found after the rip-up is rejected, A gets its old route back
+    assert searches == ["B", "B"]
+    assert router.nets["B"].route is None
+    assert router.nets["A"].route is route
+    assert ("net", "B") not in router._cells
+    assert (router._counts == counts).all()
+
+
+def test_failed_net_is_retried_after_routes_change():
+    router = _router(max_rip_ups=0)
+    router.add_net("B", DPoint(1e6, 0.1e6), DPoint(1e6, 1.5e6))
+    router.add_net("C", DPoint(0.2e6, 0.5e6), DPoint(1.8e6, 0.5e6))
+    searches = _count_searches(router)
+    assert router.route_all() == ["B"]
+    assert searches == ["B", "C", "B"]
+
+
+def test_route_all_limits():
+    router = _router(max_searches=1)
+    router.add_net("A", DPoint(0.2e6, 0.5e6), DPoint(1.8e6, 0.5e6))
+    router.add_net("C", DPoint(0.2e6, 0.9e6), DPoint(1.8e6, 0.9e6))
+    assert router.route_all() == ["C"]
+    assert router.route_all() == []
+
+    router = _router()
+    router.add_net("A", DPoint(0.2e6, 0.5e6), DPoint(1.8e6, 0.5e6))
+    assert router.route_all(time_limit=0) == ["A"]
@@ -0,0 +1,129 @@
+import os
+import struct
+import asyncio
+
+import pytest
+from klayout.db import Region, Box, DPoint
+
+from sonnetSim import EchoServer, SonnetLab, AsyncSonnetLab, SimulationBox, SonnetPort, PORT_TYPES
+from sonnetSim.matlabClient import MatlabClient
+from sonnetSim.flags import RESPONSE
+
+
+@pytest.fixture
+def server(request):
+    server = EchoServer(port=0, protocol=request.param).start_in_thread()
+    yield server
+    server.stop()
+
+
+def _region():
+    return Region([Box(i*2000, 0, i*2000 + 1000, 1000) for i in range(50)])
+
+
+def _ports():
+    # the middles of the left edge of the first box and of the right edge of the last one
+    return [SonnetPort(DPoint(0, 500), PORT_TYPES.BOX_WALL), SonnetPort(DPoint(99000, 500), PORT_TYPES.BOX_WALL)]
+
+
+def _csv_header(file_name):
+    with open(file_name) as f:
+        return [f.readline().strip() for _ in range(3)]
+
+
+@pytest.mark.parametrize("server", [1, 2], indirect=True)
+def test_round_trip(server):
+    SL = SonnetLab(port=server.port)
+    assert SL.protocol == server.protocol
+    SL.set_ports(_ports())
+    SL.clear()
+    SL.set_boxProps(SimulationBox(100e3, 100e3, 300, 300))
+    SL.set_ABS_sweep(1, 10)
+    SL.send_polygons(_region())
+    SL.start_simulation(wait=True, timeout=10)
+    assert SL.state == SL.STATE.SIMULATION_FINISHED
+    freqs, sMatrices = SL.get_s_params()
+    SL.release()
+
+    assert server.stats["polygons"] == 50
+    assert server.stats["simulations"] == 1
+    assert _csv_header(SL.sim_res_file)[1:] == ["polygons: 50", "ports: 2"]
+    assert freqs[0] == pytest.approx(1) and freqs[-1] == pytest.approx(10)
+    assert sMatrices.shape == (len(freqs), 2, 2)
+
+
+@pytest.mark.parametrize("server", [1, 2], indirect=True)
+def test_handshake_with_newer_client(server):
+    # the version must not be taken for a command by the protocol 1 server,
+    # 4 is CMD.POLYGON
+    client = MatlabClient(port=server.port, protocol=4)
+    assert client.protocol == server.protocol
+    client._send_polygon([0, 1, 1], [0, 0, 1])
+    client._close()
+    assert server.stats["polygons"] == 1
+
+
+@pytest.mark.parametrize("server", [2], indirect=True)
+def test_async_round_trip(server):
+    async def job():
+        async with AsyncSonnetLab(port=server.port) as SL:
+            await SL.set_boxProps(SimulationBox(100e3, 100e3, 300, 300))
+            await SL.set_linspace_sweep(1, 10, 11)
+            assert await SL.upload(_region(), _ports()) == 50
+            await SL.simulate(timeout=10)
+            return await SL.get_s_params()
+
+    freqs, sMatrices = asyncio.run(job())
+    assert len(freqs) == 11
+    assert sMatrices.shape == (11, 2, 2)
+
+
+@pytest.mark.parametrize("server", [2], indirect=True)
+def test_async_reader_error_fails_the_waiters(server):
+    async def job():
+        SL = await AsyncSonnetLab(port=server.port).connect()
+        dispatch = SL._dispatch
+
+        def malformed(response, seq, payload):
+            if( response == RESPONSE.START_SIMULATION ):
+                struct.unpack("!H", payload[:1])
+            dispatch(response, seq, payload)
+        SL._dispatch = malformed
+        await SL.set_linspace_sweep(1, 10, 11)
+        with pytest.raises(struct.error):
+            await SL.simulate(timeout=None)
+        assert SL._waiters == {}
+        with pytest.raises(ConnectionError):
+            await SL.sync()
+        SL.abort()
+
+    # the simulation must fail instead of waiting forever
+    asyncio.run(asyncio.wait_for(job(), 10))
+
+
+@pytest.mark.parametrize("server", [1], indirect=True)
+def test_async_client_requires_protocol_2(server):
+    async def job():
+        async with AsyncSonnetLab(port=server.port):
+            pass
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(job())
+
+
+def test_temporary_data_dir_is_removed(tmp_path):
+    server = EchoServer(port=0).start_in_thread()
+    data_dir = server.data_dir
+    SL = SonnetLab(port=server.port)
+    SL.set_ports([])
+    SL.set_ABS_sweep(1, 10)
+    SL.start_simulation(wait=True, timeout=10)
+    SL.release()
+    assert os.path.dirname(os.fsdecode(SL.sim_res_file)) == data_dir
+    server.stop()
+    assert not os.path.exists(data_dir)
+
+    # the directory given by the user is kept
+    server = EchoServer(port=0, data_dir=str(tmp_path)).start_in_thread()
+    server.stop()
+    assert os.path.isdir(str(tmp_path))